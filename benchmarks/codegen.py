@@ -0,0 +1,51 @@
+"""
+Compares lookups through `CompiledPolicies.is_allowed` with the evaluator
+generated from the same policies by `compile_evaluator`.
+
+    PYTHONPATH=. python benchmarks/codegen.py [grants]
+"""
+import random
+import sys
+from time import perf_counter
+
+from targe.policy import CompiledPolicies, Policy
+
+
+def main(grants: int = 1_000) -> None:
+    role = CompiledPolicies()
+    for i in range(grants):
+        role.attach(Policy.allow(f"invoice:{i}:read, update"))
+        role.attach(Policy.allow(f"article:{i}:meta:set*"))
+        role.attach(Policy.deny(f"article:{i}:meta:setOwner"))
+    role.attach(Policy.deny("invoice:*:delete"))
+    role.attach(Policy.allow("article:*:read"))
+
+    start = perf_counter()
+    evaluate = role.evaluator()
+    compile_time = perf_counter() - start
+
+    random.seed(0)
+    actions = ["read", "update", "delete", "meta:setName", "meta:setOwner", "meta:getName"]
+    scopes = [
+        f"{random.choice(['invoice', 'article'])}:{random.randrange(grants * 2)}:{random.choice(actions)}"
+        for _ in range(200_000)
+    ]
+
+    start = perf_counter()
+    expected = [role.is_allowed(scope) for scope in scopes]
+    trie_time = perf_counter() - start
+
+    start = perf_counter()
+    result = [evaluate(scope) for scope in scopes]
+    generated_time = perf_counter() - start
+
+    assert result == expected
+    print(
+        f"compilation: {compile_time:.2f}s, "
+        f"trie: {trie_time / len(scopes) * 1e9:.0f}ns/lookup, "
+        f"generated: {generated_time / len(scopes) * 1e9:.0f}ns/lookup"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
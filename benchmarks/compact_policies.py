@@ -0,0 +1,76 @@
+"""
+Compares memory usage and lookup latency of the dict based `CompiledPolicies`
+trie with the array backed `CompactPolicies` engine.
+
+Scenarios mirror the ones from `tests/test_compiled_policies.py`, each one
+is repeated for a number of resource ids to simulate an actor with many grants.
+
+    PYTHONPATH=. python benchmarks/compact_policies.py [grants]
+"""
+import sys
+import tracemalloc
+from timeit import timeit
+from typing import Callable, Dict, List, Tuple
+
+from targe.compact import CompactPolicies
+from targe.policy import CompiledPolicies, Policy
+
+Scenario = Tuple[Callable[[int], List[Policy]], Callable[[int], List[str]]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    "static scope": (
+        lambda i: [
+            Policy.allow(f"resource_{i}"),
+            Policy.deny(f"resource_{i}:create"),
+            Policy.allow(f"resource_{i}:level_1"),
+        ],
+        lambda i: [f"resource_{i}:level_1", f"resource_{i}:level_1:level_2", f"resource_{i}:create"],
+    ),
+    "dynamic scope": (
+        lambda i: [Policy.allow(f"resource:{i}:set*"), Policy.deny(f"resource:{i}:setEmail")],
+        lambda i: [f"resource:{i}:setName", f"resource:{i}:setEmail", f"resource:{i}:set:set"],
+    ),
+    "wildcards": (
+        lambda i: [Policy.allow(f"resource_{i}:*"), Policy.deny(f"resource_{i}:level_1:denied")],
+        lambda i: [f"resource_{i}:setName", f"resource_{i}:level_1:level_2", f"resource_{i}:level_1:denied"],
+    ),
+    "scoped wildcards": (
+        lambda i: [Policy.allow(f"resource:*:allowed_{i}"), Policy.deny(f"resource:id_{i}:allowed_{i}")],
+        lambda i: [f"resource:id:allowed_{i}", f"resource:id_{i}:allowed_{i}", f"resource:id_{i}"],
+    ),
+    "grouped policies": (
+        lambda i: [Policy.allow(f"resource_{i} : group-a , group-b : allow")],
+        lambda i: [f"resource_{i}:group-a:allow", f"resource_{i}:group-b:allow", f"resource_{i}:group-c:allow"],
+    ),
+}
+
+
+def measure(engine: type, policies: List[Policy], scopes: List[str], repeat: int) -> Tuple[int, float]:
+    tracemalloc.start()
+    instance = engine()
+    for policy in policies:
+        instance.attach(policy)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for scope in scopes:
+        instance.is_allowed(scope)
+
+    seconds = timeit(lambda: [instance.is_allowed(scope) for scope in scopes], number=repeat)
+
+    return memory, seconds / (repeat * len(scopes)) * 1_000_000_000
+
+
+def main(grants: int = 10_000, repeat: int = 5) -> None:
+    print(f"{'scenario':<18} {'engine':<18} {'memory':>12} {'per lookup':>12}")
+    for name, (make_policies, make_scopes) in SCENARIOS.items():
+        policies = [policy for i in range(grants) for policy in make_policies(i)]
+        scopes = [scope for i in range(0, grants, 10) for scope in make_scopes(i)]
+
+        for engine in (CompiledPolicies, CompactPolicies):
+            memory, latency = measure(engine, policies, scopes, repeat)
+            print(f"{name:<18} {engine.__name__:<18} {memory / 1024 / 1024:>9.2f} MB {latency:>9.0f} ns")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
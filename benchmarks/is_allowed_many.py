@@ -0,0 +1,42 @@
+"""
+Compares batch evaluation of scopes with a loop over `CompiledPolicies.is_allowed`.
+
+    PYTHONPATH=. python benchmarks/is_allowed_many.py [scopes]
+"""
+import random
+import sys
+from time import perf_counter
+
+from targe.policy import CompiledPolicies, Policy
+
+
+def main(count: int = 1_000_000) -> None:
+    role = CompiledPolicies()
+    for i in range(1_000):
+        role.attach(Policy.allow(f"invoice:{i}:read, update"))
+        role.attach(Policy.allow(f"article:{i}:meta:set*"))
+    compiled = CompiledPolicies([role])
+    compiled.attach(Policy.deny("invoice:*:delete"))
+    compiled.attach(Policy.allow("article:*:read"))
+
+    random.seed(0)
+    actions = ["read", "update", "delete", "meta:setName", "meta:getName"]
+    scopes = [
+        f"{random.choice(['invoice', 'article'])}:{random.randrange(2_000)}:{random.choice(actions)}"
+        for _ in range(count)
+    ]
+
+    start = perf_counter()
+    expected = [compiled.is_allowed(scope) for scope in scopes]
+    loop_time = perf_counter() - start
+
+    start = perf_counter()
+    result = compiled.is_allowed_many(scopes)
+    batch_time = perf_counter() - start
+
+    assert list(result) == expected
+    print(f"is_allowed loop: {loop_time:.2f}s, is_allowed_many: {batch_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,82 @@
+"""
+Measures lookup latency of an actor whose policies come from roles. Compiled
+policies of roles are shared by actors and merged into a single trie used by
+lookups of every actor, so the cost should not depend on the number of roles.
+A single trie holding all policies is the reference.
+
+Only the API available since the first release is used (decision caches are
+skipped if not supported), so the script can be run from a checkout of any
+earlier version to compare results.
+
+    PYTHONPATH=. python benchmarks/layered_policies.py [roles]
+"""
+import sys
+from timeit import repeat
+from typing import Callable, List, Optional
+
+from targe.actor import Actor
+from targe.policy import CompiledPolicies, Policy
+from targe.role import Role
+
+SCOPES = ["invoice:9:setName", "nope:x", "article:3:update", "invoice:1:delete", "invoice : 1 , 2 : setName"]
+
+
+def measure(is_allowed: Callable[[str], bool], scope: str, number: int = 20_000) -> float:
+    is_allowed(scope)
+    seconds = min(repeat(lambda: is_allowed(scope), number=number, repeat=5))
+
+    return seconds / number * 1_000_000_000
+
+
+def role_policies(i: int) -> List[Policy]:
+    return [
+        Policy.allow(f"article:{i}:*"),
+        Policy.allow(f"invoice:{i}:set*"),
+        Policy.deny("invoice:*:delete"),
+        Policy.allow(f"user:{i}:read"),
+    ]
+
+
+def create_actor(roles: List[Role], cache_size: int = 0) -> Optional[Actor]:
+    try:
+        actor = Actor("actor_id", cache_size=cache_size) if cache_size else Actor("actor_id")  # type: ignore
+    except TypeError:
+        # versions without decision caches
+        return None
+
+    for role in roles:
+        actor.roles.append(role)
+    actor.policies.append(Policy.allow("invoice:9:set*"))
+
+    return actor
+
+
+def main(count: int = 5) -> None:
+    roles = []
+    merged = CompiledPolicies()
+    for i in range(count):
+        role = Role(f"role_{i}")
+        for policy in role_policies(i):
+            role.policies.append(policy)
+            merged.attach(policy)
+        roles.append(role)
+    merged.attach(Policy.allow("invoice:9:set*"))
+
+    engines = {
+        "single trie": merged.is_allowed,
+        f"actor with {count} roles": create_actor(roles),
+        f"cached actor with {count} roles": create_actor(roles, cache_size=128),
+    }
+
+    print(f"{'engine':<28} {'scope':<28} {'per lookup':>12}")
+    for name, engine in engines.items():
+        if engine is None:
+            continue
+
+        is_allowed = engine if callable(engine) else engine.is_allowed
+        for scope in SCOPES:
+            print(f"{name:<28} {scope:<28} {measure(is_allowed, scope):>9.0f} ns")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,60 @@
+"""
+Measures memory retained per `Policy`, `Role` and `Actor` instance, the latter
+both before and after its policies are compiled.
+
+    PYTHONPATH=. python benchmarks/memory.py [instances]
+
+Only the API available since the first release is used, so the script can be
+run from a checkout of any earlier version to compare results.
+"""
+import gc
+import sys
+import tracemalloc
+from typing import Callable, List
+
+from targe.actor import Actor
+from targe.policy import Policy
+from targe.role import Role
+
+
+def measure(factory: Callable[[int], object], count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    instances: List[object] = [factory(i) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del instances
+
+    return size / count
+
+
+def create_actor(i: int, roles: List[Role], compiled: bool = False) -> Actor:
+    actor = Actor(f"actor_{i}")
+    actor.roles.append(roles[i % len(roles)])
+    actor.policies.append(Policy.allow(f"article:{i}:update"))
+    actor.policies.append(Policy.deny("article:*:delete"))
+    if compiled:
+        actor.compile()
+
+    return actor
+
+
+def main(count: int = 100_000) -> None:
+    roles = [Role(f"role_{i}") for i in range(10)]
+    for role in roles:
+        role.policies.append(Policy.allow("article:*"))
+
+    results = {
+        "Policy": measure(lambda i: Policy.allow("article:update"), count),
+        "Role": measure(lambda i: Role(f"role_{i}"), count),
+        "Actor": measure(lambda i: create_actor(i, roles), count),
+        "Actor (compiled)": measure(lambda i: create_actor(i, roles, compiled=True), count),
+    }
+
+    for name, size in results.items():
+        print(f"{name:<20}{size:>8.0f} bytes")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
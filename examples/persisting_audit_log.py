@@ -1,19 +1,20 @@
-from targe import Actor, ActorProvider, Auth, Policy, AuditStore, AuditEntry
+from typing import Iterable
+
+from targe import Actor, ActorProvider, Auth, Policy, AuditEntry, BackgroundAuditStore, BatchAuditStore
 from targe.errors import AccessDeniedError
 
 
 # This class will handle persisting log to a file
-class MyAuditStore(AuditStore):
+class MyAuditStore(BatchAuditStore):
     def __init__(self, file_path: str):
-        self.audit = []
         self.file_path = file_path
 
     def append(self, log: AuditEntry) -> None:
-        self.audit.append(log)
+        self.extend([log])
 
-    def flush(self) -> None:
+    def extend(self, logs: Iterable[AuditEntry]) -> None:
         with open(self.file_path, "a") as file:
-            file.writelines([str(entry) + "\n" for entry in self.audit])
+            file.writelines([str(entry) + "\n" for entry in logs])
 
 
 class MyActorProvider(ActorProvider):
@@ -21,8 +22,8 @@ class MyActorProvider(ActorProvider):
         return Actor(actor_id)
 
 
-# Initialise audit log
-audit_log = MyAuditStore("./log.txt")
+# Initialise audit log, entries are written to the file in batches by a background thread
+audit_log = BackgroundAuditStore(MyAuditStore("./log.txt"))
 
 auth = Auth(MyActorProvider(), audit_log)
 auth.authorize("actor_id")
@@ -45,5 +46,5 @@ auth.actor.policies.append(
 protect_this()  # successes are stored in audit as well
 
 
-# Flush audit
-audit_log.flush()
+# Write remaining entries, this also happens when the interpreter exits
+audit_log.close()
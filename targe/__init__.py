@@ -1,5 +1,19 @@
-from .actor import Actor, ActorProvider
-from .audit import AuditEntry, AuditStatus, AuditStore, InMemoryAuditStore
+from .actor import Actor, ActorProvider, AsyncActorProvider, AsyncBatchActorProvider, BatchActorProvider
+from .audit import (
+    AsyncAuditStore,
+    AuditEntry,
+    AuditLevel,
+    AuditStatus,
+    AuditStore,
+    AuditWriterStats,
+    BackgroundAuditStore,
+    BatchAuditStore,
+    CollectionAuditEntry,
+    InMemoryAuditStore,
+    OverflowPolicy,
+)
 from .auth import Auth
 from .policy import Policy, PolicyEffect
+from .providers import BatchingActorLoader, CachingActorProvider
+from .repository import InMemoryPolicyRepository, PolicyRepository, RepositoryActorProvider
 from .role import Role
@@ -1,56 +1,125 @@
 from abc import abstractmethod
-from typing import Protocol, runtime_checkable, Any
+from typing import Any, Iterator, Optional, Protocol, Sequence, Union, runtime_checkable
 
-from .policy import CompiledPolicies
-from .utils import ObservableList
+from .explain import Explanation
+from .policy import CacheInfo, CompiledPolicies
+from .role import role_registry
+from .utils import ListChange, ListReplacement, ObservableList
 
 
 class Actor:
-    def __init__(self, actor_id: str):
-        self.roles = ObservableList([], self._on_change)
-        self.policies = ObservableList([], self._on_change)
+    __slots__ = (
+        "roles",
+        "policies",
+        "_actor_id",
+        "_cache_size",
+        "_compiled_policies",
+        "_role_mask",
+        "_role_mask_version",
+    )
+
+    def __init__(self, actor_id: str, cache_size: int = 0):
+        self.roles = ObservableList([], self._on_roles_change)
+        self.policies = ObservableList([], self._on_policies_change)
 
         self._actor_id = actor_id
-        self._compiled_policies: CompiledPolicies = CompiledPolicies()
-        self._ready = False
+        self._cache_size = cache_size
+        # policies are compiled on first use
+        self._compiled_policies: Optional[CompiledPolicies] = None
+        # bits of all roles held by the actor, inherited ones included
+        self._role_mask = 0
+        self._role_mask_version = role_registry.version
+
+    def __repr__(self) -> str:
+        return f"Actor({self._actor_id!r})"
 
     @property
     def actor_id(self) -> str:
         return self._actor_id
 
     def is_allowed(self, scope: str) -> bool:
-        if not self._ready:
-            self.compile()
+        return self._compiled().is_allowed(scope)
+
+    def is_allowed_many(self, scopes: Sequence[str]) -> Sequence[bool]:
+        return self._compiled().is_allowed_many(scopes)
+
+    def allowed_scopes(self, prefix: str = "") -> Iterator[str]:
+        return self._compiled().allowed_scopes(prefix)
 
-        return self._compiled_policies.is_allowed(scope)
+    def explain(self, scope: str) -> Explanation:
+        return self._compiled().explain(scope)
 
     def on_change(self) -> None:
         pass
 
-    def _on_change(self, _) -> None:
-        self.compile()
+    def _on_roles_change(self, _: Union[ListChange, ListReplacement]) -> None:
+        self._update_role_mask()
+        if self._compiled_policies is not None:
+            self._link_roles(self._compiled_policies)
+
         self.on_change()
 
+    def _on_policies_change(self, change: Union[ListChange, ListReplacement]) -> None:
+        if self._compiled_policies is not None:
+            self._compiled_policies.apply_change(change)
+
+        self.on_change()
+
+    def _link_roles(self, compiled_policies: CompiledPolicies) -> None:
+        # actor's own policies take precedence over role policies,
+        # roles added later take precedence over the earlier ones
+        compiled_policies.layers = [role.compiled_policies for role in reversed(self.roles)]
+
+    def cache_info(self) -> CacheInfo:
+        if self._compiled_policies is None:
+            return CacheInfo(0, 0, self._cache_size, 0)
+
+        return self._compiled_policies.cache_info()
+
     def compile(self) -> None:
-        self._compiled_policies = CompiledPolicies()
+        self._compile()
 
-        for role in self.roles:
-            for policy in role.policies:
-                self._compiled_policies.attach(policy)
+    def _compile(self) -> CompiledPolicies:
+        compiled_policies = CompiledPolicies(cache_size=self._cache_size, origin=self)
 
         for policy in self.policies:
-            self._compiled_policies.attach(policy)
+            compiled_policies.attach(policy)
+
+        self._link_roles(compiled_policies)
+        self._compiled_policies = compiled_policies
+
+        return compiled_policies
+
+    def _compiled(self) -> CompiledPolicies:
+        return self._compiled_policies or self._compile()
 
-        self._ready = True
+    @property
+    def role_mask(self) -> int:
+        # closures of roles are changed rarely, any change of a role hierarchy refreshes the mask
+        if self._role_mask_version != role_registry.version:
+            self._update_role_mask()
+
+        return self._role_mask
+
+    def _update_role_mask(self) -> None:
+        mask = 0
+        for role in self.roles:
+            mask |= role.mask
+
+        self._role_mask = mask
+        self._role_mask_version = role_registry.version
 
     def has_role(self, *role_id: str) -> bool:
-        role_list = {role.name for role in self.roles}
+        # names of actor's roles are known to the registry once the mask is computed
+        mask = self.role_mask
+        required = role_registry.find(role_id)
+
+        return required is not None and mask & required == required
 
-        for role in role_id:
-            if role not in role_list:
-                return False
+    def has_any_role(self, *role_id: str) -> bool:
+        mask = self.role_mask
 
-        return True
+        return bool(mask & role_registry.find_any(role_id))
 
 
 @runtime_checkable
@@ -60,4 +129,34 @@ class ActorProvider(Protocol):
         ...
 
 
-__all__ = ["Actor", "ActorProvider", "CompiledPolicies"]
+@runtime_checkable
+class AsyncActorProvider(Protocol):
+    @abstractmethod
+    async def get_actor(self, context: Any = None) -> Actor:
+        ...
+
+
+@runtime_checkable
+class BatchActorProvider(ActorProvider, Protocol):
+    # providers able to load many actors at once, e.g. with a single query; actors
+    # (or `None` for unknown ones) are returned in order of the contexts
+    @abstractmethod
+    def get_actors(self, contexts: Sequence[Any]) -> Sequence[Optional[Actor]]:
+        ...
+
+
+@runtime_checkable
+class AsyncBatchActorProvider(AsyncActorProvider, Protocol):
+    @abstractmethod
+    async def get_actors(self, contexts: Sequence[Any]) -> Sequence[Optional[Actor]]:
+        ...
+
+
+__all__ = [
+    "Actor",
+    "ActorProvider",
+    "AsyncActorProvider",
+    "AsyncBatchActorProvider",
+    "BatchActorProvider",
+    "CompiledPolicies",
+]
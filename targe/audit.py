@@ -1,9 +1,16 @@
+import atexit
+import random
+import threading
+import time
 from abc import abstractmethod
+from collections import deque
 from datetime import datetime
 from enum import Enum
-from typing import List, Protocol, runtime_checkable
+from typing import Deque, Iterable, List, NamedTuple, Optional, Protocol, runtime_checkable
 
-from gid import Guid
+from gid.guid import BASE62, HASH_LENGTH, TIME_BYTES, base62_encode
+
+from .utils import utc_from_ns
 
 
 class AuditStatus(Enum):
@@ -14,18 +21,74 @@ class AuditStatus(Enum):
         return self.value
 
 
+class AuditLevel(Enum):
+    # which guarded calls are recorded in the audit log
+    ALL = "all"
+    DENIES_ONLY = "denies_only"
+    OFF = "off"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+# random part of entry ids, fits the `gid.Guid` hash part of 9 base62 characters
+_ENTRY_ID_BITS = 53
+
+
 class AuditEntry:
-    def __init__(self, actor_id: str, scope: str):
-        self.entry_id = str(Guid())
+    __slots__ = ("actor_id", "scope", "status", "_created_at", "_random", "_entry_id")
+
+    def __init__(self, actor_id: str, scope: str, status: AuditStatus = AuditStatus.FAILED):
         self.actor_id = actor_id
         self.scope = scope
-        self.status = AuditStatus.FAILED
-        self.created_on = datetime.utcnow()
+        self.status = status
+        self._created_at = time.time_ns()
+        # ids are formatted on first access, entries of stores not using them never pay for it
+        self._random = random.getrandbits(_ENTRY_ID_BITS)
+        self._entry_id: Optional[str] = None
+
+    @property
+    def entry_id(self) -> str:
+        # laid out as `gid.Guid`, the creation time in milliseconds followed by the random part,
+        # so the id does not depend on when or by which thread it is accessed
+        if self._entry_id is None:
+            timestamp = base62_encode(self._created_at // 1_000_000).rjust(TIME_BYTES, BASE62[0])
+            self._entry_id = timestamp + base62_encode(self._random).rjust(HASH_LENGTH, BASE62[0])
+
+        return self._entry_id
+
+    @property
+    def created_at(self) -> datetime:
+        return utc_from_ns(self._created_at)
+
+    @property
+    def created_at_ns(self) -> int:
+        # nanoseconds since the epoch
+        return self._created_at
+
+    @property
+    def created_on(self) -> datetime:
+        return utc_from_ns(self._created_at)
 
     def __str__(self) -> str:
         return f"[{self.created_on.isoformat()}] {self.actor_id} -> {self.scope} - {self.status}"
 
 
+class CollectionAuditEntry(AuditEntry):
+    __slots__ = ("scopes", "denied")
+
+    def __init__(self, actor_id: str, scope: str, scopes: List[str], status: AuditStatus = AuditStatus.FAILED):
+        super().__init__(actor_id, scope, status)
+        self.scopes = list(dict.fromkeys(scopes))
+        self.denied: List[str] = []
+
+    def __str__(self) -> str:
+        return (
+            f"[{self.created_on.isoformat()}] {self.actor_id} -> {self.scope} "
+            f"({len(self.scopes)} scopes, {len(self.denied)} denied) - {self.status}"
+        )
+
+
 @runtime_checkable
 class AuditStore(Protocol):
     @abstractmethod
@@ -33,13 +96,31 @@ class AuditStore(Protocol):
         ...
 
 
-class InMemoryAuditStore(AuditStore):
+@runtime_checkable
+class BatchAuditStore(AuditStore, Protocol):
+    # stores able to persist many entries at once, e.g. with a single insert
+    @abstractmethod
+    def extend(self, logs: Iterable[AuditEntry]) -> None:
+        ...
+
+
+@runtime_checkable
+class AsyncAuditStore(Protocol):
+    @abstractmethod
+    async def append(self, log: AuditEntry) -> None:
+        ...
+
+
+class InMemoryAuditStore(BatchAuditStore):
     def __init__(self):
         self._log: List[AuditEntry] = []
 
     def append(self, log: AuditEntry) -> None:
         self._log.append(log)
 
+    def extend(self, logs: Iterable[AuditEntry]) -> None:
+        self._log.extend(logs)
+
     def __getitem__(self, item):
         return self._log[item]
 
@@ -51,3 +132,169 @@ class InMemoryAuditStore(AuditStore):
 
     def length(self) -> int:
         return len(self._log)
+
+
+class OverflowPolicy(Enum):
+    # what happens to entries appended to a full queue of `BackgroundAuditStore`
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    SAMPLE = "sample"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class AuditWriterStats(NamedTuple):
+    queued: int
+    written: int
+    dropped: int
+    batches: int
+    errors: int
+
+
+class BackgroundAuditStore(BatchAuditStore):
+    # hands entries over to a background thread writing them to the wrapped store in batches,
+    # so persisting the audit log does not add to the latency of guarded calls
+    def __init__(
+        self,
+        store: AuditStore,
+        max_queue_size: int = 10_000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+        sample_rate: float = 0.1,
+    ):
+        self.store = store
+        self._max_queue_size = max_queue_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._overflow = overflow
+        # share of entries kept by the `SAMPLE` policy while the queue is full
+        self._sample_rate = sample_rate
+
+        self._queue: Deque[AuditEntry] = deque()
+        self._condition = threading.Condition()
+        # entries taken from the queue, but not written yet
+        self._writing = 0
+        # pending `flush` calls make the writer skip waiting for a full batch
+        self._flushing = 0
+        self._closed = False
+        # set by the writer once the queue is drained after closing
+        self._stopped = False
+        # serializes calls into the wrapped store, which does not have to be thread-safe
+        self._write_lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._errors = 0
+
+        self._thread = threading.Thread(target=self._run, name="targe-audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, log: AuditEntry) -> None:
+        with self._condition:
+            if not self._closed and len(self._queue) >= self._max_queue_size:
+                if self._overflow is OverflowPolicy.BLOCK:
+                    while len(self._queue) >= self._max_queue_size and not self._closed:
+                        self._condition.wait()
+                elif self._overflow is OverflowPolicy.SAMPLE and random.random() >= self._sample_rate:
+                    self._dropped += 1
+                    return
+                else:
+                    self._queue.popleft()
+                    self._dropped += 1
+
+            # the writer keeps taking entries until the queue is drained, even once closed
+            if not self._stopped:
+                self._queue.append(log)
+                if len(self._queue) >= self._batch_size:
+                    self._condition.notify_all()
+                return
+
+        # entries appended after the writer has stopped (e.g. by exit handlers) are written right away
+        with self._write_lock:
+            self._write([log])
+
+    def extend(self, logs: Iterable[AuditEntry]) -> None:
+        for log in logs:
+            self.append(log)
+
+    def flush(self, timeout: float = None) -> bool:
+        # waits until all entries appended so far are written, returns `False` on timeout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                while self._queue or self._writing:
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self._flushing -= 1
+
+        return True
+
+    def close(self, timeout: float = None) -> None:
+        # remaining entries are written before the background thread stops
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def stats(self) -> AuditWriterStats:
+        with self._condition:
+            return AuditWriterStats(
+                len(self._queue) + self._writing, self._written, self._dropped, self._batches, self._errors
+            )
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self._flush_interval
+                while len(self._queue) < self._batch_size and not self._closed and not (self._flushing and self._queue):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                if not self._queue and self._closed:
+                    self._stopped = True
+                    return
+
+                batch = [self._queue.popleft() for _ in range(min(self._batch_size, len(self._queue)))]
+                self._writing = len(batch)
+                # space was made for appends blocked by a full queue
+                self._condition.notify_all()
+
+            if batch:
+                with self._write_lock:
+                    self._write(batch)
+
+            with self._condition:
+                self._writing = 0
+                self._condition.notify_all()
+
+    def _write(self, batch: List[AuditEntry]) -> None:
+        try:
+            extend = getattr(self.store, "extend", None)
+            if extend is not None:
+                extend(batch)
+            else:
+                for log in batch:
+                    self.store.append(log)
+        except Exception:  # pylint: disable=broad-except
+            # a failing store must not stop the writer, failures are reported by stats
+            with self._condition:
+                self._errors += 1
+            return
+
+        with self._condition:
+            self._written += len(batch)
+            self._batches += 1
@@ -1,127 +1,460 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from inspect import signature
-from typing import Any, Callable, List, Union, Optional, Dict
+from inspect import isawaitable, iscoroutine, iscoroutinefunction
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
-from .actor import Actor, ActorProvider
-from .audit import AuditEntry, AuditStatus, AuditStore, InMemoryAuditStore
-from .errors import AccessDeniedError, AuthorizationError, InvalidReferenceError, UnauthorizedError
-from .utils import resolve_reference
+from .actor import Actor, ActorProvider, AsyncActorProvider
+from .audit import (
+    AsyncAuditStore,
+    AuditEntry,
+    AuditLevel,
+    AuditStatus,
+    AuditStore,
+    CollectionAuditEntry,
+    InMemoryAuditStore,
+)
+from .errors import AccessDeniedError, AsyncSupportError, AuthorizationError, InvalidReferenceError, UnauthorizedError
+from .explain import Explanation
+from .role import role_registry
+from .template import ScopeResolverFunction, ScopeTemplate, bind_position
 
-OnGuardFunction = Callable[[Actor, str], bool]
-ScopeResolverFunction = Callable[[Actor, Dict[str, Any]], str]
+OnGuardFunction = Callable[[Actor, str], Union[bool, Awaitable[bool]]]
 
 
 class Auth:
     def __init__(
         self,
-        actor_provider: ActorProvider,
-        audit_store: AuditStore = None,
+        actor_provider: Union[ActorProvider, AsyncActorProvider],
+        audit_store: Union[AuditStore, AsyncAuditStore] = None,
         on_guard: OnGuardFunction = None,
+        offload_provider: bool = False,
+        global_actor: bool = False,
+        audit_level: AuditLevel = AuditLevel.ALL,
     ):
         self.actor_provider = actor_provider
         self.audit_store = audit_store if audit_store is not None else InMemoryAuditStore()
-        self._actor: Actor = None  # type: ignore
+        self.audit_level = audit_level
         self._on_guard: Optional[OnGuardFunction] = on_guard
+        # blocking providers are called in the default executor by `authorize_async`
+        self._offload_provider = offload_provider
+
+        # authorized actor is local to the current thread or task, so a single instance can serve
+        # concurrent requests; in the global mode (e.g. single-user scripts) it is shared instead
+        self._global_actor = global_actor
+        self._actor: Optional[Actor] = None
+        self._actor_var: ContextVar[Optional[Actor]] = ContextVar(f"targe_actor_{id(self)}", default=None)
 
     def authorize(self, context: Any = None) -> Actor:
-        self._actor = self.actor_provider.get_actor(context)
-        if not isinstance(self._actor, Actor):
-            raise AuthorizationError.invalid_actor(actor=self._actor)
+        actor = self._validate_actor(_sync_result(self.actor_provider.get_actor(context)))
+        self._set_actor(actor)
+
+        return actor
+
+    async def authorize_async(self, context: Any = None) -> Actor:
+        actor = self._validate_actor(await self._get_actor_async(context))
+        self._set_actor(actor)
+
+        return actor
 
-        return self._actor
+    @contextmanager
+    def authorized(self, context: Any = None) -> Iterator[Actor]:
+        # actor is authorized only within the block, e.g. for a single request
+        actor = self._validate_actor(_sync_result(self.actor_provider.get_actor(context)))
+        token = self._set_actor(actor)
+        try:
+            yield actor
+        finally:
+            self._reset_actor(token)
+
+    @asynccontextmanager
+    async def authorized_async(self, context: Any = None) -> AsyncIterator[Actor]:
+        actor = self._validate_actor(await self._get_actor_async(context))
+        token = self._set_actor(actor)
+        try:
+            yield actor
+        finally:
+            self._reset_actor(token)
 
     @property
     def actor(self) -> Actor:
-        return self._actor
+        if self._global_actor:
+            return self._actor  # type: ignore
+
+        return self._actor_var.get()  # type: ignore
+
+    async def _get_actor_async(self, context: Any) -> Any:
+        if self._offload_provider:
+            loop = asyncio.get_running_loop()
+            actor = await loop.run_in_executor(None, self.actor_provider.get_actor, context)
+        else:
+            actor = self.actor_provider.get_actor(context)
 
-    def guard(self, scope: Union[str, ScopeResolverFunction] = "*", roles: List[str] = None) -> Callable:
+        return await actor if isawaitable(actor) else actor
+
+    @staticmethod
+    def _validate_actor(actor: Any) -> Actor:
+        if not isinstance(actor, Actor):
+            raise AuthorizationError.invalid_actor(actor=actor)
+
+        return actor
+
+    def _set_actor(self, actor: Optional[Actor]) -> Any:
+        # returns a token restoring the previous actor
+        if self._global_actor:
+            previous, self._actor = self._actor, actor
+            return previous
+
+        return self._actor_var.set(actor)
+
+    def _reset_actor(self, token: Any) -> None:
+        if self._global_actor:
+            self._actor = token
+        else:
+            self._actor_var.reset(token)
+
+    def guard(
+        self,
+        scope: Union[str, ScopeResolverFunction] = "*",
+        roles: List[str] = None,
+        any_roles: List[str] = None,
+    ) -> Callable:
         def _decorator(function: Callable) -> Any:
+            # required roles and the scope are compiled once, when the function is decorated
+            role_masks = _role_masks(roles, any_roles)
+            template = ScopeTemplate(scope, function)
+
             @wraps(function)
             def _decorated(*args, **kwargs) -> Any:
                 if self.actor is None:
                     raise UnauthorizedError.missing_actor
 
-                resolved_scope = self._resolve_scope(scope, function, kwargs, args)
-                audit_entry = AuditEntry(self.actor.actor_id, resolved_scope)
+                resolved_scope = template.resolve(self.actor, args, kwargs)
 
                 # rbac mode
-                if roles is not None:
-                    self._guard_with_rbac(roles, audit_entry if scope != "*" else None)
+                if role_masks is not None:
+                    self._guard_with_rbac(role_masks, resolved_scope if scope != "*" else None)
 
                 # acl mode
                 if scope != "*":
-                    self._guard_with_acl(resolved_scope, audit_entry)
+                    self._guard_with_acl(resolved_scope)
 
-                audit_entry.status = AuditStatus.SUCCEED
-                self.audit_store.append(audit_entry)
+                _sync_result(self._audit(resolved_scope, AuditStatus.SUCCEED))
 
                 return function(*args, **kwargs)
 
-            return _decorated
+            @wraps(function)
+            async def _decorated_async(*args, **kwargs) -> Any:
+                if self.actor is None:
+                    raise UnauthorizedError.missing_actor
+
+                resolved_scope = template.resolve(self.actor, args, kwargs)
+
+                if role_masks is not None:
+                    await self._guard_with_rbac_async(role_masks, resolved_scope if scope != "*" else None)
+
+                if scope != "*":
+                    await self._guard_with_acl_async(resolved_scope)
+
+                await _awaited(self._audit(resolved_scope, AuditStatus.SUCCEED))
+
+                return await function(*args, **kwargs)
+
+            return _decorated_async if iscoroutinefunction(function) else _decorated
 
         return _decorator
 
-    def guard_after(self, scope: Union[str, ScopeResolverFunction], rbac: List[str] = None) -> Callable:
+    def guard_after(
+        self,
+        scope: Union[str, ScopeResolverFunction],
+        rbac: List[str] = None,
+        any_roles: List[str] = None,
+    ) -> Callable:
         def _decorator(function: Callable) -> Any:
+            role_masks = _role_masks(rbac, any_roles)
+            template = ScopeTemplate(scope, function, bound=["return"])
+
             @wraps(function)
             def _decorated(*args, **kwargs) -> Any:
                 if self.actor is None:
                     raise UnauthorizedError.missing_actor
 
                 result = function(*args, **kwargs)
-                kwargs["return"] = result
 
-                resolved_scope = self._resolve_scope(scope, function, kwargs, args)
-                audit_entry = AuditEntry(self.actor.actor_id, resolved_scope)
+                resolved_scope = template.resolve(self.actor, args, kwargs, result)
 
                 # rbac mode
-                if rbac is not None:
-                    self._guard_with_rbac(rbac, audit_entry if scope != "*" else None)
+                if role_masks is not None:
+                    self._guard_with_rbac(role_masks, resolved_scope if scope != "*" else None)
                     return result
 
                 # acl mode
-                self._guard_with_acl(resolved_scope, audit_entry)
+                self._guard_with_acl(resolved_scope)
+
+                return result
+
+            @wraps(function)
+            async def _decorated_async(*args, **kwargs) -> Any:
+                if self.actor is None:
+                    raise UnauthorizedError.missing_actor
+
+                # scope is resolved against the awaited result
+                result = await function(*args, **kwargs)
+
+                resolved_scope = template.resolve(self.actor, args, kwargs, result)
+
+                if role_masks is not None:
+                    await self._guard_with_rbac_async(role_masks, resolved_scope if scope != "*" else None)
+                    return result
+
+                await self._guard_with_acl_async(resolved_scope)
 
                 return result
 
-            return _decorated
+            return _decorated_async if iscoroutinefunction(function) else _decorated
+
+        return _decorator
+
+    def guard_each(
+        self,
+        scope: Union[str, ScopeResolverFunction],
+        argument: str,
+        roles: List[str] = None,
+        any_roles: List[str] = None,
+    ) -> Callable:
+        def _decorator(function: Callable) -> Any:
+            role_masks = _role_masks(roles, any_roles)
+            template = ScopeTemplate(scope, function, bound=[argument])
+            position, accepted = bind_position(function, argument)
+            if not accepted:
+                raise InvalidReferenceError.unresolved_reference(scope=argument, function=function)
+
+            @wraps(function)
+            def _decorated(*args, **kwargs) -> Any:
+                if self.actor is None:
+                    raise UnauthorizedError.missing_actor
+
+                args, kwargs, items = self._materialize_argument(function, argument, position, args, kwargs)
+                resolved_scopes = [template.resolve(self.actor, args, kwargs, item) for item in items]
+
+                if role_masks is not None and not self._has_roles(role_masks):
+                    _sync_result(self._audit_collection(scope, resolved_scopes, [], AuditStatus.FAILED))
+                    raise AccessDeniedError.insufficient_roles
+
+                decisions = self._decide(resolved_scopes)
+                denied = [item for item, allowed in decisions.items() if not allowed]
+                if denied:
+                    _sync_result(self._audit_collection(scope, resolved_scopes, denied, AuditStatus.FAILED))
+                    raise AccessDeniedError.scope_not_allowed(scope=denied[0])
+
+                _sync_result(self._audit_collection(scope, resolved_scopes, denied, AuditStatus.SUCCEED))
+
+                return function(*args, **kwargs)
+
+            @wraps(function)
+            async def _decorated_async(*args, **kwargs) -> Any:
+                if self.actor is None:
+                    raise UnauthorizedError.missing_actor
+
+                args, kwargs, items = self._materialize_argument(function, argument, position, args, kwargs)
+                resolved_scopes = [template.resolve(self.actor, args, kwargs, item) for item in items]
+
+                if role_masks is not None and not self._has_roles(role_masks):
+                    await _awaited(self._audit_collection(scope, resolved_scopes, [], AuditStatus.FAILED))
+                    raise AccessDeniedError.insufficient_roles
+
+                decisions = await self._decide_async(resolved_scopes)
+                denied = [item for item, allowed in decisions.items() if not allowed]
+                if denied:
+                    await _awaited(self._audit_collection(scope, resolved_scopes, denied, AuditStatus.FAILED))
+                    raise AccessDeniedError.scope_not_allowed(scope=denied[0])
+
+                await _awaited(self._audit_collection(scope, resolved_scopes, denied, AuditStatus.SUCCEED))
+
+                return await function(*args, **kwargs)
+
+            return _decorated_async if iscoroutinefunction(function) else _decorated
+
+        return _decorator
+
+    def filter_after(self, scope: Union[str, ScopeResolverFunction]) -> Callable:
+        def _decorator(function: Callable) -> Any:
+            template = ScopeTemplate(scope, function, bound=["return"])
+
+            @wraps(function)
+            def _decorated(*args, **kwargs) -> Any:
+                if self.actor is None:
+                    raise UnauthorizedError.missing_actor
+
+                result = list(function(*args, **kwargs))
+                resolved_scopes = [template.resolve(self.actor, args, kwargs, item) for item in result]
+                decisions = self._decide(resolved_scopes)
+
+                denied = [item for item, allowed in decisions.items() if not allowed]
+                _sync_result(self._audit_collection(scope, resolved_scopes, denied, AuditStatus.SUCCEED))
+
+                return [item for item, item_scope in zip(result, resolved_scopes) if decisions[item_scope]]
+
+            @wraps(function)
+            async def _decorated_async(*args, **kwargs) -> Any:
+                if self.actor is None:
+                    raise UnauthorizedError.missing_actor
+
+                result = list(await function(*args, **kwargs))
+                resolved_scopes = [template.resolve(self.actor, args, kwargs, item) for item in result]
+                decisions = await self._decide_async(resolved_scopes)
+
+                denied = [item for item, allowed in decisions.items() if not allowed]
+                await _awaited(self._audit_collection(scope, resolved_scopes, denied, AuditStatus.SUCCEED))
+
+                return [item for item, item_scope in zip(result, resolved_scopes) if decisions[item_scope]]
+
+            return _decorated_async if iscoroutinefunction(function) else _decorated
 
         return _decorator
 
     def is_allowed(self, scope: str) -> bool:
         allowed = self.actor.is_allowed(scope)
         if not allowed and self._on_guard is not None:
-            allowed = self._on_guard(self.actor, scope)
+            allowed = _sync_result(self._on_guard(self.actor, scope))
         return allowed
 
-    def _guard_with_rbac(self, rbac: List[str], audit_entry: AuditEntry = None):
-        if not self.actor.has_role(*rbac):
-            if audit_entry is not None:
-                self.audit_store.append(audit_entry)
+    async def is_allowed_async(self, scope: str) -> bool:
+        allowed = self.actor.is_allowed(scope)
+        if not allowed and self._on_guard is not None:
+            allowed = await _awaited(self._on_guard(self.actor, scope))
+        return allowed
+
+    def explain(self, scope: str) -> Explanation:
+        explanation = self.actor.explain(scope)
+        if not explanation.allowed and self._on_guard is not None and _sync_result(self._on_guard(self.actor, scope)):
+            # access granted by the `on_guard` fallback
+            return explanation._replace(allowed=True, policy=None, origin=self._on_guard)
+
+        return explanation
+
+    def _has_roles(self, role_masks: "_RoleMasks") -> bool:
+        # actor has to hold all of the required roles and at least one of alternative roles, if there are any;
+        # actor's mask goes first, so names of actor's roles are known to the registry
+        mask = self.actor.role_mask
+        required, alternatives = role_masks.masks()
+
+        return (
+            required is not None
+            and mask & required == required
+            and (not role_masks.any_roles or bool(mask & alternatives))
+        )
+
+    def _guard_with_rbac(self, role_masks: "_RoleMasks", audit_scope: str = None):
+        if not self._has_roles(role_masks):
+            if audit_scope is not None:
+                _sync_result(self._audit(audit_scope, AuditStatus.FAILED))
+            raise AccessDeniedError.insufficient_roles
+
+    async def _guard_with_rbac_async(self, role_masks: "_RoleMasks", audit_scope: str = None):
+        if not self._has_roles(role_masks):
+            if audit_scope is not None:
+                await _awaited(self._audit(audit_scope, AuditStatus.FAILED))
             raise AccessDeniedError.insufficient_roles
 
-    def _guard_with_acl(self, scope: str, audit_entry: AuditEntry = None):
+    def _guard_with_acl(self, scope: str):
         if not self.is_allowed(scope):
-            if audit_entry is not None:
-                self.audit_store.append(audit_entry)
+            _sync_result(self._audit(scope, AuditStatus.FAILED))
             raise AccessDeniedError.scope_not_allowed(scope=scope)
 
-    def _resolve_scope(self, scope: Union[str, ScopeResolverFunction], function: Any, kwargs, args) -> str:
-        if scope == "*":
-            return scope  # type: ignore
+    async def _guard_with_acl_async(self, scope: str):
+        if not await self.is_allowed_async(scope):
+            await _awaited(self._audit(scope, AuditStatus.FAILED))
+            raise AccessDeniedError.scope_not_allowed(scope=scope)
 
-        co_names = tuple(signature(function).parameters.keys())
+    def _decide(self, scopes: List[str]) -> Dict[str, bool]:
+        # identical scopes are checked only once
+        return {scope: self.is_allowed(scope) for scope in dict.fromkeys(scopes)}
 
-        all_kwargs = (
-            {**kwargs, **dict(zip(co_names, args))}
-        )
+    async def _decide_async(self, scopes: List[str]) -> Dict[str, bool]:
+        return {scope: await self.is_allowed_async(scope) for scope in dict.fromkeys(scopes)}
 
-        if callable(scope):
-            resolved_scope = scope(self.actor, all_kwargs)
-        else:
-            try:
-                resolved_scope = resolve_reference(all_kwargs, scope)
-            except (AttributeError, KeyError) as error:
-                raise InvalidReferenceError.unresolved_reference(scope=scope, function=function) from error
+    def _audited(self, denied: bool) -> bool:
+        return self.audit_level is AuditLevel.ALL or (denied and self.audit_level is AuditLevel.DENIES_ONLY)
+
+    def _audit(self, scope: str, status: AuditStatus) -> Any:
+        # entries are created only when they are stored, the result of async stores is awaited by the caller
+        if not self._audited(status is AuditStatus.FAILED):
+            return None
+
+        return self.audit_store.append(AuditEntry(self.actor.actor_id, scope, status))
+
+    def _audit_collection(
+        self, scope: Union[str, ScopeResolverFunction], scopes: List[str], denied: List[str], status: AuditStatus
+    ) -> Any:
+        if not self._audited(status is AuditStatus.FAILED or bool(denied)):
+            return None
+
+        audit_entry = CollectionAuditEntry(self.actor.actor_id, _describe_scope(scope), scopes, status)
+        audit_entry.denied = denied
+
+        return self.audit_store.append(audit_entry)
+
+    @staticmethod
+    def _materialize_argument(
+        function: Any, argument: str, position: Optional[int], args, kwargs
+    ) -> Tuple[tuple, dict, list]:
+        # iterable argument is consumed by scope resolution, so the function receives a list
+        if position is not None and position < len(args):
+            items = list(args[position])
+            return (*args[:position], items, *args[position + 1 :]), kwargs, items
+
+        if argument not in kwargs:
+            raise InvalidReferenceError.unresolved_reference(scope=argument, function=function)
+
+        items = list(kwargs[argument])
+        return args, {**kwargs, argument: items}, items
+
+
+def _sync_result(result: Any) -> Any:
+    # async providers, callbacks and audit stores can be awaited only by guarded coroutine functions
+    if isawaitable(result):
+        if iscoroutine(result):
+            result.close()
+        raise AsyncSupportError.awaitable_in_sync_call
+
+    return result
+
+
+async def _awaited(result: Any) -> Any:
+    return await result if isawaitable(result) else result
+
+
+class _RoleMasks:
+    # masks of roles required by a guard; names are looked up (never registered) and looked up again
+    # only when the registry learns new names, so roles unknown when a function is decorated are fine
+    __slots__ = ("roles", "any_roles", "_size", "_masks")
+
+    def __init__(self, roles: List[str], any_roles: List[str]):
+        self.roles = tuple(roles)
+        self.any_roles = tuple(any_roles)
+        self._size = -1
+        self._masks: Tuple[Optional[int], int] = (None, 0)
+
+    def masks(self) -> Tuple[Optional[int], int]:
+        size = len(role_registry)
+        if size != self._size:
+            self._masks = role_registry.find(self.roles), role_registry.find_any(self.any_roles)
+            self._size = size
+
+        return self._masks
+
+
+def _role_masks(roles: Optional[List[str]], any_roles: Optional[List[str]]) -> Optional[_RoleMasks]:
+    if roles is None and any_roles is None:
+        return None
+
+    return _RoleMasks(roles or [], any_roles or [])
+
+
+def _describe_scope(scope: Union[str, ScopeResolverFunction]) -> str:
+    if callable(scope):
+        return getattr(scope, "__qualname__", repr(scope))
 
-        return resolved_scope.replace(" ", "")
+    return scope.replace(" ", "")
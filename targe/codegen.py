@@ -0,0 +1,142 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .compact import _ALLOW, _EFFECT_MASK, _HAS_CHILDREN, _NO_EFFECT, _SEGMENT_BITS, CompactPolicies
+from .policy import CompiledPolicies, normalize_scope, wildcard_specificity
+
+# nodes with more children than this dispatch through a dict instead of an if chain
+_DISPATCH_THRESHOLD = 4
+
+
+def compile_evaluator(policies: Union[CompiledPolicies, CompactPolicies]) -> Callable[[str], bool]:
+    # every node of the merged trie becomes a function consuming the next scope segment,
+    # so evaluation does not check node structure and effects known upfront are inlined
+    compact = CompactPolicies.from_compiled(policies) if isinstance(policies, CompiledPolicies) else policies
+
+    children: List[List[Tuple[str, int]]] = [[] for _ in range(len(compact._nodes))]
+    for key, child in compact._children.items():
+        children[key >> _SEGMENT_BITS].append((compact._segments[key & ((1 << _SEGMENT_BITS) - 1)], child))
+
+    generator = _Generator(compact, children)
+    root = generator.generate(0)
+    namespace = generator.namespace
+    exec(compile("\n".join(generator.sources), "<targe.codegen>", "exec"), namespace)  # pylint: disable=exec-used
+
+    # dispatch tables refer to functions, so they can be filled only after execution
+    for table in generator.tables.values():
+        for segment, name in namespace[table].items():
+            namespace[table][segment] = namespace[name]
+
+    evaluate_root = namespace[root]
+
+    def evaluate(scope: str) -> bool:
+        if "," not in scope:
+            return evaluate_root(iter(scope.replace(" ", "").split(":")), False)
+
+        for item in normalize_scope(scope):
+            if evaluate_root(iter(item.split(":")), False):
+                return True
+
+        return False
+
+    return evaluate
+
+
+class _Generator:
+    def __init__(self, compact: CompactPolicies, children: List[List[Tuple[str, int]]]):
+        self.compact = compact
+        self.children = children
+        self.namespace: Dict[str, Any] = {}
+        self.sources: List[str] = []
+        # nodes with identical code (e.g. subtrees repeated for every resource id)
+        # share a single function, so the amount of generated code stays small
+        self.functions: Dict[str, str] = {}
+        self.tables: Dict[Tuple[Tuple[str, str], ...], str] = {}
+        self.names: Dict[int, str] = {}
+
+    def generate(self, node: int) -> str:
+        name = self.names.get(node)
+        if name is None:
+            edges = [(segment, self.generate(child)) for segment, child in self.children[node]]
+            body = self._generate_body(node, edges)
+            name = self.functions.get(body)
+            if name is None:
+                name = self.functions[body] = f"_n{len(self.functions)}"
+                self.sources.append(f"def {name}(parts, allowed):\n{body}")
+            self.names[node] = name
+
+        return name
+
+    def _generate_body(self, node: int, edges: List[Tuple[str, str]]) -> str:
+        flags = self.compact._nodes
+        effect = flags[node] & _EFFECT_MASK
+        any_child = next((child for segment, child in self.children[node] if segment == "*"), None)
+        any_effect = flags[any_child] & _EFFECT_MASK if any_child is not None else _NO_EFFECT
+
+        # scope ends at this node: own effect decides, then the one of `*` child
+        if effect != _NO_EFFECT:
+            on_end = repr(effect == _ALLOW)
+        elif any_effect == _ALLOW:
+            on_end = "True"
+        else:
+            on_end = "allowed"
+
+        lines = [
+            "    part = next(parts, None)",
+            "    if part is None:",
+            f"        return {on_end}",
+        ]
+
+        # scope has ended prematurely, current effect decides
+        if not flags[node] & _HAS_CHILDREN:
+            lines.append("    return allowed")
+            return "\n".join(lines)
+
+        if any_effect != _NO_EFFECT:
+            lines.append(f"    allowed = {any_effect == _ALLOW!r}")
+
+        if len(edges) > _DISPATCH_THRESHOLD:
+            lines += [
+                f"    child = {self._table(edges)}.get(part)",
+                "    if child is not None:",
+                "        return child(parts, allowed)",
+            ]
+        else:
+            for segment, child in edges:
+                lines += [f"    if part == {segment!r}:", f"        return {child}(parts, allowed)"]
+
+        # wildcards are tested from the most specific one, so the first match wins
+        targets = dict(edges)
+        wildcards = sorted((segment for segment in targets if segment.count("*") == 1), key=wildcard_specificity)
+        for wildcard in reversed(wildcards):
+            condition = _wildcard_condition(wildcard)
+            if condition is None:
+                lines.append(f"    return {targets[wildcard]}(parts, allowed)")
+                return "\n".join(lines)
+            lines += [f"    if {condition}:", f"        return {targets[wildcard]}(parts, allowed)"]
+
+        lines.append("    return allowed")
+
+        return "\n".join(lines)
+
+    def _table(self, edges: List[Tuple[str, str]]) -> str:
+        key = tuple(sorted(edges))
+        name = self.tables.get(key)
+        if name is None:
+            name = self.tables[key] = f"_t{len(self.tables)}"
+            self.namespace[name] = dict(edges)
+
+        return name
+
+
+def _wildcard_condition(pattern: str) -> Optional[str]:
+    # same as `match_pattern`: literal parts have to occur within the segment in order
+    prefix, suffix = pattern.split("*")
+    if prefix and suffix:
+        return f"{prefix!r} in part and part.find({suffix!r}, part.find({prefix!r}) + {len(prefix)}) != -1"
+    if prefix or suffix:
+        return f"{prefix or suffix!r} in part"
+
+    return None
+
+
+__all__ = ["compile_evaluator"]
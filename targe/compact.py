@@ -0,0 +1,296 @@
+from itertools import repeat
+from operator import contains
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .policy import CompiledPolicies, Policy, PolicyEffect, WildcardIndex, normalize_scope
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+# every node is described by a single byte: two lowest bits keep an effect
+# and the third one tells whether the node has any children
+_EFFECT_MASK = 0b011
+_HAS_CHILDREN = 0b100
+
+_NO_EFFECT = 0
+_ALLOW = 1
+_DENY = 2
+
+_EFFECTS = {
+    PolicyEffect.ALLOW: _ALLOW,
+    PolicyEffect.DENY: _DENY,
+}
+
+# segment id reserved for the `*` segment
+_ANY = 0
+
+# child tables are keyed by `node_id << _SEGMENT_BITS | segment_id`
+_SEGMENT_BITS = 32
+
+# token values used by batch evaluation
+_UNKNOWN_SEGMENT = -1
+_END_OF_SCOPE = -2
+
+
+class CompactPolicies:
+    def __init__(self):
+        self._segment_ids: Dict[str, int] = {"*": _ANY}
+        self._segments: List[str] = ["*"]
+        self._nodes = bytearray(1)
+        self._children: Dict[int, int] = {}
+        self._wildcards: Dict[int, WildcardIndex] = {}
+        # arrays used by batch evaluation, built on demand
+        self._arrays: Optional[Tuple[Any, ...]] = None
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @classmethod
+    def from_compiled(cls, compiled: CompiledPolicies) -> "CompactPolicies":
+        # merges all layers of compiled policies into a single trie; group members and
+        # layers leading to the same nodes share a single compact node, so the result
+        # is meant to be queried only and no policies should be attached to it
+        instance = cls()
+        instance._merge(compiled._roots(), 0, {})
+
+        return instance
+
+    def _merge(self, nodes: List[dict], node: int, merged: Dict[Tuple[int, ...], int]) -> None:
+        effect = next((item["$effect"] for item in nodes if "$effect" in item), None)
+        if effect is not None:
+            self._nodes[node] |= _EFFECTS[effect]
+
+        # children of all nodes by segment, ordered by precedence
+        children: Dict[str, List[dict]] = {}
+        for item in nodes:
+            for key, child in item.get("$nodes", {}).items():
+                for member in key.split(","):
+                    children.setdefault(member, []).append(child)
+
+        if children:
+            self._nodes[node] |= _HAS_CHILDREN
+
+        for member, member_nodes in children.items():
+            identity = tuple(map(id, member_nodes))
+            child = merged.get(identity)
+            if child is None:
+                child = len(self._nodes)
+                self._nodes.append(_NO_EFFECT)
+                merged[identity] = child
+                self._merge(member_nodes, child, merged)
+
+            self._children[node << _SEGMENT_BITS | self._intern(member)] = child
+            if member.count("*") == 1:
+                self._wildcards.setdefault(node, WildcardIndex()).add(member)
+
+    def attach(self, policy: Policy) -> None:
+        self._arrays = None
+        scopes = normalize_scope(policy.scope)
+        for scope in scopes:
+            self._attach_scope(scope, policy.effect)
+
+    def _intern(self, segment: str) -> int:
+        segment_id = self._segment_ids.get(segment)
+        if segment_id is None:
+            segment_id = len(self._segments)
+            self._segment_ids[segment] = segment_id
+            self._segments.append(segment)
+
+        return segment_id
+
+    def _attach_scope(self, scope: str, effect: PolicyEffect) -> None:
+        node = 0
+        for index in scope.split(":"):
+            index = index.strip()
+            segment_id = self._intern(index)
+            key = node << _SEGMENT_BITS | segment_id
+            self._nodes[node] |= _HAS_CHILDREN
+
+            child = self._children.get(key)
+            if child is None:
+                child = len(self._nodes)
+                self._nodes.append(_NO_EFFECT)
+                self._children[key] = child
+
+                if index.count("*") == 1:
+                    self._wildcards.setdefault(node, WildcardIndex()).add(index)
+
+            node = child
+
+        self._nodes[node] = (self._nodes[node] & ~_EFFECT_MASK) | _EFFECTS[effect]
+
+    def is_allowed(self, scope: str) -> bool:
+        if "," not in scope:
+            return self._is_allowed(scope.replace(" ", ""))
+
+        scopes = normalize_scope(scope)
+        for scope in scopes:
+            if self._is_allowed(scope):
+                return True
+
+        return False
+
+    def _is_allowed(self, scope: str) -> bool:
+        nodes = self._nodes
+        children = self._children
+
+        if not nodes[0]:
+            return False
+
+        node = 0
+        effect = _DENY
+        interrupted = False
+
+        for part in scope.split(":"):
+            if not nodes[node] & _HAS_CHILDREN:
+                interrupted = True
+                break
+
+            base = node << _SEGMENT_BITS
+            any_child = children.get(base)
+            if any_child is not None and nodes[any_child] & _EFFECT_MASK:
+                effect = nodes[any_child] & _EFFECT_MASK
+
+            segment_id = self._segment_ids.get(part)
+            child = children.get(base | segment_id) if segment_id is not None else None
+            if child is not None:
+                node = child
+                continue
+
+            wildcards = self._wildcards.get(node)
+            wildcard = wildcards.match(part) if wildcards is not None else None
+            if wildcard is not None:
+                node = children[base | self._segment_ids[wildcard]]
+                continue
+
+            interrupted = True
+            break
+
+        if not interrupted:
+            if nodes[node] & _EFFECT_MASK:
+                effect = nodes[node] & _EFFECT_MASK
+            elif effect != _ALLOW:
+                any_child = children.get(node << _SEGMENT_BITS)
+                effect = nodes[any_child] & _EFFECT_MASK if any_child is not None else _DENY
+
+        return effect == _ALLOW
+
+    def is_allowed_many(self, scopes: Sequence[str]) -> Union[List[bool], "numpy.ndarray"]:
+        if numpy is None:
+            return [self.is_allowed(scope) for scope in scopes]
+
+        scopes = list(scopes)
+        if not self._nodes[0]:
+            return numpy.zeros(len(scopes), dtype=bool)
+
+        # repeated scopes are evaluated once
+        unique = list(dict.fromkeys(scopes))
+        result = numpy.zeros(len(unique), dtype=bool)
+
+        # scopes with groups are evaluated one by one
+        grouped = numpy.fromiter(map(contains, unique, repeat(",")), dtype=bool, count=len(unique))
+        for row in numpy.flatnonzero(grouped).tolist():
+            result[row] = self.is_allowed(unique[row])
+
+        rows = numpy.flatnonzero(~grouped)
+        if len(rows):
+            queries = unique if len(rows) == len(unique) else [unique[row] for row in rows.tolist()]
+            result[rows] = self._evaluate_many(queries) == _ALLOW
+
+        if len(unique) == len(scopes):
+            return result
+
+        index = dict(zip(unique, range(len(unique))))
+        return result[numpy.fromiter(map(index.__getitem__, scopes), dtype=numpy.int64, count=len(scopes))]
+
+    def _freeze(self) -> Tuple[Any, ...]:
+        if self._arrays is None:
+            keys = numpy.array(sorted(self._children), dtype=numpy.int64)
+            values = numpy.array([self._children[key] for key in keys.tolist()], dtype=numpy.int64)
+            flags = numpy.frombuffer(bytes(self._nodes), dtype=numpy.uint8)
+            # the `*` child of every node (-1 if there is none) and its effect
+            any_children = numpy.full(len(self._nodes), -1, dtype=numpy.int64)
+            any_keys = keys[(keys & ((1 << _SEGMENT_BITS) - 1)) == _ANY]
+            any_children[any_keys >> _SEGMENT_BITS] = values[numpy.searchsorted(keys, any_keys)]
+            any_effects = numpy.where(any_children >= 0, flags[any_children] & _EFFECT_MASK, _NO_EFFECT)
+            # nodes having wildcard patterns other than `*`, their segments are matched one by one
+            patterned = numpy.zeros(len(self._nodes), dtype=bool)
+            patterned[[node for node, wildcards in self._wildcards.items() if wildcards - {"*"}]] = True
+            self._arrays = (keys, values, flags, any_children, any_effects.astype(numpy.uint8), patterned)
+
+        return self._arrays
+
+    def _evaluate_many(self, scopes: List[str]) -> "numpy.ndarray":
+        keys, values, flags, any_children, any_effects, patterned = self._freeze()
+        if not len(keys):
+            keys = numpy.array([-1], dtype=numpy.int64)
+            values = numpy.array([0], dtype=numpy.int64)
+
+        # tokenize all scopes into a single matrix of segment ids
+        parts = ":".join(scopes).replace(" ", "").split(":")
+        lengths = numpy.fromiter(map(str.count, scopes, repeat(":")), dtype=numpy.int64, count=len(scopes)) + 1
+        starts = numpy.cumsum(lengths) - lengths
+        ids = numpy.fromiter(map(self._segment_ids.get, parts, repeat(_UNKNOWN_SEGMENT)), dtype=numpy.int64)
+        tokens = numpy.full((len(scopes), int(lengths.max())), _END_OF_SCOPE, dtype=numpy.int64)
+        tokens[
+            numpy.repeat(numpy.arange(len(scopes)), lengths), numpy.arange(len(parts)) - numpy.repeat(starts, lengths)
+        ] = ids
+
+        nodes = numpy.zeros(len(scopes), dtype=numpy.int64)
+        effects = numpy.full(len(scopes), _DENY, dtype=numpy.uint8)
+        decisions = numpy.zeros(len(scopes), dtype=numpy.uint8)
+        active = numpy.ones(len(scopes), dtype=bool)
+
+        # all scopes are advanced through the trie level by level
+        for level in range(tokens.shape[1]):
+            rows = numpy.flatnonzero(active & (tokens[:, level] != _END_OF_SCOPE))
+            if not len(rows):
+                break
+
+            current = nodes[rows]
+            # scope has ended prematurely, current effect decides
+            interrupted = (flags[current] & _HAS_CHILDREN) == 0
+            decisions[rows[interrupted]] = effects[rows[interrupted]]
+            active[rows[interrupted]] = False
+            rows, current = rows[~interrupted], current[~interrupted]
+
+            any_effect = any_effects[current]
+            effects[rows] = numpy.where(any_effect != _NO_EFFECT, any_effect, effects[rows])
+
+            segments = tokens[rows, level]
+            lookup = current << _SEGMENT_BITS | numpy.maximum(segments, 0)
+            positions = numpy.minimum(numpy.searchsorted(keys, lookup), len(keys) - 1)
+            found = (segments >= 0) & (keys[positions] == lookup)
+            nodes[rows[found]] = values[positions[found]]
+
+            # segments without exact match follow the `*` child, unless the node has other wildcard patterns
+            rows, current = rows[~found], current[~found]
+            plain = ~patterned[current]
+            any_child = any_children[current[plain]]
+            nodes[rows[plain][any_child >= 0]] = any_child[any_child >= 0]
+            ended = rows[plain][any_child < 0]
+            decisions[ended] = effects[ended]
+            active[ended] = False
+
+            rows, current = rows[~plain], current[~plain]
+            for row, node, position in zip(rows.tolist(), current.tolist(), (starts[rows] + level).tolist()):
+                wildcard = self._wildcards[node].match(parts[position])
+                if wildcard is None:
+                    decisions[row] = effects[row]
+                    active[row] = False
+                else:
+                    nodes[row] = self._children[node << _SEGMENT_BITS | self._segment_ids[wildcard]]
+
+        rows = numpy.flatnonzero(active)
+        current = nodes[rows]
+        own_effect = flags[current] & _EFFECT_MASK
+        any_effect = numpy.where(any_effects[current] != _NO_EFFECT, any_effects[current], _DENY)
+        fallback = numpy.where(effects[rows] == _ALLOW, _ALLOW, any_effect)
+        decisions[rows] = numpy.where(own_effect != _NO_EFFECT, own_effect, fallback)
+
+        return decisions
+
+
+__all__ = ["CompactPolicies"]
@@ -0,0 +1,96 @@
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from .policy import Policy, group_scope
+from .utils import ObservableList
+
+
+class PolicyDiff(NamedTuple):
+    added: List[Policy]
+    removed: List[Policy]
+    # pairs of the old and the new version of policies having the same scope but a different effect
+    changed: List[Tuple[Policy, Policy]]
+    # policies kept by the new version, but out of their order, starting with the first one out of order
+    moved: List[Policy]
+    # the new version of policies in order of precedence, the list ends up in this order once the diff is applied
+    policies: List[Policy]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed or self.moved)
+
+
+def _policy_key(policy: Policy) -> str:
+    # members of groups are sorted, so `a:x,y` and `a:y,x` are the same scope
+    return ":".join(",".join(sorted(section)) for section in group_scope(policy.scope))
+
+
+def _last_policies(policies: Iterable[Policy]) -> Dict[str, Policy]:
+    # the last policy wins if a scope is repeated, as it does when policies are compiled,
+    # so policies are ordered by their last occurrence
+    result: Dict[str, Policy] = {}
+    for policy in policies:
+        key = _policy_key(policy)
+        result.pop(key, None)
+        result[key] = policy
+
+    return result
+
+
+def diff_policies(old: Iterable[Policy], new: Iterable[Policy]) -> PolicyDiff:
+    # policies are identified by their scopes
+    new = list(new)
+    old_policies = _last_policies(old)
+    new_policies = _last_policies(new)
+
+    old_order = [key for key in old_policies if key in new_policies]
+    new_order = [key for key in new_policies if key in old_policies]
+    # policies following the first one out of order are re-attached anyway when the diff is applied
+    moved_from = next((index for index, key in enumerate(old_order) if new_order[index] != key), len(new_order))
+
+    return PolicyDiff(
+        added=[policy for key, policy in new_policies.items() if key not in old_policies],
+        removed=[policy for key, policy in old_policies.items() if key not in new_policies],
+        changed=[
+            (old_policies[key], policy)
+            for key, policy in new_policies.items()
+            if key in old_policies and old_policies[key].effect != policy.effect
+        ],
+        moved=[new_policies[key] for key in new_order[moved_from:]],
+        policies=new,
+    )
+
+
+def apply_diff(policies: ObservableList, diff: PolicyDiff) -> None:
+    # changes are applied one by one to the observed list (e.g. `Role.policies` or `Actor.policies`),
+    # so compiled policies are updated only for affected scopes; changed policies are replaced in place,
+    # and policies following the first position the list differs from the new version are re-attached
+    live = _last_policies(policies)
+
+    for policy in diff.removed:
+        current = live.pop(_policy_key(policy), None)
+        if current is not None:
+            policies.remove(current)
+
+    for policy, new_policy in diff.changed:
+        key = _policy_key(policy)
+        current = live.get(key)
+        if current is not None:
+            policies.replace(current, new_policy)
+        live[key] = new_policy
+
+    added = set(map(id, diff.added))
+    expected: List[Policy] = []
+    for policy in reversed(diff.policies):
+        # policies kept by the diff stay the same objects, repeated scopes are taken from the new version
+        current = live.pop(_policy_key(policy), None) if id(policy) not in added else None
+        expected.append(current or policy)
+    expected.reverse()
+
+    index = 0
+    while index < len(policies) and index < len(expected) and policies[index] is expected[index]:
+        index += 1
+
+    if index < len(policies) or index < len(expected):
+        policies[index:] = expected[index:]
+
+
+__all__ = ["PolicyDiff", "apply_diff", "diff_policies"]
@@ -22,5 +22,27 @@ class AuthorizationError(TargeError):
     invalid_actor: ValueError
 
 
+class AsyncSupportError(TargeError):
+    awaitable_in_sync_call: TypeError
+
+
 class InvalidIdentifierNameError(TargeError):
     invalid_role_name: ValueError
+
+
+class RoleHierarchyError(TargeError):
+    cyclic_inheritance: ValueError
+
+
+class InvalidSnapshotError(TargeError):
+    invalid_format: ValueError
+    unsupported_version: ValueError
+
+
+class ActorLoaderError(TargeError):
+    unexpected_batch_size: ValueError
+
+
+class RepositoryError(TargeError):
+    actor_not_found: LookupError
+    role_not_found: LookupError
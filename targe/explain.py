@@ -0,0 +1,161 @@
+from time import perf_counter_ns
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from .policy import CompiledPolicies, Policy, PolicyEffect, _child, normalize_scope, wildcard_specificity
+
+
+class TraceStep(NamedTuple):
+    segment: str
+    # trie edge followed by the segment, `None` when traversal was interrupted
+    edge: Optional[str]
+    # wildcard pattern matched by the segment, if any
+    wildcard: Optional[str]
+    # trie nodes visited for the segment, one for every layer having the path
+    nodes: int
+    # effect inherited from `*` edges so far
+    effect: PolicyEffect
+
+
+class Explanation(NamedTuple):
+    scope: str
+    allowed: bool
+    # policy deciding the effect and its origin (e.g. role or actor), both are
+    # `None` when no policy matched and access was denied by default
+    policy: Optional[Policy]
+    origin: Any
+    steps: List[TraceStep]
+    interrupted: bool
+    segments: int
+    nodes: int
+    wildcard_comparisons: int
+    elapsed_ns: int
+
+    def __str__(self) -> str:
+        decision = "allowed" if self.allowed else "denied"
+        if self.policy is None:
+            return f"{self.scope} - {decision} by default"
+
+        return f"{self.scope} - {decision} by {self.policy.effect.value} `{self.policy.scope}` ({self.origin!r})"
+
+
+# node of a trie together with compiled policies it belongs to
+_Node = Tuple[dict, CompiledPolicies]
+
+
+def explain(compiled: CompiledPolicies, scope: str) -> Explanation:
+    # mirrors `CompiledPolicies.is_allowed` with additional bookkeeping, so regular
+    # lookups are not slowed down; grouped scopes are explained one by one and the
+    # first allowed one (or the last one) is returned with counters of all of them
+    start = perf_counter_ns()
+    scopes = normalize_scope(scope) if "," in scope else [scope.replace(" ", "")]
+    roots = [(item.permissions, item) for item in compiled._compiled() if item.permissions]
+
+    explanations = []
+    for item in scopes:
+        explanations.append(_explain(roots, item))
+        if explanations[-1].allowed:
+            break
+
+    return explanations[-1]._replace(
+        segments=sum(item.segments for item in explanations),
+        nodes=sum(item.nodes for item in explanations),
+        wildcard_comparisons=sum(item.wildcard_comparisons for item in explanations),
+        elapsed_ns=perf_counter_ns() - start,
+    )
+
+
+def _explain(roots: List[_Node], scope: str) -> Explanation:
+    nodes = roots
+    effect = PolicyEffect.DENY
+    decided: Optional[_Node] = None
+    steps: List[TraceStep] = []
+    visited = 0
+    comparisons = 0
+    interrupted = not nodes
+
+    for part in scope.split(":") if nodes else []:
+        nodes = [(node, owner) for node, owner in nodes if "$nodes" in node]
+        # scope has ended prematurely, current effect decides
+        if not nodes:
+            interrupted = True
+            break
+
+        visited += len(nodes)
+        any_node = _any_node(nodes)
+        if any_node is not None:
+            effect, decided = any_node[0]["$effect"], any_node
+
+        edge = part
+        wildcard = None
+        children = _children(nodes, part)
+        if not children:
+            candidates = []
+            for node, _ in nodes:
+                found, probes = node["$wildcards"].trace_match(part)
+                comparisons += probes
+                if found:
+                    candidates.append(found)
+
+            wildcard = max(candidates, key=wildcard_specificity, default=None)
+            if wildcard:
+                edge = wildcard
+                children = _children(nodes, wildcard)
+
+        steps.append(TraceStep(part, _edge(nodes, edge) if children else None, wildcard, len(nodes), effect))
+        if not children:
+            interrupted = True
+            break
+
+        nodes = children
+
+    if not interrupted:
+        own = next(((node, owner) for node, owner in nodes if "$effect" in node), None)
+        if own is not None:
+            effect, decided = own[0]["$effect"], own
+        # there is no rule for current scope, lets check for wildcard
+        elif effect != PolicyEffect.ALLOW:
+            any_node = _any_node([(node, owner) for node, owner in nodes if "$nodes" in node])
+            effect, decided = (any_node[0]["$effect"], any_node) if any_node else (PolicyEffect.DENY, None)
+
+    policy = decided[1]._node_policies(decided[0])[-1] if decided is not None else None
+
+    return Explanation(
+        scope=scope,
+        allowed=effect == PolicyEffect.ALLOW,
+        policy=policy,
+        origin=decided[1].origin if decided is not None else None,
+        steps=steps,
+        interrupted=interrupted,
+        segments=len(steps),
+        nodes=visited,
+        wildcard_comparisons=comparisons,
+        elapsed_ns=0,
+    )
+
+
+def _any_node(nodes: List[_Node]) -> Optional[_Node]:
+    for node, owner in nodes:
+        any_node = node["$nodes"].get("*")
+        if any_node is not None and "$effect" in any_node:
+            return any_node, owner
+
+    return None
+
+
+def _children(nodes: List[_Node], index: str) -> List[_Node]:
+    children = ((_child(node, index), owner) for node, owner in nodes)
+    return [(child, owner) for child, owner in children if child is not None]
+
+
+def _edge(nodes: List[_Node], index: str) -> str:
+    # edge of the first layer leading to the index, grouped edges are keyed by all their members
+    for node, _ in nodes:
+        if index in node["$nodes"]:
+            return index
+        if index in node.get("$groups", {}):
+            return node["$groups"][index]
+
+    return index
+
+
+__all__ = ["Explanation", "TraceStep", "explain"]
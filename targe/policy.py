@@ -1,6 +1,31 @@
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
 from datetime import datetime
 from enum import Enum
-from typing import List
+from itertools import count, product
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .utils import ListChange, ListReplacement, utc_from_ns
+
+if TYPE_CHECKING:
+    from .explain import Explanation
 
 
 class PolicyEffect(Enum):
@@ -8,6 +33,11 @@ class PolicyEffect(Enum):
     DENY = "deny"
 
 
+def group_scope(scope: str) -> List[List[str]]:
+    # segments are interned, so tries of many actors and roles share the same strings
+    return [list(dict.fromkeys(map(sys.intern, section.split(",")))) for section in scope.replace(" ", "").split(":")]
+
+
 def normalize_scope(scope: str) -> List[str]:
     exploded_scope = scope.replace(" ", "").split(":")
     scopes = []
@@ -20,17 +50,24 @@ def normalize_scope(scope: str) -> List[str]:
         else:
             scopes = [
                 f"{ready_scope}:{normalised_section}"
-                for ready_scope in scopes for normalised_section in exploded_section
+                for ready_scope in scopes
+                for normalised_section in exploded_section
             ]
 
     return scopes
 
 
 class Policy:
+    __slots__ = ("scope", "effect", "_created_at")
+
     def __init__(self, scope: str, access: PolicyEffect = PolicyEffect.ALLOW):
-        self.scope = scope
+        self.scope = sys.intern(scope)
         self.effect = access
-        self.created_at = datetime.utcnow()
+        self._created_at = time.time_ns()
+
+    @property
+    def created_at(self) -> datetime:
+        return utc_from_ns(self._created_at)
 
     @classmethod
     def allow(cls, scope: str) -> "Policy":
@@ -41,106 +78,681 @@ class Policy:
         return Policy(scope, PolicyEffect.DENY)
 
 
+_versions = count(1)
+
+# grouped scopes having up to this number of combinations are expanded
+_EXPAND_LIMIT = 8
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+PolicyObserver = Callable[["CompiledPolicies", Union[ListChange, ListReplacement, None]], Any]
+
+
 class CompiledPolicies:
-    def __init__(self):
-        self.permissions = {}
+    __slots__ = (
+        "permissions",
+        "origin",
+        "_layers",
+        "_policies",
+        "_references",
+        "_version",
+        "_cache_size",
+        "_cache",
+        "_cache_version",
+        "_cache_hits",
+        "_cache_misses",
+        "_snapshot",
+        "_snapshot_version",
+        "_evaluator",
+        "_evaluator_version",
+        "_observers",
+        "_merged",
+        "_dependents",
+        "__weakref__",
+    )
+
+    def __init__(self, layers: Sequence["CompiledPolicies"] = (), cache_size: int = 0, origin: Any = None):
+        self.permissions: Dict[str, Any] = {}
+        # owner of the policies (e.g. role or actor), reported when explaining decisions
+        self.origin = origin
+        # compiled policies consulted after own permissions, in order of precedence
+        self._layers: Tuple[CompiledPolicies, ...] = tuple(layers)
+        # attached policies in order of precedence, the last one wins
+        self._policies: List[Policy] = []
+        # policies attached to each node having an effect (by node's id) in order of precedence,
+        # last one decides on the effect of the node; most nodes have a single policy, which is
+        # kept without a list, and compiled policies without own policies (e.g. actors having
+        # only roles) keep no references at all
+        self._references: Optional[Dict[int, Union[Policy, List[Policy]]]] = None
+        # refreshed on every change of these or any of layers (changes are pushed to dependents),
+        # so cached decisions, snapshots and evaluators can be dropped
+        self._version = next(_versions)
+
+        self._cache_size = cache_size
+        # created on first lookup, most of compiled policies are not cached
+        self._cache: "Optional[OrderedDict[str, bool]]" = None
+        self._cache_version = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        # compact snapshot used by batch evaluation
+        self._snapshot: Any = None
+        self._snapshot_version = 0
+        # generated evaluator, see `evaluator`
+        self._evaluator: Optional[Callable[[str], bool]] = None
+        self._evaluator_version = 0
+        # notified about every change, see `observe`
+        self._observers: Optional[List[PolicyObserver]] = None
+        # policies of this and all layers merged into a single trie used by lookups, together with
+        # the version it was built for; dropped on any change within layers
+        self._merged: Optional[Tuple[int, dict]] = None
+        # compiled policies using this one as a layer (e.g. actors of a role), created with the first one
+        self._dependents: "Optional[weakref.WeakSet[CompiledPolicies]]" = None
+        for layer in self._layers:
+            layer._depend(self)
+
+    @property
+    def layers(self) -> Tuple["CompiledPolicies", ...]:
+        return self._layers
+
+    @layers.setter
+    def layers(self, layers: Sequence["CompiledPolicies"]) -> None:
+        for layer in self._layers:
+            if layer._dependents is not None:
+                layer._dependents.discard(self)
+        self._layers = tuple(layers)
+        for layer in self._layers:
+            layer._depend(self)
+        self._changed()
+        self._notify(None)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self._cache_hits, self._cache_misses, self._cache_size, len(self._cache or ()))
+
+    def observe(self, observer: "PolicyObserver") -> None:
+        if self._observers is None:
+            self._observers = []
+        self._observers.append(observer)
+
+    def unobserve(self, observer: "PolicyObserver") -> None:
+        if self._observers is not None and observer in self._observers:
+            self._observers.remove(observer)
+
+    def _depend(self, dependent: "CompiledPolicies") -> None:
+        if self._dependents is None:
+            self._dependents = weakref.WeakSet()
+        self._dependents.add(dependent)
+
+    def _changed(self) -> None:
+        self._version = next(_versions)
+        self._merged = None
+        if not self._dependents:
+            return
+
+        # dependents may share layers (e.g. roles inheriting from the same role), so each is visited once
+        pending = list(self._dependents)
+        seen = set()
+        while pending:
+            dependent = pending.pop()
+            if id(dependent) in seen:
+                continue
+            seen.add(id(dependent))
+            dependent._version = self._version
+            dependent._merged = None
+            if dependent._dependents:
+                pending.extend(dependent._dependents)
+
+    def _notify(self, change: Union[ListChange, ListReplacement, None]) -> None:
+        # `None` tells that layers were changed
+        if self._observers:
+            for observer in list(self._observers):
+                observer(self, change)
 
     def attach(self, policy: Policy) -> None:
-        scopes = normalize_scope(policy.scope)
-        for scope in scopes:
-            self._attach_scope(scope, policy.effect)
+        self._policies.append(policy)
+        self._attach_sections(self.permissions, group_scope(policy.scope), policy)
+        self._changed()
+        self._notify(ListChange([policy], []))
+
+    def detach(self, policy: Policy) -> None:
+        try:
+            self._policies.remove(policy)
+        except ValueError:
+            return
+
+        self._detach_sections(self.permissions, group_scope(policy.scope), policy)
+        self._changed()
+        self._notify(ListChange([], [policy]))
+
+    def apply_change(self, change: Union[ListChange, ListReplacement]) -> None:
+        # keeps compiled policies in sync with an observed list of policies
+        if isinstance(change, ListReplacement):
+            for policy, new_policy in change.replaced:
+                self.replace(policy, new_policy)
+            return
+
+        for policy in change.removed:
+            self.detach(policy)
+
+        for policy in change.added:
+            self.attach(policy)
+
+    def replace(self, policy: Policy, new_policy: Policy) -> None:
+        try:
+            index = self._policies.index(policy)
+        except ValueError:
+            return
+
+        self._policies[index] = new_policy
+        sections = group_scope(policy.scope)
+        new_sections = group_scope(new_policy.scope)
+        if sections == new_sections:
+            # policies share all nodes, so the new one takes place of the old one keeping its precedence
+            self._replace_sections(self.permissions, sections, policy, new_policy)
+        else:
+            # the new policy keeps the position of the old one, so it is placed before
+            # policies following it within nodes it reaches
+            following = set(map(id, self._policies[index + 1 :]))
+            self._detach_sections(self.permissions, sections, policy)
+            self._attach_sections(self.permissions, new_sections, new_policy, following)
+
+        self._changed()
+        self._notify(ListReplacement([(policy, new_policy)]))
+
+    def _attach_sections(
+        self, node: dict, sections: List[List[str]], policy: Policy, following: Optional[Set[int]] = None
+    ) -> None:
+        if not sections:
+            references = self._node_policies(node)
+            index = len(references)
+            while following and index and id(references[index - 1]) in following:
+                index -= 1
+            references.insert(index, policy)
+            self._set_node_policies(node, references)
+            return
+
+        if "$nodes" not in node:
+            node["$nodes"] = {}
+            node["$wildcards"] = WildcardIndex()
+
+        remaining = dict.fromkeys(sections[0])
+        for key in _child_keys(node, sections[0]):
+            members = key.split(",")
+            overlap = [member for member in members if member in remaining]
+            if len(overlap) < len(members):
+                # group only partially overlaps, so it is split to keep sibling edges disjoint
+                rest = [member for member in members if member not in remaining]
+                child = node["$nodes"].pop(key)
+                _set_child(node, rest, child)
+                key = _set_child(node, overlap, self._copy_node(child))
+
+            self._attach_sections(node["$nodes"][key], sections[1:], policy, following)
+            for member in overlap:
+                del remaining[member]
+
+        # `*` always keeps its own edge, so it can be looked up directly
+        pending = [["*"], [member for member in remaining if member != "*"]] if "*" in remaining else [list(remaining)]
+        for members in pending:
+            if not members:
+                continue
+
+            key = _set_child(node, members, {})
+            for member in members:
+                if member.count("*") == 1:
+                    node["$wildcards"].add(member)
+
+            self._attach_sections(node["$nodes"][key], sections[1:], policy, following)
+
+    def _detach_sections(self, node: dict, sections: List[List[str]], policy: Policy) -> None:
+        if not sections:
+            references = self._node_policies(node)
+            index = next((index for index, item in enumerate(references) if item is policy), None)
+            if index is not None:
+                del references[index]
+                self._set_node_policies(node, references)
+            return
+
+        if "$nodes" not in node:
+            return
+
+        section = set(sections[0])
+        for key in _child_keys(node, sections[0]):
+            members = key.split(",")
+            if not section.issuperset(members):
+                continue
 
-    def _attach_scope(self, scope: str, effect: PolicyEffect) -> None:
-        current = self.permissions
-        for index in scope.split(":"):
-            if "$nodes" not in current:
-                current["$nodes"] = {}
+            child = node["$nodes"][key]
+            self._detach_sections(child, sections[1:], policy)
+
+            # prune nodes which are no longer referenced by any scope
+            if "$effect" not in child and "$nodes" not in child:
+                _remove_child(node, key)
+
+    def _replace_sections(self, node: dict, sections: List[List[str]], policy: Policy, new_policy: Policy) -> None:
+        if not sections:
+            references = self._node_policies(node)
+            index = next((index for index, item in enumerate(references) if item is policy), None)
+            if index is not None:
+                references[index] = new_policy
+                self._set_node_policies(node, references)
+            return
+
+        if "$nodes" not in node:
+            return
+
+        section = set(sections[0])
+        for key in _child_keys(node, sections[0]):
+            if section.issuperset(key.split(",")):
+                self._replace_sections(node["$nodes"][key], sections[1:], policy, new_policy)
+
+    def _node_policies(self, node: dict) -> List[Policy]:
+        # a copy of policies attached to the node, see `_references`
+        references = self._references.get(id(node)) if self._references else None
+        if references is None:
+            return []
+
+        return list(references) if isinstance(references, list) else [references]
+
+    def _set_node_policies(self, node: dict, policies: List[Policy]) -> None:
+        if self._references is None:
+            self._references = {}
+
+        if not policies:
+            # references are kept only for nodes having an effect
+            self._references.pop(id(node), None)
+            node.pop("$effect", None)
+            return
+
+        self._references[id(node)] = policies if len(policies) > 1 else policies[0]
+        node["$effect"] = policies[-1].effect
+
+    def _copy_node(self, node: dict) -> dict:
+        result: Dict[str, Any] = {}
+        for key, value in node.items():
+            if key == "$nodes":
+                result[key] = {index: self._copy_node(child) for index, child in value.items()}
+            elif key == "$wildcards":
+                result[key] = WildcardIndex(value)
+            elif key == "$groups":
+                result[key] = dict(value)
+            else:
+                result[key] = value
+
+        if "$effect" in node:
+            self._set_node_policies(result, self._node_policies(node))
+
+        return result
 
-            index = index.strip()
+    def is_allowed(self, scope: str) -> bool:
+        if not self._cache_size:
+            return self._is_allowed_scope(scope)
 
-            if index not in current["$nodes"]:
-                current["$nodes"][index] = {}
+        version = self._version
+        cache = self._cache
+        if cache is None or version != self._cache_version:
+            cache = self._cache = OrderedDict()
+            self._cache_version = version
 
-            if "$wildcards" not in current:
-                current["$wildcards"] = set()
+        key = scope.replace(" ", "")
+        try:
+            result = cache[key]
+            cache.move_to_end(key)
+            self._cache_hits += 1
+            return result
+        except KeyError:
+            self._cache_misses += 1
 
-            if index.count("*") == 1:
-                current["$wildcards"].add(index)
-                current["$wildcards"] = set(
-                    sorted(
-                        list(current["$wildcards"]),
-                        key=lambda key: len(key),
-                        reverse=True,
-                    )
-                )
+        result = self._is_allowed_scope(key)
+        cache[key] = result
+        if len(cache) > self._cache_size:
+            cache.popitem(last=False)
 
-            current = current["$nodes"][index]
+        return result
 
-        current["$effect"] = effect
+    def is_allowed_many(self, scopes: Sequence[str]) -> Sequence[bool]:
+        from .compact import CompactPolicies  # pylint: disable=import-outside-toplevel,cyclic-import
 
-    def is_allowed(self, scope: str) -> bool:
+        version = self.version
+        if self._snapshot is None or version != self._snapshot_version:
+            self._snapshot = CompactPolicies.from_compiled(self)
+            self._snapshot_version = version
+
+        return self._snapshot.is_allowed_many(scopes)
+
+    def evaluator(self) -> Callable[[str], bool]:
+        from .codegen import compile_evaluator  # pylint: disable=import-outside-toplevel,cyclic-import
+
+        version = self.version
+        if self._evaluator is None or version != self._evaluator_version:
+            self._evaluator = compile_evaluator(self)
+            self._evaluator_version = version
+
+        return self._evaluator
+
+    def explain(self, scope: str) -> "Explanation":
+        from .explain import explain  # pylint: disable=import-outside-toplevel,cyclic-import
+
+        return explain(self, scope)
+
+    def allowed_scopes(self, prefix: str = "") -> Iterator[str]:
+        # lazily walks the subtree under the prefix and yields defined scopes (wildcards included) which
+        # are allowed; policies should not be changed until the iteration is finished
+        roots = self._roots()
+        for item in normalize_scope(prefix) if prefix else [""]:
+            yield from _allowed_scopes(roots, item)
+
+    def _is_allowed_scope(self, scope: str) -> bool:
         if "," not in scope:
             return self._is_allowed(scope.replace(" ", ""))
 
-        scopes = normalize_scope(scope)
-        for scope in scopes:
-            if self._is_allowed(scope):
-                return True
+        root = self._root()
+        sections = [section.split(",") for section in scope.replace(" ", "").split(":")]
+        combinations = 1
+        for section in sections:
+            combinations *= len(section)
+
+        # a few combinations are cheaper to look up one by one than to walk with merged states
+        if combinations <= _EXPAND_LIMIT:
+            return any(_evaluate(root, ":".join(items)) for items in product(*sections))
+
+        # all groups are evaluated within a single traversal
+        return _evaluate_sections([root] if root else [], group_scope(scope))
+
+    def _compiled(self) -> List["CompiledPolicies"]:
+        result: List[CompiledPolicies] = []
+        seen = set()
+        pending = [self]
+        while pending:
+            compiled = pending.pop()
+            if id(compiled) in seen:
+                continue
+            seen.add(id(compiled))
+            result.append(compiled)
+            pending.extend(reversed(compiled._layers))
+
+        return result
 
-        return False
+    def _roots(self) -> List[dict]:
+        # tries of this and all layers in order of precedence
+        return [compiled.permissions for compiled in self._compiled() if compiled.permissions]
+
+    def _root(self) -> dict:
+        # lookups walk a single trie, so their cost does not depend on the number of layers (e.g. roles)
+        if not self._layers:
+            return self.permissions
+
+        version = self._version
+        merged = self._merged
+        if merged is not None and merged[0] == version:
+            return merged[1]
+
+        compiled = [item for item in self._compiled() if item.permissions]
+        if len(compiled) == 1:
+            root = compiled[0].permissions
+        else:
+            # policies are attached from the lowest precedence, so the last attached one wins as within
+            # a single trie; merged tries built while layers change are kept for their version only
+            result = CompiledPolicies()
+            for item in reversed(compiled):
+                for policy in item._policies:
+                    result._attach_sections(result.permissions, group_scope(policy.scope), policy)
+            root = result.permissions
+
+        self._merged = (version, root)
+
+        return root
 
     def _is_allowed(self, scope: str) -> bool:
-        scope_items = scope.split(":")
+        return _evaluate(self._root(), scope)
 
-        node = self.permissions
-        if not node:
-            return False
 
-        effect = PolicyEffect.DENY
-        interrupted = False
+def _evaluate(node: dict, scope: str) -> bool:
+    scope_items = scope.split(":")
 
-        for part in scope_items:
-            if "$nodes" not in node:
-                interrupted = True
-                break
+    if not node:
+        return False
 
-            if "*" in node["$nodes"] and "$effect" in node["$nodes"]["*"]:
-                effect = node["$nodes"]["*"]["$effect"]
+    effect = PolicyEffect.DENY
+    interrupted = False
 
-            # index exists in scope, so lets use it
-            if part in node["$nodes"]:
-                node = node["$nodes"][part]
-                continue
+    for part in scope_items:
+        if "$nodes" not in node:
+            interrupted = True
+            break
 
-            # early return if no wildcards are available
-            if not node["$wildcards"]:
-                interrupted = True
-                break
+        if "*" in node["$nodes"] and "$effect" in node["$nodes"]["*"]:
+            effect = node["$nodes"]["*"]["$effect"]
 
-            # search for matching wildcard
-            found_wildcard = next((wildcard for wildcard in node["$wildcards"] if match_pattern(part, wildcard)), None)
-            if found_wildcard:
-                node = node["$nodes"][found_wildcard]
-                continue
+        # index exists in scope, so lets use it
+        if part in node["$nodes"]:
+            node = node["$nodes"][part]
+            continue
 
-            # scope has ended prematurely, there is no definition and no wildcards
+        if "$groups" in node and part in node["$groups"]:
+            node = node["$nodes"][node["$groups"][part]]
+            continue
+
+        # early return if no wildcards are available
+        if not node["$wildcards"]:
             interrupted = True
             break
 
-        if not interrupted:
-            if "$effect" in node:
-                effect = node["$effect"]
-            # there is no rule for current scope, lets check for wildcard
-            elif effect != PolicyEffect.ALLOW:
-                try:
-                    effect = node["$nodes"]["*"]["$effect"]
-                except KeyError:
-                    effect = PolicyEffect.DENY
+        # search for the most specific matching wildcard
+        found_wildcard = node["$wildcards"].match(part)
+        if found_wildcard:
+            node = _child(node, found_wildcard)  # type: ignore
+            continue
+
+        # scope has ended prematurely, there is no definition and no wildcards
+        interrupted = True
+        break
+
+    if not interrupted:
+        if "$effect" in node:
+            effect = node["$effect"]
+        # there is no rule for current scope, lets check for wildcard
+        elif effect != PolicyEffect.ALLOW:
+            try:
+                effect = node["$nodes"]["*"]["$effect"]
+            except KeyError:
+                effect = PolicyEffect.DENY
+
+    return effect == PolicyEffect.ALLOW
+
+
+def _evaluate_sections(roots: List[dict], sections: List[List[str]]) -> bool:
+    # every state holds nodes of all layers reachable by the scope, ordered by precedence;
+    # states reached by different members of a group are merged, so the cost grows
+    # with the sum of group sizes instead of their product
+    if not roots:
+        return False
+
+    states = [(roots, PolicyEffect.DENY)]
+    for section in sections:
+        # sections without groups lead every state to at most one state, so there is nothing to merge
+        grouped: Optional[Dict[tuple, None]] = {} if len(section) > 1 else None
+        next_states: List[Tuple[List[dict], PolicyEffect]] = []
+        for nodes, effect in states:
+            nodes = [node for node in nodes if "$nodes" in node]
+            # scope has ended prematurely, current effect decides
+            if not nodes:
+                if effect == PolicyEffect.ALLOW:
+                    return True
+                continue
+
+            any_effect = _any_effect(nodes)
+            if any_effect is not None:
+                effect = any_effect
+
+            for part in section:
+                children = _children(nodes, part)
+                if not children:
+                    # search for the most specific wildcard matching in any of layers
+                    matches = [node["$wildcards"].match(part) for node in nodes if node["$wildcards"]]
+                    found_wildcard = max(filter(None, matches), key=wildcard_specificity, default=None)
+                    if found_wildcard:
+                        children = _children(nodes, found_wildcard)
+
+                if not children:
+                    if effect == PolicyEffect.ALLOW:
+                        return True
+                    continue
+
+                if grouped is not None:
+                    key = (tuple(map(id, children)), effect)
+                    if key in grouped:
+                        continue
+                    grouped[key] = None
+
+                next_states.append((children, effect))
+
+        states = next_states
+
+    for nodes, effect in states:
+        node_effect = next((node["$effect"] for node in nodes if "$effect" in node), None)
+        if node_effect is not None:
+            effect = node_effect
+        # there is no rule for current scope, lets check for wildcard
+        elif effect != PolicyEffect.ALLOW:
+            any_effect = _any_effect([node for node in nodes if "$nodes" in node])
+            effect = any_effect if any_effect is not None else PolicyEffect.DENY
+
+        if effect == PolicyEffect.ALLOW:
+            return True
+
+    return False
+
+
+def _allowed_scopes(roots: List[dict], prefix: str) -> Iterator[str]:
+    nodes = roots
+    path = prefix.split(":") if prefix else []
+
+    # prefix is followed the same way as in `_evaluate_sections`
+    for part in path:
+        nodes = [node for node in nodes if "$nodes" in node]
+        if not nodes:
+            return
+
+        children = _children(nodes, part)
+        if not children:
+            found_wildcard = max(
+                (wildcard for wildcard in (node["$wildcards"].match(part) for node in nodes) if wildcard),
+                key=wildcard_specificity,
+                default=None,
+            )
+            if not found_wildcard:
+                return
+            children = _children(nodes, found_wildcard)
+
+        nodes = children
+
+    # only scopes defined by policies are listed, so their own effect (the one
+    # of the layer with the highest precedence) decides whether they are allowed
+    pending = [(path, nodes)]
+    while pending:
+        path, nodes = pending.pop()
+        effect = next((node["$effect"] for node in nodes if "$effect" in node), None)
+        if path and effect == PolicyEffect.ALLOW:
+            yield ":".join(path)
+
+        nodes = [node for node in nodes if "$nodes" in node]
+        # members of grouped edges are listed separately, children are visited in order of definition
+        members = dict.fromkeys(member for node in nodes for key in node["$nodes"] for member in key.split(","))
+        for member in reversed(list(members)):
+            pending.append((path + [member], _children(nodes, member)))
+
+
+def _any_effect(nodes: List[dict]) -> Optional[PolicyEffect]:
+    for node in nodes:
+        any_node = node["$nodes"].get("*")
+        if any_node is not None and "$effect" in any_node:
+            return any_node["$effect"]
+
+    return None
+
+
+def _child(node: dict, index: str) -> Optional[dict]:
+    if index in node["$nodes"]:
+        return node["$nodes"][index]
+
+    if "$groups" in node and index in node["$groups"]:
+        return node["$nodes"][node["$groups"][index]]
+
+    return None
+
+
+def _children(nodes: List[dict], index: str) -> List[dict]:
+    # `_child` of every node, inlined as it is called for each section of evaluated scopes
+    result = []
+    for node in nodes:
+        child = node["$nodes"].get(index)
+        if child is None and "$groups" in node and index in node["$groups"]:
+            child = node["$nodes"][node["$groups"][index]]
+        if child is not None:
+            result.append(child)
+
+    return result
+
+
+def _child_keys(node: dict, members: List[str]) -> List[str]:
+    groups = node.get("$groups", {})
+    keys: Dict[str, None] = {}
+    for member in members:
+        if member in node["$nodes"]:
+            keys[member] = None
+        elif member in groups:
+            keys[groups[member]] = None
+
+    return list(keys)
+
+
+def _set_child(node: dict, members: List[str], child: dict) -> str:
+    groups = node.get("$groups", {})
+    if len(members) == 1:
+        key = members[0]
+        groups.pop(key, None)
+    else:
+        key = sys.intern(",".join(sorted(members)))
+        for member in members:
+            groups[member] = key
+
+    if groups:
+        node["$groups"] = groups
+    elif "$groups" in node:
+        del node["$groups"]
+
+    node["$nodes"][key] = child
 
-        return effect == PolicyEffect.ALLOW
+    return key
+
+
+def _remove_child(node: dict, key: str) -> None:
+    del node["$nodes"][key]
+    groups = node.get("$groups", {})
+    for member in key.split(","):
+        node["$wildcards"].discard(member)
+        groups.pop(member, None)
+
+    if "$groups" in node and not groups:
+        del node["$groups"]
+
+    if not node["$nodes"]:
+        del node["$nodes"]
+        del node["$wildcards"]
 
 
 def match_pattern(value: str, pattern: str) -> bool:
+    # literal parts of the pattern have to occur in the value in order, e.g. both
+    # `set*` and `*Name` match `resetNameValue`
     segments = pattern.split("*")
     start_pos = 0
 
@@ -153,3 +765,165 @@ def match_pattern(value: str, pattern: str) -> bool:
         start_pos = index + len(segment)
 
     return True
+
+
+def _contains(value: str, pattern: str) -> bool:
+    # `match_pattern` for patterns having a single `*`
+    prefix, _, suffix = pattern.partition("*")
+    index = value.find(prefix)
+
+    return index != -1 and (not suffix or value.find(suffix, index + len(prefix)) != -1)
+
+
+_PREFIX = 2
+_INFIX = 1
+_SUFFIX = 0
+
+
+def wildcard_specificity(pattern: str) -> Tuple[int, int, int, str]:
+    # more literal characters win, then patterns with a literal beginning, then
+    # longer beginnings; the pattern itself settles the rest, so the order is total
+    prefix, suffix = pattern.split("*")
+    kind = _PREFIX if not suffix else _SUFFIX if not prefix else _INFIX
+
+    return len(prefix) + len(suffix), kind, len(prefix), pattern
+
+
+# indexes holding up to this number of patterns are scanned from the most specific pattern
+_SCAN_LIMIT = 8
+
+# guards building of lookup structures against concurrent changes of indexes
+_lookup_lock = threading.Lock()
+
+
+class _ProbeTables(NamedTuple):
+    prefixes: Dict[str, str]
+    suffixes: Dict[str, str]
+    infixes: Dict[str, Dict[str, str]]
+    # lengths of indexed literals, from the longest one
+    prefix_lengths: List[int]
+    suffix_lengths: List[int]
+    infix_lengths: List[int]
+
+
+class WildcardIndex(set):
+    # a set of patterns; lookup structures (patterns ordered by specificity for small indexes,
+    # probe tables for large ones) are built on the first lookup and dropped on every change
+    __slots__ = ("_ordered", "_tables")
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        super().__init__(patterns)
+        self._ordered: Optional[List[str]] = None
+        self._tables: Optional[_ProbeTables] = None
+
+    def add(self, pattern: str) -> None:
+        if pattern in self:
+            return
+
+        with _lookup_lock:
+            super().add(pattern)
+            self._ordered = self._tables = None
+
+    def discard(self, pattern: str) -> None:  # type: ignore
+        if pattern not in self:
+            return
+
+        with _lookup_lock:
+            super().discard(pattern)
+            self._ordered = self._tables = None
+
+    def remove(self, pattern: str) -> None:
+        if pattern not in self:
+            raise KeyError(pattern)
+
+        self.discard(pattern)
+
+    def match(self, value: str) -> Optional[str]:
+        # the most specific pattern matching the value
+        if len(self) <= _SCAN_LIMIT:
+            for pattern in self._ordered or self._order():
+                if _contains(value, pattern):
+                    return pattern
+            return None
+
+        return max(self._probe(value), key=wildcard_specificity, default=None)
+
+    def trace_match(self, value: str) -> Tuple[Optional[str], int]:
+        # same as `match`, but also counts performed comparisons; used only when explaining decisions
+        if len(self) > _SCAN_LIMIT:
+            matches = list(self._probe(value))
+            return max(matches, key=wildcard_specificity, default=None), len(matches) + 1
+
+        ordered = self._ordered or self._order()
+        for comparisons, pattern in enumerate(ordered, 1):
+            if _contains(value, pattern):
+                return pattern, comparisons
+
+        return None, len(ordered)
+
+    def match_all(self, value: str) -> List[str]:
+        # all patterns matching the value, regardless of their specificity
+        if len(self) <= _SCAN_LIMIT:
+            return [pattern for pattern in self._ordered or self._order() if _contains(value, pattern)]
+
+        return list(dict.fromkeys(self._probe(value)))
+
+    def _order(self) -> List[str]:
+        with _lookup_lock:
+            ordered = self._ordered = sorted(self, key=wildcard_specificity, reverse=True)
+
+        return ordered
+
+    def _probe_tables(self) -> _ProbeTables:
+        tables = self._tables
+        if tables is not None:
+            return tables
+
+        with _lookup_lock:
+            if self._tables is not None:
+                return self._tables
+
+            prefixes: Dict[str, str] = {}
+            suffixes: Dict[str, str] = {}
+            infixes: Dict[str, Dict[str, str]] = {}
+            for pattern in self:
+                prefix, suffix = pattern.split("*")
+                if not suffix:
+                    prefixes[prefix] = pattern
+                elif not prefix:
+                    suffixes[suffix] = pattern
+                else:
+                    infixes.setdefault(prefix, {})[suffix] = pattern
+
+            tables = self._tables = _ProbeTables(
+                prefixes,
+                suffixes,
+                infixes,
+                sorted({len(prefix) for prefix in prefixes}, reverse=True),
+                sorted({len(suffix) for suffix in suffixes}, reverse=True),
+                sorted({len(prefix) for prefix in infixes}, reverse=True),
+            )
+
+        return tables
+
+    def _probe(self, value: str) -> Iterator[str]:
+        # literal parts may occur anywhere within the value, so every substring having
+        # the length of any of indexed literals is looked up (some patterns may repeat)
+        tables = self._probe_tables()
+        length = len(value)
+
+        for table, lengths in ((tables.prefixes, tables.prefix_lengths), (tables.suffixes, tables.suffix_lengths)):
+            for size in lengths:
+                for start in range(length - size + 1):
+                    pattern = table.get(value[start : start + size])
+                    if pattern is not None:
+                        yield pattern
+
+        for size in tables.infix_lengths:
+            for start in range(length - size + 1):
+                infixes = tables.infixes.get(value[start : start + size])
+                if infixes is None:
+                    continue
+                for suffix, pattern in infixes.items():
+                    if value.find(suffix, start + size) != -1:
+                        yield pattern
@@ -0,0 +1,341 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from copy import copy
+from inspect import isawaitable
+from threading import Event, Lock
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+from .actor import Actor, ActorProvider, AsyncActorProvider
+from .auth import _sync_result
+from .errors import ActorLoaderError
+
+
+class ProviderStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    loads: int
+    load_time_ns: int
+    maxsize: int
+    currsize: int
+
+
+class _Entry(NamedTuple):
+    # either a loaded actor or a negative result (`None` or a copy of an error raised by the provider,
+    # so the cached error does not keep frames of the failed call alive)
+    actor: Optional[Actor]
+    error: Optional[BaseException]
+    expires_at: float
+
+
+class CachingActorProvider:
+    # keeps compiled actors loaded by the wrapped provider by context, so authorizing
+    # the same actor again neither hits the provider's storage nor compiles its policies
+    def __init__(
+        self,
+        provider: Union[ActorProvider, AsyncActorProvider],
+        maxsize: int = 1024,
+        ttl: float = None,
+        negative_ttl: float = 0.0,
+        negative_errors: Tuple[Type[BaseException], ...] = (LookupError,),
+        key: Callable[[Any], Hashable] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.provider = provider
+        self._maxsize = maxsize
+        # entries never expire when `ttl` is `None`, negative results are not cached when `negative_ttl` is 0
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._negative_errors = negative_errors
+        self._key = key
+        self._clock = clock
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._loads = 0
+        self._load_time_ns = 0
+
+    def get_actor(self, context: Any = None) -> Union[Optional[Actor], Awaitable[Optional[Actor]]]:
+        key = self._key(context) if self._key is not None else context
+        entry = self._lookup(key)
+        if entry is not None:
+            if entry.error is not None:
+                # every caller gets its own instance, so tracebacks of concurrent callers are not mixed up
+                raise copy(entry.error)
+            return entry.actor
+
+        started = time.perf_counter_ns()
+        try:
+            actor = self.provider.get_actor(context)
+        except self._negative_errors as error:
+            self._store(key, None, copy(error), started)
+            raise
+
+        # async providers are awaited by `Auth.authorize_async`
+        if isawaitable(actor):
+            return self._load_async(key, actor, started)
+
+        return self._store(key, actor, None, started)
+
+    async def _load_async(self, key: Hashable, result: Awaitable[Actor], started: int) -> Optional[Actor]:
+        try:
+            actor = await result
+        except self._negative_errors as error:
+            self._store(key, None, copy(error), started)
+            raise
+
+        return self._store(key, actor, None, started)
+
+    def _lookup(self, key: Hashable) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+
+        return None
+
+    def _store(
+        self, key: Hashable, actor: Optional[Actor], error: Optional[BaseException], started: int
+    ) -> Optional[Actor]:
+        if isinstance(actor, Actor):
+            actor.compile()
+            ttl = self._ttl
+        else:
+            ttl = self._negative_ttl
+
+        with self._lock:
+            self._loads += 1
+            self._load_time_ns += time.perf_counter_ns() - started
+            if ttl is not None and ttl <= 0:
+                return actor
+
+            expires_at = self._clock() + ttl if ttl is not None else float("inf")
+            self._entries[key] = _Entry(actor, error, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+        return actor
+
+    def invalidate(self, actor_id: str = None, context: Any = None) -> None:
+        # drops cached actors with the given id and the entry (negative ones included) for the given context,
+        # all entries are dropped if neither is given
+        with self._lock:
+            if actor_id is None and context is None:
+                self._entries.clear()
+                return
+
+            key = self._key(context) if self._key is not None and context is not None else context
+            for item in [
+                item
+                for item, entry in self._entries.items()
+                if (context is not None and item == key)
+                or (actor_id is not None and entry.actor is not None and entry.actor.actor_id == actor_id)
+            ]:
+                del self._entries[item]
+
+    def stats(self) -> ProviderStats:
+        return ProviderStats(
+            self._hits,
+            self._misses,
+            self._evictions,
+            self._loads,
+            self._load_time_ns,
+            self._maxsize,
+            len(self._entries),
+        )
+
+
+class _Batch:
+    __slots__ = ("items", "full", "dispatched")
+
+    def __init__(self):
+        # keys, contexts and futures of requested actors
+        self.items: List[Tuple[Hashable, Any, Any]] = []
+        self.full = Event()
+        self.dispatched = False
+
+
+class BatchingActorLoader:
+    # merges concurrent requests for the same actor into a single load and collects requests
+    # for distinct actors made within `batch_window` seconds into a batch loaded by provider's
+    # `get_actors` (if there is one); works for threads, as well as for asyncio tasks
+    def __init__(
+        self,
+        provider: Union[ActorProvider, AsyncActorProvider],
+        max_batch_size: int = 100,
+        batch_window: float = 0.002,
+        key: Callable[[Any], Hashable] = None,
+    ):
+        self.provider = provider
+        self._max_batch_size = max_batch_size
+        self._batch_window = batch_window
+        self._key = key
+
+        self._lock = Lock()
+        self._pending: Dict[Hashable, Future] = {}
+        self._batch: Optional[_Batch] = None
+        self._async_pending: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+        self._async_batches: Dict[asyncio.AbstractEventLoop, _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get_actor(self, context: Any = None) -> Union[Optional[Actor], Awaitable[Optional[Actor]]]:
+        key = self._key(context) if self._key is not None else context
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._get_actor(key, context)
+
+        # called by a coroutine, the result is awaited by `Auth.authorize_async`
+        return self._get_actor_async(loop, key, context)
+
+    def _get_actor(self, key: Hashable, context: Any) -> Optional[Actor]:
+        with self._lock:
+            future = self._pending.get(key)
+            leading: Optional[_Batch] = None
+            if future is None:
+                future = self._pending[key] = Future()
+                batch = self._batch
+                if batch is None:
+                    # the first requesting thread waits for the others and loads the batch
+                    batch = leading = self._batch = _Batch()
+                batch.items.append((key, context, future))
+                if len(batch.items) >= self._max_batch_size:
+                    self._batch = None
+                    batch.full.set()
+
+        if leading is not None:
+            leading.full.wait(self._batch_window)
+            with self._lock:
+                if self._batch is leading:
+                    self._batch = None
+            self._dispatch(leading.items)
+
+        return future.result()
+
+    def _dispatch(self, items: List[Tuple[Hashable, Any, Any]]) -> None:
+        try:
+            results = self._load([context for _, context, _ in items])
+        except Exception as error:  # pylint: disable=broad-except
+            results = [error] * len(items)
+
+        with self._lock:
+            for key, _, _ in items:
+                del self._pending[key]
+
+        for (_, _, future), result in zip(items, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _load(self, contexts: List[Any]) -> List[Any]:
+        get_actors = getattr(self.provider, "get_actors", None)
+        if get_actors is not None:
+            return _aligned(contexts, _sync_result(get_actors(contexts)))
+
+        results: List[Any] = []
+        for context in contexts:
+            try:
+                results.append(_sync_result(self.provider.get_actor(context)))
+            except Exception as error:  # pylint: disable=broad-except
+                results.append(error)
+
+        return results
+
+    def _get_actor_async(self, loop: asyncio.AbstractEventLoop, key: Hashable, context: Any) -> Awaitable:
+        with self._lock:
+            future = self._async_pending.get((loop, key))
+            if future is None:
+                future = self._async_pending[(loop, key)] = loop.create_future()
+                batch = self._async_batches.get(loop)
+                if batch is None:
+                    batch = self._async_batches[loop] = _Batch()
+                    loop.call_later(self._batch_window, self._dispatch_async, loop, batch)
+                batch.items.append((key, context, future))
+                if len(batch.items) >= self._max_batch_size:
+                    del self._async_batches[loop]
+                    loop.call_soon(self._dispatch_async, loop, batch)
+
+        # cancelling one of the waiting tasks does not cancel the load for the others
+        return asyncio.shield(future)
+
+    def _dispatch_async(self, loop: asyncio.AbstractEventLoop, batch: _Batch) -> None:
+        with self._lock:
+            if batch.dispatched:
+                return
+            batch.dispatched = True
+            if self._async_batches.get(loop) is batch:
+                del self._async_batches[loop]
+
+        task = loop.create_task(self._load_async(loop, batch.items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load_async(self, loop: asyncio.AbstractEventLoop, items: List[Tuple[Hashable, Any, Any]]) -> None:
+        contexts = [context for _, context, _ in items]
+        try:
+            get_actors = getattr(self.provider, "get_actors", None)
+            if get_actors is not None:
+                result = get_actors(contexts)
+                results = _aligned(contexts, await result if isawaitable(result) else result)
+            else:
+                results = await asyncio.gather(
+                    *(self._load_one_async(context) for context in contexts), return_exceptions=True
+                )
+        except Exception as error:  # pylint: disable=broad-except
+            results = [error] * len(items)
+
+        with self._lock:
+            for key, _, _ in items:
+                del self._async_pending[(loop, key)]
+
+        for (_, _, future), result in zip(items, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _load_one_async(self, context: Any) -> Optional[Actor]:
+        result = self.provider.get_actor(context)
+
+        return await result if isawaitable(result) else result  # type: ignore
+
+
+def _aligned(contexts: List[Any], actors: Sequence[Optional[Actor]]) -> List[Any]:
+    actors = list(actors)
+    if len(actors) != len(contexts):
+        raise ActorLoaderError.unexpected_batch_size(expected=len(contexts), actual=len(actors))
+
+    return actors
+
+
+__all__ = ["BatchingActorLoader", "CachingActorProvider", "ProviderStats"]
@@ -0,0 +1,253 @@
+import sqlite3
+from abc import abstractmethod
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Protocol, Tuple, runtime_checkable
+
+from .actor import Actor
+from .errors import RepositoryError
+from .policy import CacheInfo, Policy, PolicyEffect
+from .role import Role
+
+
+class RoleRecord(NamedTuple):
+    name: str
+    version: int
+    policies: List[Policy]
+
+
+class ActorRecord(NamedTuple):
+    actor_id: str
+    # names of actor's roles mapped to their current versions, in order of assignment
+    roles: Dict[str, int]
+    policies: List[Policy]
+
+
+@runtime_checkable
+class PolicyRepository(Protocol):
+    @abstractmethod
+    def get_actor(self, tenant: str, actor_id: str) -> Optional[ActorRecord]:
+        ...
+
+    @abstractmethod
+    def get_role(self, tenant: str, name: str) -> Optional[RoleRecord]:
+        ...
+
+
+class InMemoryPolicyRepository(PolicyRepository):
+    def __init__(self):
+        self._versions = count(1)
+        self._roles: Dict[Tuple[str, str], RoleRecord] = {}
+        self._actors: Dict[Tuple[str, str], Tuple[List[str], List[Policy]]] = {}
+
+    def save_role(self, tenant: str, name: str, policies: Iterable[Policy]) -> int:
+        version = next(self._versions)
+        self._roles[(tenant, name)] = RoleRecord(name, version, list(policies))
+
+        return version
+
+    def save_actor(self, tenant: str, actor_id: str, roles: Iterable[str], policies: Iterable[Policy] = ()) -> None:
+        self._actors[(tenant, actor_id)] = (list(roles), list(policies))
+
+    def get_actor(self, tenant: str, actor_id: str) -> Optional[ActorRecord]:
+        if (tenant, actor_id) not in self._actors:
+            return None
+
+        roles, policies = self._actors[(tenant, actor_id)]
+        versions = {name: self._roles[(tenant, name)].version for name in roles if (tenant, name) in self._roles}
+
+        return ActorRecord(actor_id, versions, list(policies))
+
+    def get_role(self, tenant: str, name: str) -> Optional[RoleRecord]:
+        return self._roles.get((tenant, name))
+
+
+class SQLitePolicyRepository(PolicyRepository):
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS targe_roles (
+            tenant TEXT NOT NULL,
+            name TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (tenant, name)
+        );
+        CREATE TABLE IF NOT EXISTS targe_role_policies (
+            tenant TEXT NOT NULL,
+            role TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            scope TEXT NOT NULL,
+            effect TEXT NOT NULL,
+            PRIMARY KEY (tenant, role, position)
+        );
+        CREATE TABLE IF NOT EXISTS targe_actor_roles (
+            tenant TEXT NOT NULL,
+            actor_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            PRIMARY KEY (tenant, actor_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS targe_actor_policies (
+            tenant TEXT NOT NULL,
+            actor_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            scope TEXT NOT NULL,
+            effect TEXT NOT NULL,
+            PRIMARY KEY (tenant, actor_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS targe_actors (
+            tenant TEXT NOT NULL,
+            actor_id TEXT NOT NULL,
+            PRIMARY KEY (tenant, actor_id)
+        );
+    """
+
+    def __init__(self, database: str = ":memory:"):
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+        self._lock = Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(self._SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def save_role(self, tenant: str, name: str, policies: Iterable[Policy]) -> int:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO targe_roles (tenant, name, version) VALUES (?, ?, 1) "
+                "ON CONFLICT (tenant, name) DO UPDATE SET version = version + 1",
+                (tenant, name),
+            )
+            self._connection.execute("DELETE FROM targe_role_policies WHERE tenant = ? AND role = ?", (tenant, name))
+            self._connection.executemany(
+                "INSERT INTO targe_role_policies (tenant, role, position, scope, effect) VALUES (?, ?, ?, ?, ?)",
+                [(tenant, name, index, policy.scope, policy.effect.value) for index, policy in enumerate(policies)],
+            )
+            (version,) = self._connection.execute(
+                "SELECT version FROM targe_roles WHERE tenant = ? AND name = ?", (tenant, name)
+            ).fetchone()
+
+        return version
+
+    def save_actor(self, tenant: str, actor_id: str, roles: Iterable[str], policies: Iterable[Policy] = ()) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO targe_actors (tenant, actor_id) VALUES (?, ?)", (tenant, actor_id)
+            )
+            for table in ("targe_actor_roles", "targe_actor_policies"):
+                self._connection.execute(f"DELETE FROM {table} WHERE tenant = ? AND actor_id = ?", (tenant, actor_id))
+            self._connection.executemany(
+                "INSERT INTO targe_actor_roles (tenant, actor_id, position, role) VALUES (?, ?, ?, ?)",
+                [(tenant, actor_id, index, role) for index, role in enumerate(roles)],
+            )
+            self._connection.executemany(
+                "INSERT INTO targe_actor_policies (tenant, actor_id, position, scope, effect) VALUES (?, ?, ?, ?, ?)",
+                [(tenant, actor_id, index, policy.scope, policy.effect.value) for index, policy in enumerate(policies)],
+            )
+
+    def get_actor(self, tenant: str, actor_id: str) -> Optional[ActorRecord]:
+        with self._lock:
+            exists = self._connection.execute(
+                "SELECT 1 FROM targe_actors WHERE tenant = ? AND actor_id = ?", (tenant, actor_id)
+            ).fetchone()
+            if exists is None:
+                return None
+
+            # versions of all roles are fetched with the actor, so cached roles can be checked without extra queries
+            roles = self._connection.execute(
+                "SELECT r.name, r.version FROM targe_actor_roles a "
+                "JOIN targe_roles r ON r.tenant = a.tenant AND r.name = a.role "
+                "WHERE a.tenant = ? AND a.actor_id = ? ORDER BY a.position",
+                (tenant, actor_id),
+            ).fetchall()
+            policies = self._connection.execute(
+                "SELECT scope, effect FROM targe_actor_policies WHERE tenant = ? AND actor_id = ? ORDER BY position",
+                (tenant, actor_id),
+            ).fetchall()
+
+        return ActorRecord(actor_id, dict(roles), _load_policies(policies))
+
+    def get_role(self, tenant: str, name: str) -> Optional[RoleRecord]:
+        with self._lock:
+            role = self._connection.execute(
+                "SELECT version FROM targe_roles WHERE tenant = ? AND name = ?", (tenant, name)
+            ).fetchone()
+            if role is None:
+                return None
+
+            policies = self._connection.execute(
+                "SELECT scope, effect FROM targe_role_policies WHERE tenant = ? AND role = ? ORDER BY position",
+                (tenant, name),
+            ).fetchall()
+
+        return RoleRecord(name, role[0], _load_policies(policies))
+
+
+def _load_policies(rows: List[Tuple[str, str]]) -> List[Policy]:
+    return [Policy(scope, PolicyEffect(effect)) for scope, effect in rows]
+
+
+class RepositoryActorProvider:
+    # builds actors from a policy repository; roles are compiled once per (tenant, role, version)
+    # and shared by all actors until the repository reports a newer version of the role
+    def __init__(self, repository: PolicyRepository, cache_size: int = 1024):
+        self.repository = repository
+        self._cache_size = cache_size
+        self._roles: "OrderedDict[Tuple[str, str, int], Role]" = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_actor(self, context: Any = None) -> Actor:
+        tenant, actor_id = context
+        record = self.repository.get_actor(tenant, actor_id)
+        if record is None:
+            raise RepositoryError.actor_not_found(tenant=tenant, actor_id=actor_id)
+
+        actor = Actor(record.actor_id)
+        actor.roles.extend(self.get_role(tenant, name, version) for name, version in record.roles.items())
+        actor.policies.extend(record.policies)
+
+        return actor
+
+    def get_role(self, tenant: str, name: str, version: int) -> Role:
+        key = (tenant, name, version)
+        with self._lock:
+            role = self._roles.get(key)
+            if role is not None:
+                self._roles.move_to_end(key)
+                self._hits += 1
+                return role
+            self._misses += 1
+
+        record = self.repository.get_role(tenant, name)
+        if record is None:
+            raise RepositoryError.role_not_found(tenant=tenant, name=name)
+
+        role = Role(record.name)
+        role.policies = record.policies
+
+        with self._lock:
+            # repository may already hold a newer version than the requested one
+            self._roles[(tenant, name, record.version)] = role
+            while len(self._roles) > self._cache_size:
+                self._roles.popitem(last=False)
+
+        return role
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses, self._cache_size, len(self._roles))
+
+    def invalidate(self, tenant: str = None) -> None:
+        with self._lock:
+            for key in [key for key in self._roles if tenant is None or key[0] == tenant]:
+                del self._roles[key]
+
+
+__all__ = [
+    "ActorRecord",
+    "InMemoryPolicyRepository",
+    "PolicyRepository",
+    "RepositoryActorProvider",
+    "RoleRecord",
+    "SQLitePolicyRepository",
+]
@@ -0,0 +1,200 @@
+from typing import Any, Dict, List, NamedTuple, Set, Union
+
+from .actor import Actor
+from .policy import CompiledPolicies, Policy, PolicyEffect, WildcardIndex, normalize_scope
+from .role import Role
+from .utils import ListChange, ListReplacement
+
+_EFFECT_KEYS = {
+    PolicyEffect.ALLOW: "$allow",
+    PolicyEffect.DENY: "$deny",
+}
+
+
+class ScopeSubjects(NamedTuple):
+    roles: List[str]
+    actors: List[str]
+
+
+class ReverseIndex:
+    # maps scope paths of policies (wildcards included) back to the compiled policies of roles
+    # and actors defining them; a query collects only subjects having a rule on the way of the scope
+    # and confirms their decisions, so its cost does not depend on the number of indexed actors
+    def __init__(self):
+        self.permissions: Dict[str, Any] = {}
+        # policies indexed for every compiled policies, by policy's id
+        self._policies: Dict[CompiledPolicies, Dict[int, Policy]] = {}
+        # compiled policies using the key as a layer (e.g. actors having a role)
+        self._members: Dict[CompiledPolicies, Set[CompiledPolicies]] = {}
+        self._layers: Dict[CompiledPolicies, List[CompiledPolicies]] = {}
+
+    def add_role(self, role: Role) -> None:
+        self._add(role.compiled_policies)
+
+    def remove_role(self, role: Role) -> None:
+        self._remove(role.compiled_policies)
+
+    def add_actor(self, actor: Actor) -> None:
+        # actor is compiled, if it was not yet; compiled policies replaced by
+        # a subsequent call to `Actor.compile` have to be indexed again
+        self._add(actor._compiled())
+
+    def remove_actor(self, actor: Actor) -> None:
+        if actor._compiled_policies is not None:
+            self._remove(actor._compiled_policies)
+
+    def who_can(self, scope: str) -> ScopeSubjects:
+        return self._subjects(scope, PolicyEffect.ALLOW)
+
+    def who_cannot(self, scope: str) -> ScopeSubjects:
+        # subjects explicitly denied by one of their policies
+        return self._subjects(scope, PolicyEffect.DENY)
+
+    def _add(self, compiled: CompiledPolicies) -> None:
+        if compiled in self._policies:
+            return
+
+        self._policies[compiled] = {}
+        for policy in dict.fromkeys(compiled._policies):
+            self._index(compiled, policy)
+
+        self._link(compiled)
+        compiled.observe(self._on_change)
+
+    def _remove(self, compiled: CompiledPolicies) -> None:
+        if compiled not in self._policies:
+            return
+
+        compiled.unobserve(self._on_change)
+        for policy in list(self._policies[compiled].values()):
+            self._unindex(compiled, policy)
+        del self._policies[compiled]
+
+        for layer in self._layers.pop(compiled, []):
+            self._members[layer].discard(compiled)
+
+    def _link(self, compiled: CompiledPolicies) -> None:
+        for layer in self._layers.pop(compiled, []):
+            self._members[layer].discard(compiled)
+
+        self._layers[compiled] = list(compiled.layers)
+        for layer in compiled.layers:
+            self._members.setdefault(layer, set()).add(compiled)
+            # layers (e.g. roles of an actor) are indexed as well, so their rules lead to members
+            self._add(layer)
+
+    def _on_change(self, compiled: CompiledPolicies, change: Union[ListChange, ListReplacement, None]) -> None:
+        if change is None:
+            self._link(compiled)
+        elif isinstance(change, ListReplacement):
+            for policy, new_policy in change.replaced:
+                self._unindex(compiled, policy)
+                self._index(compiled, new_policy)
+        else:
+            for policy in change.removed:
+                self._unindex(compiled, policy)
+            for policy in change.added:
+                self._index(compiled, policy)
+
+    def _index(self, compiled: CompiledPolicies, policy: Policy) -> None:
+        policies = self._policies[compiled]
+        if id(policy) in policies:
+            return
+        policies[id(policy)] = policy
+
+        for scope in normalize_scope(policy.scope):
+            node = self.permissions
+            for part in scope.split(":"):
+                if "$nodes" not in node:
+                    node["$nodes"] = {}
+                    node["$wildcards"] = WildcardIndex()
+                if part not in node["$nodes"]:
+                    node["$nodes"][part] = {}
+                    if part.count("*") == 1:
+                        node["$wildcards"].add(part)
+                node = node["$nodes"][part]
+
+            subjects = node.setdefault(_EFFECT_KEYS[policy.effect], {})
+            subjects[compiled] = subjects.get(compiled, 0) + 1
+
+    def _unindex(self, compiled: CompiledPolicies, policy: Policy) -> None:
+        if self._policies[compiled].pop(id(policy), None) is None:
+            return
+
+        for scope in normalize_scope(policy.scope):
+            self._unindex_path(self.permissions, scope.split(":"), compiled, _EFFECT_KEYS[policy.effect])
+
+    def _unindex_path(self, node: dict, parts: List[str], compiled: CompiledPolicies, key: str) -> None:
+        if not parts:
+            subjects = node[key]
+            subjects[compiled] -= 1
+            if not subjects[compiled]:
+                del subjects[compiled]
+            if not subjects:
+                del node[key]
+            return
+
+        child = node["$nodes"][parts[0]]
+        self._unindex_path(child, parts[1:], compiled, key)
+
+        # prune nodes which are no longer used by any policy
+        if not child:
+            del node["$nodes"][parts[0]]
+            node["$wildcards"].discard(parts[0])
+            if not node["$nodes"]:
+                del node["$nodes"]
+                del node["$wildcards"]
+
+    def _candidates(self, scope: str, key: str) -> Set[CompiledPolicies]:
+        # subjects having a rule with the effect on the way of the scope, that is: on any
+        # matching path, within `*` edges inherited along it and within `*` edge of its end
+        candidates: Set[CompiledPolicies] = set()
+        for item in normalize_scope(scope):
+            nodes = [self.permissions]
+            for part in item.split(":"):
+                next_nodes = []
+                for node in nodes:
+                    if "$nodes" not in node:
+                        continue
+                    children = node["$nodes"]
+                    if "*" in children:
+                        candidates.update(children["*"].get(key, ()))
+                    if part in children:
+                        next_nodes.append(children[part])
+                    patterns = node["$wildcards"].match_all(part)
+                    next_nodes.extend(children[pattern] for pattern in patterns if pattern != part)
+                nodes = next_nodes
+
+            for node in nodes:
+                candidates.update(node.get(key, ()))
+                if "*" in node.get("$nodes", {}):
+                    candidates.update(node["$nodes"]["*"].get(key, ()))
+
+        # members inherit rules of their layers, e.g. actors of their roles
+        pending = list(candidates)
+        while pending:
+            for member in self._members.get(pending.pop(), ()):
+                if member not in candidates:
+                    candidates.add(member)
+                    pending.append(member)
+
+        return candidates
+
+    def _subjects(self, scope: str, effect: PolicyEffect) -> ScopeSubjects:
+        roles: List[str] = []
+        actors: List[str] = []
+        for compiled in self._candidates(scope, _EFFECT_KEYS[effect]):
+            if compiled.is_allowed(scope) != (effect == PolicyEffect.ALLOW):
+                continue
+            if isinstance(compiled.origin, Role):
+                roles.append(compiled.origin.name)
+            elif isinstance(compiled.origin, Actor):
+                actors.append(compiled.origin.actor_id)
+
+        return ScopeSubjects(sorted(roles), sorted(actors))
+
+    def __len__(self) -> int:
+        return len(self._policies)
+
+
+__all__ = ["ReverseIndex", "ScopeSubjects"]
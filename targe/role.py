@@ -1,21 +1,220 @@
 import re
+import time
 from datetime import datetime
-from typing import List
+from threading import Lock, RLock
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple, Union
+from weakref import WeakSet
 
-from targe import Policy
-from targe.errors import InvalidIdentifierNameError
+from .errors import InvalidIdentifierNameError, RoleHierarchyError
+from .policy import CompiledPolicies, Policy
+from .utils import ListChange, ListReplacement, ObservableList, utc_from_ns
 
 _ROLE_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_-]+$", re.IGNORECASE)
 
+# roles are shared by many actors, which may compile them concurrently; all of them
+# have to use the same compiled policies, otherwise changes would not reach some actors
+_compile_lock = RLock()
+
+
+class RoleRegistry:
+    # assigns role names a bit, so a set of role names becomes an integer mask and checking
+    # roles of an actor is a single bitwise operation; bits are assigned to names of roles
+    # held by actors once their masks are needed, queries never assign any
+    __slots__ = ("_bits", "_lock", "version")
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+        self._lock = Lock()
+        # raised whenever a role hierarchy changes, so masks derived from closures can be refreshed
+        self.version = 0
+
+    def bit(self, name: str) -> int:
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(name, 1 << len(self._bits))
+
+        return bit
+
+    def mask(self, names: Iterable[str]) -> int:
+        mask = 0
+        for name in names:
+            mask |= self.bit(name)
+
+        return mask
+
+    def find(self, names: Iterable[str]) -> Optional[int]:
+        # mask of known names, `None` if any of them is unknown (so no actor holds a role with the name)
+        mask = 0
+        for name in names:
+            bit = self._bits.get(name)
+            if bit is None:
+                return None
+            mask |= bit
+
+        return mask
+
+    def find_any(self, names: Iterable[str]) -> int:
+        # mask of known names, unknown ones are ignored
+        mask = 0
+        for name in names:
+            mask |= self._bits.get(name, 0)
+
+        return mask
+
+    def changed(self) -> None:
+        with self._lock:
+            self.version += 1
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+
+role_registry = RoleRegistry()
+
 
 class Role:
+    __slots__ = (
+        "name",
+        "_policies",
+        "_compiled_policies",
+        "_created_at",
+        "_parents",
+        "_children",
+        "_ancestors",
+        "_names",
+        "__weakref__",
+    )
+
     def __init__(self, name: str):
         self.name = name
-        self.policies: List[Policy] = []
-        self.created_at = datetime.utcnow()
+        self._policies = ObservableList([], self._on_change)
+        # policies are compiled on first use, e.g. once an actor having the role is compiled
+        self._compiled_policies: Optional[CompiledPolicies] = None
+        self._created_at = time.time_ns()
+
+        # most roles have neither parents nor children, so both are created once needed
+        self._parents: Optional[ObservableList] = None
+        self._children: "Optional[WeakSet[Role]]" = None
+        # transitive closure of parents in order of precedence, refreshed whenever the hierarchy changes
+        self._ancestors: Tuple[Role, ...] = ()
+        # names of ancestors and the role, kept only for roles having any ancestors
+        self._names: Optional[FrozenSet[str]] = None
 
         self._validate()
 
+    @property
+    def created_at(self) -> datetime:
+        return utc_from_ns(self._created_at)
+
+    def __repr__(self) -> str:
+        return f"Role({self.name!r})"
+
+    @property
+    def policies(self) -> ObservableList:
+        return self._policies
+
+    @policies.setter
+    def policies(self, policies: Iterable[Policy]) -> None:
+        policies = list(policies)
+        self._on_change(ListChange(policies, list(self._policies)))
+        self._policies = ObservableList(policies, self._on_change)
+
+    @property
+    def parents(self) -> ObservableList:
+        if self._parents is None:
+            self._parents = ObservableList([], self._on_parents_change)
+
+        return self._parents
+
+    @parents.setter
+    def parents(self, parents: Iterable["Role"]) -> None:
+        parents = list(parents)
+        previous = self.parents
+        self._parents = ObservableList(parents, self._on_parents_change)
+        try:
+            self._on_parents_change(ListChange(parents, list(previous)))
+        except RoleHierarchyError:
+            self._parents = previous
+            raise
+
+    @property
+    def ancestors(self) -> Tuple["Role", ...]:
+        return self._ancestors
+
+    @property
+    def names(self) -> FrozenSet[str]:
+        # names of the role and all its ancestors
+        return self._names or frozenset([self.name])
+
+    @property
+    def mask(self) -> int:
+        # bits of the role and all its ancestors; not kept by the role, as masks grow with the number of names
+        return role_registry.mask(self.names)
+
+    @property
+    def compiled_policies(self) -> CompiledPolicies:
+        # compiled policies are shared by all actors having the role,
+        # policies of ancestors are consulted after role's own policies
+        compiled_policies = self._compiled_policies
+        if compiled_policies is None:
+            with _compile_lock:
+                compiled_policies = self._compiled_policies or self._compile()
+
+        return compiled_policies
+
+    def _compile(self) -> CompiledPolicies:
+        compiled_policies = CompiledPolicies([ancestor.compiled_policies for ancestor in self._ancestors], origin=self)
+        for policy in self._policies:
+            compiled_policies.attach(policy)
+
+        self._compiled_policies = compiled_policies
+
+        return compiled_policies
+
+    def _on_change(self, change: Union[ListChange, ListReplacement]) -> None:
+        if self._compiled_policies is not None:
+            self._compiled_policies.apply_change(change)
+
+    def _on_parents_change(self, change: Union[ListChange, ListReplacement]) -> None:
+        added = [new for _, new in change.replaced] if isinstance(change, ListReplacement) else change.added
+        for parent in added:
+            if parent is self or self in parent.ancestors:
+                self.parents.revert(change)
+                raise RoleHierarchyError.cyclic_inheritance(role=self.name, parent=parent.name)
+
+        removed = [old for old, _ in change.replaced] if isinstance(change, ListReplacement) else change.removed
+        parents = self.parents
+        for parent in removed:
+            if parent not in parents and parent._children is not None:
+                parent._children.discard(self)
+        for parent in parents:
+            if parent._children is None:
+                parent._children = WeakSet()
+            parent._children.add(self)
+
+        self._refresh()
+
+    def _refresh(self) -> None:
+        # later parents take precedence over the earlier ones, as roles of an actor do
+        ancestors: Dict[Role, None] = {}
+        for parent in reversed(self.parents):
+            ancestors[parent] = None
+            ancestors.update(dict.fromkeys(parent._ancestors))
+
+        if tuple(ancestors) == self._ancestors:
+            return
+
+        self._ancestors = tuple(ancestors)
+        self._names = frozenset([self.name, *(ancestor.name for ancestor in self._ancestors)]) if ancestors else None
+        role_registry.changed()
+        if self._compiled_policies is not None:
+            self._compiled_policies.layers = [ancestor.compiled_policies for ancestor in self._ancestors]
+
+        # only descendants of the role are affected by the change
+        for child in list(self._children or ()):
+            child._refresh()
+
     def _validate(self) -> None:
         if not _ROLE_NAME_PATTERN.search(self.name):
             raise InvalidIdentifierNameError.invalid_role_name
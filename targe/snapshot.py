@@ -0,0 +1,245 @@
+import mmap
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .compact import _ALLOW, _DENY, _EFFECT_MASK, _HAS_CHILDREN, _SEGMENT_BITS, CompactPolicies
+from .errors import InvalidSnapshotError
+from .policy import CompiledPolicies, group_scope, match_pattern, wildcard_specificity
+
+_MAGIC = b"TRGE"
+FORMAT_VERSION = 1
+
+# magic, format version, byte order, node count, edge count, segment count, segment bytes, wildcard count
+_HEADER = struct.Struct("=4sHBxIIIII")
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+
+def write_snapshot(policies: Union[CompiledPolicies, CompactPolicies], path: str) -> None:
+    with open(path, "wb") as file:
+        file.write(dump_snapshot(policies))
+
+
+def dump_snapshot(policies: Union[CompiledPolicies, CompactPolicies]) -> bytes:
+    compact = CompactPolicies.from_compiled(policies) if isinstance(policies, CompiledPolicies) else policies
+
+    # segments are stored sorted, so they can be binary searched in place
+    segments = sorted(compact._segments, key=lambda segment: segment.encode())
+    segment_ids = {segment: index for index, segment in enumerate(segments)}
+    local_ids = [segment_ids[segment] for segment in compact._segments]
+    segment_bytes = [segment.encode() for segment in segments]
+    segment_offsets = array("I", [0])
+    for item in segment_bytes:
+        segment_offsets.append(segment_offsets[-1] + len(item))
+
+    children: List[List[Tuple[int, int]]] = [[] for _ in range(len(compact._nodes))]
+    for key, child in compact._children.items():
+        children[key >> _SEGMENT_BITS].append((local_ids[key & ((1 << _SEGMENT_BITS) - 1)], child))
+
+    edge_offsets = array("I", [0])
+    edge_segments = array("I")
+    edge_children = array("I")
+    wildcard_offsets = array("I", [0])
+    wildcard_segments = array("I")
+    for node, edges in enumerate(children):
+        for segment, child in sorted(edges):
+            edge_segments.append(segment)
+            edge_children.append(child)
+        edge_offsets.append(len(edge_segments))
+
+        # wildcards are stored from the most specific one
+        wildcards = sorted(compact._wildcards.get(node, ()), key=wildcard_specificity, reverse=True)
+        wildcard_segments.extend(segment_ids[wildcard] for wildcard in wildcards)
+        wildcard_offsets.append(len(wildcard_segments))
+
+    blob = b"".join(segment_bytes)
+    header = _HEADER.pack(
+        _MAGIC,
+        FORMAT_VERSION,
+        _BYTE_ORDER,
+        len(compact._nodes),
+        len(edge_segments),
+        len(segments),
+        len(blob),
+        len(wildcard_segments),
+    )
+
+    return b"".join(
+        [
+            header,
+            segment_offsets.tobytes(),
+            edge_offsets.tobytes(),
+            edge_segments.tobytes(),
+            edge_children.tobytes(),
+            wildcard_offsets.tobytes(),
+            wildcard_segments.tobytes(),
+            bytes(compact._nodes),
+            blob,
+        ]
+    )
+
+
+class PolicySnapshot:
+    def __init__(self, buffer: Any):
+        self._buffer = buffer
+        self._mmap: Optional[mmap.mmap] = None
+
+        view = self._view = memoryview(buffer)
+        if len(view) < _HEADER.size:
+            raise InvalidSnapshotError.invalid_format
+        magic, version, byte_order, nodes, edges, segments, blob, wildcards = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise InvalidSnapshotError.invalid_format
+        if version != FORMAT_VERSION or byte_order != _BYTE_ORDER:
+            raise InvalidSnapshotError.unsupported_version(version=version)
+
+        tables = [
+            ("segment_offsets", segments + 1),
+            ("edge_offsets", nodes + 1),
+            ("edge_segments", edges),
+            ("edge_children", edges),
+            ("wildcard_offsets", nodes + 1),
+            ("wildcard_segments", wildcards),
+        ]
+        # sizes of all sections follow from the header, so truncated (or padded) data is rejected before slicing
+        if len(view) != _HEADER.size + sum(length for _, length in tables) * 4 + nodes + blob:
+            raise InvalidSnapshotError.invalid_format
+
+        offset = _HEADER.size
+        sections: Dict[str, memoryview] = {}
+        for name, length in tables:
+            sections[name] = view[offset : offset + length * 4].cast("I")
+            offset += length * 4
+
+        self._segment_offsets = sections["segment_offsets"]
+        self._edge_offsets = sections["edge_offsets"]
+        self._edge_segments = sections["edge_segments"]
+        self._edge_children = sections["edge_children"]
+        self._wildcard_offsets = sections["wildcard_offsets"]
+        self._wildcard_segments = sections["wildcard_segments"]
+        self._nodes = view[offset : offset + nodes]
+        self._blob = view[offset + nodes : offset + nodes + blob]
+
+        self._segment_count = segments
+        self._any = self._segment_id("*")
+
+    @classmethod
+    def open(cls, path: str) -> "PolicySnapshot":
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        instance = cls(buffer)
+        instance._mmap = buffer
+
+        return instance
+
+    def close(self) -> None:
+        for view in (
+            self._segment_offsets,
+            self._edge_offsets,
+            self._edge_segments,
+            self._edge_children,
+            self._wildcard_offsets,
+            self._wildcard_segments,
+            self._nodes,
+            self._blob,
+            self._view,
+        ):
+            view.release()
+
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "PolicySnapshot":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _segment(self, segment_id: int) -> bytes:
+        return bytes(self._blob[self._segment_offsets[segment_id] : self._segment_offsets[segment_id + 1]])
+
+    def _segment_id(self, segment: str) -> int:
+        value = segment.encode()
+        low, high = 0, self._segment_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._segment(middle) < value:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self._segment_count and self._segment(low) == value:
+            return low
+
+        return -1
+
+    def _child(self, node: int, segment_id: int) -> int:
+        low, high = self._edge_offsets[node], self._edge_offsets[node + 1]
+        while low < high:
+            middle = (low + high) // 2
+            if self._edge_segments[middle] < segment_id:
+                low = middle + 1
+            else:
+                high = middle
+
+        if segment_id >= 0 and low < self._edge_offsets[node + 1] and self._edge_segments[low] == segment_id:
+            return self._edge_children[low]
+
+        return -1
+
+    def _wildcard_child(self, node: int, part: str) -> int:
+        for index in range(self._wildcard_offsets[node], self._wildcard_offsets[node + 1]):
+            segment_id = self._wildcard_segments[index]
+            if match_pattern(part, self._segment(segment_id).decode()):
+                return self._child(node, segment_id)
+
+        return -1
+
+    def _any_effect(self, node: int) -> int:
+        child = self._child(node, self._any)
+        return self._nodes[child] & _EFFECT_MASK if child >= 0 else 0
+
+    def is_allowed(self, scope: str) -> bool:
+        if not self._nodes[0]:
+            return False
+
+        # states reached by different members of a group are merged
+        states = {(0, _DENY)}
+        for section in group_scope(scope):
+            next_states = set()
+            for node, effect in states:
+                if not self._nodes[node] & _HAS_CHILDREN:
+                    if effect == _ALLOW:
+                        return True
+                    continue
+
+                effect = self._any_effect(node) or effect
+                for part in section:
+                    child = self._child(node, self._segment_id(part))
+                    if child < 0:
+                        child = self._wildcard_child(node, part)
+                    if child < 0:
+                        if effect == _ALLOW:
+                            return True
+                        continue
+                    next_states.add((child, effect))
+            states = next_states
+
+        for node, effect in states:
+            if self._nodes[node] & _EFFECT_MASK:
+                effect = self._nodes[node] & _EFFECT_MASK
+            elif effect != _ALLOW:
+                effect = self._any_effect(node) or _DENY
+
+            if effect == _ALLOW:
+                return True
+
+        return False
+
+
+__all__ = ["FORMAT_VERSION", "PolicySnapshot", "dump_snapshot", "write_snapshot"]
@@ -0,0 +1,119 @@
+from inspect import Parameter, signature
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .actor import Actor
+from .errors import InvalidReferenceError
+from .utils import _VAR_MATCHER
+
+ScopeResolverFunction = Callable[[Actor, Dict[str, Any]], str]
+
+_POSITIONAL = (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)
+
+
+class _Reference:
+    # a variable of a scope template bound to the function's parameter (or to a value given on resolution)
+    # with a chain of keys or attributes to follow, e.g. `{ article.author.id }`
+    __slots__ = ("name", "path", "bound", "position")
+
+    def __init__(self, name: str, path: List[str], bound: Optional[int], position: Optional[int]):
+        self.name = name
+        self.path = path
+        self.bound = bound
+        self.position = position
+
+    def resolve(self, args: tuple, kwargs: Dict[str, Any], bound: tuple) -> str:
+        if self.bound is not None:
+            value = bound[self.bound]
+        elif self.position is not None and self.position < len(args):
+            value = args[self.position]
+        elif self.name in kwargs:
+            value = kwargs[self.name]
+        else:
+            raise KeyError(self.name)
+
+        for attr in self.path:
+            if hasattr(value, "__getitem__"):
+                value = value[attr]
+            else:
+                value = getattr(value, attr)
+
+        return str(value).replace(" ", "")
+
+
+class ScopeTemplate:
+    # scope of a guarded function compiled when the function is decorated: the template is split into
+    # literal parts and references bound to function's parameters, so a call only looks the values up;
+    # scopes without references are resolved upfront
+    __slots__ = ("scope", "function", "static", "_parts", "_names", "_bound")
+
+    def __init__(self, scope: Union[str, ScopeResolverFunction], function: Callable, bound: Sequence[str] = ()):
+        self.scope = scope
+        self.function = function
+        self.static: Optional[str] = None
+        self._parts: List[Union[str, _Reference]] = []
+        self._bound = tuple(bound)
+
+        parameters = signature(function).parameters
+        self._names = tuple(parameters)
+        if callable(scope):
+            return
+
+        last = 0
+        for match in _VAR_MATCHER.finditer(scope):
+            self._parts.append(scope[last : match.start()].replace(" ", ""))
+            self._parts.append(self._reference(match.group("var"), parameters))
+            last = match.end()
+        self._parts.append(scope[last:].replace(" ", ""))
+
+        self._parts = [part for part in self._parts if part != ""]
+        if not any(isinstance(part, _Reference) for part in self._parts):
+            self.static = "".join(self._parts)  # type: ignore
+
+    def _reference(self, reference: str, parameters: Any) -> _Reference:
+        name, *path = reference.split(".")
+        if name in self._bound:
+            return _Reference(name, path, self._bound.index(name), None)
+
+        parameter = parameters.get(name)
+        if parameter is None or parameter.kind == Parameter.VAR_POSITIONAL:
+            # values can still be passed as keyword arguments collected by `**kwargs`
+            if any(item.kind == Parameter.VAR_KEYWORD for item in parameters.values()):
+                return _Reference(name, path, None, None)
+            raise InvalidReferenceError.unresolved_reference(scope=self.scope, function=self.function)
+
+        # parameters omitted by the caller are not resolved to their defaults
+        position = self._names.index(name) if parameter.kind in _POSITIONAL else None
+
+        return _Reference(name, path, None, position)
+
+    def resolve(self, actor: Actor, args: tuple, kwargs: Dict[str, Any], *bound: Any) -> str:
+        if self.static is not None:
+            return self.static
+
+        if callable(self.scope):
+            return self.scope(actor, self.bind(args, kwargs, *bound)).replace(" ", "")
+
+        try:
+            return "".join(
+                part if part.__class__ is str else part.resolve(args, kwargs, bound)  # type: ignore
+                for part in self._parts
+            )
+        except (AttributeError, KeyError) as error:
+            raise InvalidReferenceError.unresolved_reference(scope=self.scope, function=self.function) from error
+
+    def bind(self, args: tuple, kwargs: Dict[str, Any], *bound: Any) -> Dict[str, Any]:
+        # arguments by name, as expected by scope resolver functions
+        return {**kwargs, **dict(zip(self._names, args)), **dict(zip(self._bound, bound))}
+
+
+def bind_position(function: Callable, argument: str) -> Tuple[Optional[int], bool]:
+    # position of the argument (if it can be passed positionally) and whether the function accepts it at all
+    parameters = signature(function).parameters
+    parameter = parameters.get(argument)
+    if parameter is None:
+        return None, any(item.kind == Parameter.VAR_KEYWORD for item in parameters.values())
+
+    return (list(parameters).index(argument) if parameter.kind in _POSITIONAL else None), True
+
+
+__all__ = ["ScopeTemplate"]
@@ -1,35 +1,124 @@
 import re
-from collections import UserList
-from copy import copy
-from typing import Any, Callable, Dict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Tuple, Union
 
+_EPOCH = datetime(1970, 1, 1)
 
-class ObservableList(UserList):
-    def __init__(self, data: list, on_change: Callable):
-        super(ObservableList, self).__init__()
-        self.data = data
+
+def utc_from_ns(timestamp: int) -> datetime:
+    # timestamps are kept as ints (see `time.time_ns`) which take less memory than datetime objects
+    return _EPOCH + timedelta(microseconds=timestamp // 1000)
+
+
+class ListChange(NamedTuple):
+    # a change is described as removal of `removed` items followed by appending
+    # `added` items, so the order of list elements is kept for listeners
+    added: List[Any]
+    removed: List[Any]
+
+
+class ListReplacement(NamedTuple):
+    # items replaced in place as pairs of the old and the new item, so listeners
+    # can swap them without touching the following items
+    replaced: List[Tuple[Any, Any]]
+
+
+class ObservableList(list):
+    __slots__ = ("on_change",)
+
+    def __init__(self, data: Iterable[Any], on_change: Callable[[Union[ListChange, ListReplacement]], Any]):
+        super().__init__(data)
         self.on_change = on_change
 
+    def __reduce_ex__(self, protocol: Any) -> Any:
+        # copies (and pickles) are plain lists, otherwise rebuilding them would notify the listener
+        # of the original list (e.g. attach actor's policies once more)
+        return list, (list(self),)
+
+    def revert(self, change: Union[ListChange, ListReplacement]) -> None:
+        # restores the state from before a change adding or replacing items without notifying
+        # the listener, so the listener can reject it; changes adding items report the replaced
+        # tail of the list, so the tail is restored
+        if isinstance(change, ListReplacement):
+            for item, new_item in change.replaced:
+                super().__setitem__(self.index(new_item), item)
+        elif change.added:
+            super().__delitem__(slice(len(self) - len(change.added), None))
+            super().extend(change.removed)
+
+    def replace(self, item: Any, new_item: Any) -> None:
+        index = self.index(item)
+        replaced = self[index]
+        super().__setitem__(index, new_item)
+        self.on_change(ListReplacement([(replaced, new_item)]))
+
     def append(self, item: Any) -> None:
         super().append(item)
-        self.on_change(copy(self.data))
+        self.on_change(ListChange([item], []))
 
-    def insert(self, i: int, item: Any) -> None:
+    def insert(self, i: int, item: Any) -> None:  # type: ignore
+        tail = self[i:]
         super().insert(i, item)
-        self.on_change(copy(self.data))
+        self.on_change(ListChange(self[len(self) - len(tail) - 1 :], tail))
 
-    def pop(self, i: int = ...) -> Any:  # type: ignore
+    def pop(self, i: int = -1) -> Any:  # type: ignore
         result = super().pop(i)
-        self.on_change(copy(self.data))
+        self.on_change(ListChange([], [result]))
         return result
 
     def remove(self, item: Any) -> None:
+        removed = self[self.index(item)]
         super().remove(item)
-        self.on_change(copy(self.data))
+        self.on_change(ListChange([], [removed]))
 
     def clear(self) -> None:
+        removed = self[:]
         super().clear()
-        self.on_change(copy(self.data))
+        self.on_change(ListChange([], removed))
+
+    def extend(self, other: Iterable[Any]) -> None:
+        length = len(self)
+        super().extend(other)
+        self.on_change(ListChange(self[length:], []))
+
+    def __iadd__(self, other: Iterable[Any]) -> "ObservableList":  # type: ignore
+        self.extend(other)
+        return self
+
+    def __imul__(self, n: int) -> "ObservableList":  # type: ignore
+        removed = self[:]
+        super().__imul__(n)
+        if n > 0:
+            self.on_change(ListChange(self[len(removed) :], []))
+        else:
+            self.on_change(ListChange([], removed))
+        return self
+
+    def __setitem__(self, i: Union[int, slice], item: Any) -> None:  # type: ignore
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            first = start if step > 0 else min(range(start, stop, step), default=len(self))
+        else:
+            first = i % len(self) if -len(self) <= i < 0 else i
+
+        tail = self[first:]
+        super().__setitem__(i, item)
+        self.on_change(ListChange(self[first:], tail))
+
+    def __delitem__(self, i: Union[int, slice]) -> None:  # type: ignore
+        removed = self[i] if isinstance(i, slice) else [self[i]]
+        super().__delitem__(i)
+        self.on_change(ListChange([], removed))
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        removed = self[:]
+        super().sort(*args, **kwargs)
+        self.on_change(ListChange(self[:], removed))
+
+    def reverse(self) -> None:
+        removed = self[:]
+        super().reverse()
+        self.on_change(ListChange(self[:], removed))
 
 
 _ID_PATTERN = r"[_a-z][_a-z0-9\.]*"
@@ -1,4 +1,7 @@
+import copy
+
 from targe import Actor, Policy, Role
+from targe.role import role_registry
 
 
 def test_can_instantiate_actor() -> None:
@@ -75,3 +78,140 @@ def test_has_role() -> None:
     assert actor.has_role("example_role_1", "example_role_3")
     assert actor.has_role("example_role_1", "example_role_2")
     assert actor.has_role("example_role_1", "example_role_2", "example_role_3")
+
+    assert not actor.has_any_role("example_role_4")
+    assert actor.has_any_role("example_role_4", "example_role_2")
+
+
+def test_compiles_changes_incrementally() -> None:
+    # given
+    actor = Actor("1")
+    role = Role("example_role")
+    role.policies.append(Policy.deny("user:delete"))
+    role.policies.append(Policy.allow("user:*"))
+    actor.is_allowed("user:create")
+    compiled_policies = actor._compiled_policies
+
+    # when
+    actor.policies.extend([Policy.allow("article:*"), Policy.deny("article:delete")])
+    actor.roles += [role]
+
+    # then
+    assert actor._compiled_policies is compiled_policies
+    assert actor.is_allowed("user:create")
+    assert not actor.is_allowed("user:delete")
+    assert actor.is_allowed("article:create")
+    assert not actor.is_allowed("article:delete")
+
+    # when
+    del actor.policies[1]
+    actor.policies[0] = Policy.allow("user:delete")
+
+    # then
+    assert actor.is_allowed("user:delete")
+    assert actor.is_allowed("article:delete") is False
+
+    # when
+    actor.roles.clear()
+
+    # then
+    assert not actor.is_allowed("user:create")
+    assert actor.is_allowed("user:delete")
+
+
+def test_actor_policies_take_precedence_over_roles_added_later() -> None:
+    # given
+    actor = Actor("1")
+    role = Role("example_role")
+    role.policies.append(Policy.allow("user:delete"))
+    actor.policies.append(Policy.deny("user:delete"))
+
+    # when
+    assert not actor.is_allowed("user:delete")
+    actor.roles.append(role)
+
+    # then
+    assert not actor.is_allowed("user:delete")
+
+
+def test_can_cache_decisions() -> None:
+    # given
+    actor = Actor("1", cache_size=10)
+    role = Role("example_role")
+    role.policies.append(Policy.allow("user:*"))
+    actor.roles.append(role)
+
+    # when
+    assert actor.is_allowed("user:create")
+    assert actor.is_allowed("user:create")
+    role.policies.append(Policy.deny("user:create"))
+
+    # then
+    assert not actor.is_allowed("user:create")
+    assert actor.cache_info().hits == 1
+    assert actor.cache_info().misses == 2
+
+
+def test_can_list_allowed_scopes() -> None:
+    # given
+    role = Role("editor")
+    role.policies.append(Policy.allow("article : meta : set*, get*"))
+    role.policies.append(Policy.allow("article : read"))
+    actor = Actor("actor_id")
+    actor.roles.append(role)
+    actor.policies.append(Policy.deny("article : meta : setOwner"))
+    actor.policies.append(Policy.allow("article : meta : setOwner : self"))
+
+    # when
+    scopes = actor.allowed_scopes("article : meta")
+
+    # then
+    assert not isinstance(scopes, list)
+    assert list(scopes) == ["article:meta:setOwner:self", "article:meta:get*", "article:meta:set*"]
+    assert list(actor.allowed_scopes("article : 1")) == []
+    assert list(actor.allowed_scopes()) == [
+        "article:meta:setOwner:self",
+        "article:meta:get*",
+        "article:meta:set*",
+        "article:read",
+    ]
+
+
+def test_copying_policies_does_not_attach_them_again() -> None:
+    # given
+    role = Role("admin")
+    role.policies.append(Policy.allow("admin:*"))
+    actor = Actor("1")
+    actor.policies.append(Policy.allow("admin"))
+    actor.roles.append(role)
+    assert actor.is_allowed("admin")
+    assert actor.is_allowed("admin:users")
+
+    # when
+    copies = [copy.copy(actor.policies), copy.copy(role.policies), copy.deepcopy(actor.policies)]
+    actor.policies.clear()
+    role.policies.clear()
+
+    # then
+    assert all(type(item) is list for item in copies)
+    assert [len(item) for item in copies] == [1, 1, 1]
+    assert not actor.is_allowed("admin")
+    assert not actor.is_allowed("admin:users")
+
+
+def test_checking_roles_does_not_register_names() -> None:
+    # given
+    actor = Actor("1")
+    actor.roles.append(Role("registered_role"))
+    size = len(role_registry)
+
+    # when
+    for i in range(100):
+        assert not actor.has_role(f"unknown_role_{i}")
+        assert not actor.has_role("registered_role", f"unknown_role_{i}")
+        assert not actor.has_any_role(f"unknown_role_{i}")
+        assert actor.has_any_role(f"unknown_role_{i}", "registered_role")
+
+    # then
+    assert len(role_registry) == size
+    assert actor.has_role("registered_role")
@@ -1,7 +1,25 @@
-import pytest
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List
 from unittest.mock import MagicMock
 
-from targe import Actor, AuditEntry, Auth, InMemoryAuditStore, Policy, Role
+import pytest
+from gid import Guid
+
+from targe import (
+    Actor,
+    AuditEntry,
+    AuditLevel,
+    AuditStore,
+    Auth,
+    BackgroundAuditStore,
+    BatchAuditStore,
+    InMemoryAuditStore,
+    OverflowPolicy,
+    Policy,
+    Role,
+)
 from targe.errors import AccessDeniedError
 
 
@@ -106,3 +124,298 @@ def test_audit_with_rbac_style() -> None:
 
     assert auth.audit_store[0].scope == "user:create:12"
     assert auth.audit_store[1].scope == "user:delete:12"
+
+
+def test_creates_entries_lazily() -> None:
+    # given
+    before = time.time_ns()
+
+    # when
+    entry = AuditEntry("actor_id", "scope:id")
+
+    # then
+    assert not hasattr(entry, "__dict__")
+    assert entry._entry_id is None
+    assert len(entry.entry_id) == 16
+    assert entry.entry_id == entry.entry_id
+    assert before <= entry.created_at_ns <= time.time_ns()
+    assert entry.created_at == entry.created_on
+    assert isinstance(entry.created_at, datetime)
+
+
+def test_creates_entry_id_from_creation_time() -> None:
+    # given
+    entry = AuditEntry("actor_id", "scope:id")
+    time.sleep(0.01)
+
+    # when
+    entry_id = entry.entry_id
+    entry._entry_id = None
+
+    # then
+    assert Guid(entry_id).timestamp == entry.created_at_ns // 1_000_000
+    assert entry.entry_id == entry_id
+    assert AuditEntry("actor_id", "scope:id").entry_id != entry_id
+
+
+@pytest.mark.parametrize(
+    "audit_level, expected_statuses",
+    [
+        (AuditLevel.ALL, ["succeed", "failed", "failed"]),
+        (AuditLevel.DENIES_ONLY, ["failed", "failed"]),
+        (AuditLevel.OFF, []),
+    ],
+)
+def test_records_entries_by_audit_level(audit_level: AuditLevel, expected_statuses: list) -> None:
+    # given
+    actor = Actor("id")
+    actor.policies.append(Policy.allow("user : read : *"))
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=actor)
+    auth = Auth(actor_provider, audit_level=audit_level)
+
+    @auth.guard(scope="user : read : { user_id }")
+    def read_user(user_id: str) -> None:
+        pass
+
+    @auth.guard(scope="user : delete : { user_id }")
+    def delete_user(user_id: str) -> None:
+        pass
+
+    @auth.guard(roles=["user_manager"], scope="user : update")
+    def update_user() -> None:
+        pass
+
+    # when
+    auth.authorize("id")
+    read_user("12")
+    with pytest.raises(AccessDeniedError):
+        delete_user("12")
+    with pytest.raises(AccessDeniedError):
+        update_user()
+
+    # then
+    assert [str(entry.status) for entry in auth.audit_store] == expected_statuses
+
+
+class BatchRecordingAuditStore(BatchAuditStore):
+    def __init__(self):
+        self.batches: List[List[AuditEntry]] = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def append(self, log: AuditEntry) -> None:
+        self.extend([log])
+
+    def extend(self, logs: Iterable[AuditEntry]) -> None:
+        self.release.wait()
+        self.batches.append(list(logs))
+
+
+class AppendOnlyAuditStore(AuditStore):
+    def __init__(self):
+        self.entries: List[AuditEntry] = []
+
+    def append(self, log: AuditEntry) -> None:
+        self.entries.append(log)
+
+
+def test_can_extend_batch_audit_store() -> None:
+    # given
+    store = InMemoryAuditStore()
+    entries = [AuditEntry("actor_id", f"scope:id_{key}") for key in range(3)]
+
+    # when
+    store.extend(entries)
+
+    # then
+    assert isinstance(store, BatchAuditStore)
+    assert list(store) == entries
+
+
+def test_append_only_store_is_not_batch_audit_store() -> None:
+    # given
+    store = AppendOnlyAuditStore()
+
+    # then
+    assert isinstance(store, AuditStore)
+    assert not isinstance(store, BatchAuditStore)
+    assert not hasattr(store, "extend")
+
+
+def test_writes_batches_to_append_only_store() -> None:
+    # given
+    store = AppendOnlyAuditStore()
+    audit_store = BackgroundAuditStore(store, batch_size=2, flush_interval=60)
+    entries = [AuditEntry("actor_id", f"scope:id_{key}") for key in range(5)]
+
+    # when
+    audit_store.extend(entries)
+    audit_store.close()
+
+    # then
+    assert store.entries == entries
+    assert audit_store.stats().batches == 3
+
+
+def test_writes_audit_entries_in_batches() -> None:
+    # given
+    store = BatchRecordingAuditStore()
+    audit_store = BackgroundAuditStore(store, batch_size=2, flush_interval=60)
+
+    # when
+    audit_store.extend([AuditEntry("actor_id", f"scope:id_{key}") for key in range(5)])
+    audit_store.close()
+
+    # then
+    assert [[entry.scope for entry in batch] for batch in store.batches] == [
+        ["scope:id_0", "scope:id_1"],
+        ["scope:id_2", "scope:id_3"],
+        ["scope:id_4"],
+    ]
+    assert audit_store.stats() == (0, 5, 0, 3, 0)
+
+
+def test_writes_audit_entries_after_flush_interval() -> None:
+    # given
+    store = BatchRecordingAuditStore()
+    audit_store = BackgroundAuditStore(store, batch_size=100, flush_interval=0.01)
+
+    # when
+    audit_store.append(AuditEntry("actor_id", "scope:id"))
+    deadline = time.monotonic() + 5
+    while not store.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # then
+    assert [[entry.scope for entry in batch] for batch in store.batches] == [["scope:id"]]
+    audit_store.close()
+
+
+def test_can_flush_background_audit_store() -> None:
+    # given
+    store = InMemoryAuditStore()
+    audit_store = BackgroundAuditStore(store, batch_size=100, flush_interval=60)
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=Actor("id"))
+    auth = Auth(actor_provider, audit_store)
+
+    @auth.guard(scope="user : read")
+    def read_user() -> None:
+        pass
+
+    auth.authorize("id")
+    with pytest.raises(AccessDeniedError):
+        read_user()
+
+    # when
+    flushed = audit_store.flush(timeout=5)
+
+    # then
+    assert flushed
+    assert [entry.scope for entry in store] == ["user:read"]
+    audit_store.close()
+    audit_store.append(AuditEntry("id", "user:update"))
+    assert [entry.scope for entry in store] == ["user:read", "user:update"]
+
+
+@pytest.mark.parametrize(
+    "overflow, expected_scopes",
+    [
+        (OverflowPolicy.DROP_OLDEST, ["scope:id_0", "scope:id_3", "scope:id_4"]),
+        (OverflowPolicy.SAMPLE, ["scope:id_0", "scope:id_1", "scope:id_2"]),
+    ],
+)
+def test_drops_audit_entries_when_queue_is_full(overflow: OverflowPolicy, expected_scopes: list) -> None:
+    # given
+    store = BatchRecordingAuditStore()
+    store.release.clear()
+    audit_store = BackgroundAuditStore(store, max_queue_size=2, batch_size=1, overflow=overflow, sample_rate=0)
+    audit_store.append(AuditEntry("actor_id", "scope:id_0"))
+    deadline = time.monotonic() + 5
+    while audit_store._queue and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # when
+    for key in range(1, 5):
+        audit_store.append(AuditEntry("actor_id", f"scope:id_{key}"))
+    store.release.set()
+    audit_store.close()
+
+    # then
+    assert [entry.scope for batch in store.batches for entry in batch] == expected_scopes
+    assert audit_store.stats().dropped == 2
+
+
+def test_blocks_when_audit_queue_is_full() -> None:
+    # given
+    store = BatchRecordingAuditStore()
+    store.release.clear()
+    audit_store = BackgroundAuditStore(store, max_queue_size=1, batch_size=1)
+    audit_store.append(AuditEntry("actor_id", "scope:id_0"))
+    deadline = time.monotonic() + 5
+    while audit_store._queue and time.monotonic() < deadline:
+        time.sleep(0.01)
+    audit_store.append(AuditEntry("actor_id", "scope:id_1"))
+    appending = threading.Thread(target=audit_store.append, args=(AuditEntry("actor_id", "scope:id_2"),))
+
+    # when
+    appending.start()
+    appending.join(0.05)
+
+    # then
+    assert appending.is_alive()
+    store.release.set()
+    appending.join(5)
+    audit_store.close()
+    assert [entry.scope for batch in store.batches for entry in batch] == ["scope:id_0", "scope:id_1", "scope:id_2"]
+    assert audit_store.stats().dropped == 0
+
+
+def test_queues_audit_entries_appended_while_closing() -> None:
+    # given
+    store = BatchRecordingAuditStore()
+    store.release.clear()
+    audit_store = BackgroundAuditStore(store, batch_size=1)
+    audit_store.append(AuditEntry("actor_id", "scope:id_0"))
+    deadline = time.monotonic() + 5
+    while audit_store._queue and time.monotonic() < deadline:
+        time.sleep(0.01)
+    closing = threading.Thread(target=audit_store.close, daemon=True)
+    closing.start()
+    while not audit_store._closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    appending = threading.Thread(
+        target=audit_store.extend,
+        args=([AuditEntry("actor_id", f"scope:id_{key}") for key in range(1, 3)],),
+        daemon=True,
+    )
+
+    # when
+    appending.start()
+    appending.join(5)
+
+    # then
+    assert not appending.is_alive()
+    assert audit_store.stats().queued == 3
+    store.release.set()
+    closing.join(5)
+    audit_store.append(AuditEntry("actor_id", "scope:id_3"))
+    assert [entry.scope for batch in store.batches for entry in batch] == [f"scope:id_{key}" for key in range(4)]
+    assert audit_store.stats() == (0, 4, 0, 4, 0)
+
+
+def test_counts_audit_store_errors() -> None:
+    # given
+    store = MagicMock()
+    store.extend = MagicMock(side_effect=[RuntimeError, None])
+    audit_store = BackgroundAuditStore(store, batch_size=1)
+
+    # when
+    audit_store.append(AuditEntry("actor_id", "scope:id_0"))
+    audit_store.append(AuditEntry("actor_id", "scope:id_1"))
+    audit_store.close()
+
+    # then
+    assert store.extend.call_count == 2
+    assert audit_store.stats() == (0, 1, 0, 1, 1)
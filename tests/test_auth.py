@@ -1,11 +1,12 @@
+import threading
 from dataclasses import dataclass
 from functools import wraps
 from unittest.mock import MagicMock
 
 import pytest
 
-from targe import Actor, Auth, Policy, Role, PolicyEffect
-from targe.errors import AccessDeniedError, AuthorizationError, UnauthorizedError
+from targe import Actor, Auth, Policy, PolicyEffect, Role
+from targe.errors import AccessDeniedError, AuthorizationError, InvalidReferenceError, UnauthorizedError
 
 
 def test_can_instantiate() -> None:
@@ -113,6 +114,78 @@ def test_can_guard_rbac_style() -> None:
     update_article({})
 
 
+def test_can_guard_any_of_roles() -> None:
+    # given
+    actor = Actor("id")
+    reader = Role("reader")
+    editor = Role("editor")
+    chief = Role("chief")
+    chief.parents.append(editor)
+
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=actor)
+    auth = Auth(actor_provider)
+
+    @auth.guard(roles=["reader"], any_roles=["editor", "admin"])
+    def update_article(article: dict) -> None:
+        pass
+
+    # when
+    auth.authorize("id")
+    actor.roles.append(reader)
+
+    # then
+    with pytest.raises(AccessDeniedError):
+        update_article({})
+
+    # when
+    actor.roles.append(chief)
+
+    # then
+    update_article({})
+
+    # when
+    chief.parents.remove(editor)
+
+    # then
+    with pytest.raises(AccessDeniedError):
+        update_article({})
+
+
+def test_can_guard_roles_unknown_when_decorating() -> None:
+    # given
+    actor = Actor("id")
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=actor)
+    auth = Auth(actor_provider)
+
+    @auth.guard(roles=["late_reader"], any_roles=["late_editor", "late_admin"])
+    def update_article() -> None:
+        pass
+
+    @auth.guard(any_roles=["never_created"])
+    def delete_article() -> None:
+        pass
+
+    # when
+    auth.authorize("id")
+
+    # then
+    with pytest.raises(AccessDeniedError):
+        update_article()
+    with pytest.raises(AccessDeniedError):
+        delete_article()
+
+    # when
+    actor.roles.append(Role("late_reader"))
+    actor.roles.append(Role("late_editor"))
+
+    # then
+    update_article()
+    with pytest.raises(AccessDeniedError):
+        delete_article()
+
+
 def test_can_guard_after() -> None:
     # given
     actor = Actor("actor_id")
@@ -318,3 +391,206 @@ def test_can_guard_resource_with_structured_id() -> None:
 
     # then
     update_article(article)
+
+
+def test_can_guard_each_element_of_argument() -> None:
+    # given
+    actor = Actor("actor_id")
+    actor.policies.append(Policy.allow("article : * : update"))
+    actor.policies.append(Policy.deny("article : locked : update"))
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=actor)
+    auth = Auth(actor_provider)
+    on_guard = MagicMock(return_value=False)
+    auth._on_guard = on_guard
+
+    @auth.guard_each(scope="article : { articles.id } : update", argument="articles")
+    def update_articles(articles) -> list:
+        return articles
+
+    # when
+    auth.authorize("actor_id")
+    result = update_articles(iter([{"id": "1"}, {"id": "2"}, {"id": "1"}]))
+
+    # then
+    assert result == [{"id": "1"}, {"id": "2"}, {"id": "1"}]
+    assert len(auth.audit_store) == 1
+    assert auth.audit_store[0].scopes == ["article:1:update", "article:2:update"]
+    assert str(auth.audit_store[0].status) == "succeed"
+
+    # when
+    with pytest.raises(AccessDeniedError) as error:
+        update_articles(articles=[{"id": "locked"}, {"id": "1"}, {"id": "locked"}])
+
+    # then
+    assert error.value.kwargs["scope"] == "article:locked:update"
+    assert on_guard.call_count == 1
+    assert len(auth.audit_store) == 2
+    assert auth.audit_store[1].denied == ["article:locked:update"]
+    assert str(auth.audit_store[1].status) == "failed"
+
+
+def test_can_filter_returned_elements() -> None:
+    # given
+    actor = Actor("actor_id")
+    actor.policies.append(Policy.allow("article : public, draft : *"))
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=actor)
+    auth = Auth(actor_provider)
+
+    @auth.filter_after(scope="article : { return.status } : { return.id }")
+    def list_articles() -> list:
+        return [
+            {"id": "1", "status": "public"},
+            {"id": "2", "status": "private"},
+            {"id": "3", "status": "draft"},
+        ]
+
+    # when
+    auth.authorize("actor_id")
+    result = list_articles()
+
+    # then
+    assert [article["id"] for article in result] == ["1", "3"]
+    assert len(auth.audit_store) == 1
+    assert auth.audit_store[0].scope == "article:{return.status}:{return.id}"
+    assert auth.audit_store[0].denied == ["article:private:2"]
+
+
+def test_fails_on_decoration_for_unresolved_reference() -> None:
+    # given
+    auth = Auth(MagicMock())
+
+    # then
+    with pytest.raises(InvalidReferenceError):
+
+        @auth.guard(scope="article : { article_id } : update")
+        def update_article(article) -> None:
+            pass
+
+    with pytest.raises(InvalidReferenceError):
+
+        @auth.guard_each(scope="article : { articles.id }", argument="articles")
+        def update_articles(items) -> None:
+            pass
+
+
+def test_can_resolve_scope_from_keyword_arguments() -> None:
+    # given
+    actor = Actor("actor_id")
+    actor.policies.append(Policy.allow("article : draft : 1"))
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=actor)
+    auth = Auth(actor_provider)
+
+    @auth.guard(scope="article : { status } : { article.id }")
+    def update_article(article, *, status="draft") -> None:
+        pass
+
+    @auth.guard(scope="article : { article.id }")
+    def delete_article(**kwargs) -> None:
+        pass
+
+    # when
+    auth.authorize("actor_id")
+
+    # then
+    update_article({"id": "1"}, status="draft")
+    with pytest.raises(AccessDeniedError):
+        update_article({"id": "1"}, status="public")
+    with pytest.raises(InvalidReferenceError):
+        delete_article(item={"id": "1"})
+
+
+def test_fails_to_resolve_reference_to_omitted_argument() -> None:
+    # given
+    actor = Actor("actor_id")
+    actor.policies.append(Policy.allow("articles : *"))
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=actor)
+    auth = Auth(actor_provider)
+
+    @auth.guard(scope="articles : { article_id } : update")
+    def update(article_id=None) -> None:
+        pass
+
+    @auth.guard(scope="articles : { status }")
+    def list_articles(*, status="draft") -> None:
+        pass
+
+    # when
+    auth.authorize("actor_id")
+
+    # then
+    update(1)
+    with pytest.raises(InvalidReferenceError):
+        update()
+    with pytest.raises(InvalidReferenceError):
+        list_articles()
+
+
+def test_keeps_actor_per_thread() -> None:
+    # given
+    actor_provider = MagicMock()
+    actor_provider.get_actor = lambda context: Actor(context)
+    auth = Auth(actor_provider)
+    seen = {}
+
+    @auth.guard()
+    def current_actor() -> str:
+        return auth.actor.actor_id
+
+    def handle_request(actor_id: str) -> None:
+        auth.authorize(actor_id)
+        barrier.wait()
+        seen[actor_id] = current_actor()
+
+    barrier = threading.Barrier(2)
+    threads = [threading.Thread(target=handle_request, args=(actor_id,)) for actor_id in ("1", "2")]
+
+    # when
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # then
+    assert seen == {"1": "1", "2": "2"}
+    assert auth.actor is None
+
+
+def test_can_authorize_actor_within_block() -> None:
+    # given
+    actor_provider = MagicMock()
+    actor_provider.get_actor = lambda context: Actor(context)
+    auth = Auth(actor_provider)
+
+    # when
+    with auth.authorized("1") as actor:
+        # then
+        assert auth.actor is actor
+
+        with auth.authorized("2"):
+            assert auth.actor.actor_id == "2"
+
+        assert auth.actor is actor
+
+    # then
+    assert auth.actor is None
+
+
+def test_can_share_actor_globally() -> None:
+    # given
+    actor_provider = MagicMock()
+    actor_provider.get_actor = lambda context: Actor(context)
+    auth = Auth(actor_provider, global_actor=True)
+    seen = []
+
+    # when
+    actor = auth.authorize("1")
+    thread = threading.Thread(target=lambda: seen.append(auth.actor))
+    thread.start()
+    thread.join()
+
+    # then
+    assert seen == [actor]
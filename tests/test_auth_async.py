@@ -0,0 +1,180 @@
+import asyncio
+import threading
+from typing import Any, List
+
+import pytest
+
+from targe import Actor, AuditEntry, Auth, Policy, Role
+from targe.errors import AccessDeniedError, AsyncSupportError
+
+
+class AsyncActorProvider:
+    def __init__(self, actor: Actor):
+        self.actor = actor
+
+    async def get_actor(self, context: Any = None) -> Actor:
+        await asyncio.sleep(0)
+        return self.actor
+
+
+class AsyncAuditStore:
+    def __init__(self):
+        self.entries: List[AuditEntry] = []
+
+    async def append(self, log: AuditEntry) -> None:
+        await asyncio.sleep(0)
+        self.entries.append(log)
+
+
+def test_can_guard_coroutine_function() -> None:
+    # given
+    actor = Actor("actor_id")
+    actor.policies.append(Policy.allow("article : 1 : update"))
+    audit_store = AsyncAuditStore()
+    auth = Auth(AsyncActorProvider(actor), audit_store=audit_store)
+
+    @auth.guard(scope="article : { article_id } : update")
+    async def update_article(article_id: str) -> str:
+        return article_id
+
+    async def handle_request() -> None:
+        await auth.authorize_async("actor_id")
+
+        # then
+        assert await update_article("1") == "1"
+        with pytest.raises(AccessDeniedError):
+            await update_article("2")
+
+    # when
+    asyncio.run(handle_request())
+
+    # then
+    assert [str(entry.status) for entry in audit_store.entries] == ["succeed", "failed"]
+
+
+def test_can_guard_coroutine_function_after_it_is_awaited() -> None:
+    # given
+    actor = Actor("actor_id")
+    actor.policies.append(Policy.allow("article : public : *"))
+    auth = Auth(AsyncActorProvider(actor))
+
+    @auth.guard_after(scope="article : { return.status } : { return.id }")
+    async def get_article(article_id: str) -> dict:
+        return {"id": article_id, "status": "public" if article_id == "1" else "private"}
+
+    @auth.filter_after(scope="article : { return.status } : { return.id }")
+    async def list_articles() -> list:
+        return [{"id": "1", "status": "public"}, {"id": "2", "status": "private"}]
+
+    async def handle_request() -> None:
+        await auth.authorize_async()
+
+        # then
+        assert await get_article("1") == {"id": "1", "status": "public"}
+        with pytest.raises(AccessDeniedError):
+            await get_article("2")
+        assert await list_articles() == [{"id": "1", "status": "public"}]
+
+    # when
+    asyncio.run(handle_request())
+
+
+def test_can_use_async_on_guard() -> None:
+    # given
+    actor = Actor("actor_id")
+    actor.roles.append(Role("editor"))
+
+    async def on_guard(actor: Actor, scope: str) -> bool:
+        await asyncio.sleep(0)
+        return scope == "article:owned:update"
+
+    auth = Auth(AsyncActorProvider(actor), on_guard=on_guard)
+
+    @auth.guard(scope="article : { article_id } : update", roles=["editor"])
+    async def update_article(article_id: str) -> None:
+        pass
+
+    @auth.guard_each(scope="article : { article_ids } : update", argument="article_ids")
+    async def update_articles(article_ids: list) -> None:
+        pass
+
+    @auth.guard(scope="article : { article_id } : update")
+    def update_article_sync(article_id: str) -> None:
+        pass
+
+    async def handle_request() -> None:
+        await auth.authorize_async()
+
+        # then
+        await update_article("owned")
+        await update_articles(["owned"])
+        with pytest.raises(AccessDeniedError):
+            await update_article("other")
+        with pytest.raises(AccessDeniedError):
+            await update_articles(["owned", "other"])
+        with pytest.raises(AsyncSupportError):
+            update_article_sync("owned")
+
+    # when
+    asyncio.run(handle_request())
+
+
+def test_can_offload_blocking_actor_provider() -> None:
+    # given
+    threads = []
+
+    class BlockingActorProvider:
+        def get_actor(self, context: Any = None) -> Actor:
+            threads.append(threading.current_thread())
+            return Actor(context)
+
+    auth = Auth(BlockingActorProvider(), offload_provider=True)
+
+    async def handle_request() -> Actor:
+        actor = await auth.authorize_async("actor_id")
+        assert auth.actor is actor
+        return actor
+
+    # when
+    actor = asyncio.run(handle_request())
+
+    # then
+    assert actor.actor_id == "actor_id"
+    assert threads[0] is not threading.main_thread()
+
+
+def test_fails_to_authorize_synchronously_with_async_provider() -> None:
+    # given
+    auth = Auth(AsyncActorProvider(Actor("actor_id")))
+
+    # then
+    with pytest.raises(AsyncSupportError):
+        auth.authorize()
+
+
+def test_keeps_actor_per_task() -> None:
+    # given
+    class ActorProvider:
+        async def get_actor(self, context: Any = None) -> Actor:
+            await asyncio.sleep(0)
+            return Actor(context)
+
+    auth = Auth(ActorProvider())
+
+    @auth.guard()
+    async def current_actor() -> str:
+        await asyncio.sleep(0)
+        return auth.actor.actor_id
+
+    async def handle_request(actor_id: str) -> str:
+        async with auth.authorized_async(actor_id):
+            return await current_actor()
+
+    async def handle_requests() -> List[str]:
+        return await asyncio.gather(*(handle_request(str(actor_id)) for actor_id in range(10)))
+
+    # when
+    result = asyncio.run(handle_requests())
+
+    # then
+    assert result == [str(actor_id) for actor_id in range(10)]
@@ -0,0 +1,85 @@
+import pytest
+
+from targe.codegen import compile_evaluator
+from targe.policy import CompiledPolicies, Policy
+
+
+@pytest.mark.parametrize(
+    "policies, scopes",
+    [
+        [
+            [Policy.allow("resource"), Policy.deny("resource:create"), Policy.allow("resource:level_1")],
+            ["resource", "resource:level_1", "resource:level_1:level_2", "resource:create", "other"],
+        ],
+        [
+            [Policy.allow("resource:set*"), Policy.deny("resource:setEmail"), Policy.allow("resource:*Name")],
+            ["resource:set", "resource:setName", "resource:setEmail", "resource:getName", "resource"],
+        ],
+        [
+            [Policy.allow("resource:*"), Policy.deny("resource:level_1:denied")],
+            ["resource", "resource:setName", "resource:level_1:level_2", "resource:level_1:denied"],
+        ],
+        [
+            [Policy.allow("resource : a, b, c, d, e, f : *"), Policy.deny("resource : b, c : delete")],
+            ["resource:a:delete", "resource:b:delete", "resource:f:read", "resource : g, b : read", "resource:g"],
+        ],
+    ],
+)
+def test_gives_same_results_as_compiled_policies(policies: list, scopes: list) -> None:
+    # given
+    compiled = CompiledPolicies()
+    for policy in policies:
+        compiled.attach(policy)
+
+    # when
+    evaluate = compile_evaluator(compiled)
+
+    # then
+    for scope in scopes:
+        assert evaluate(scope) == compiled.is_allowed(scope), scope
+
+
+def test_evaluates_layers() -> None:
+    # given
+    role = CompiledPolicies()
+    role.attach(Policy.allow("article : *"))
+    compiled = CompiledPolicies([role])
+    compiled.attach(Policy.deny("article : *Draft"))
+
+    # when
+    evaluate = compile_evaluator(compiled)
+
+    # then
+    assert evaluate("article:read")
+    assert not evaluate("article:newDraft")
+    assert not evaluate("invoice:read")
+
+
+def test_is_not_allowed_when_empty() -> None:
+    # when
+    evaluate = compile_evaluator(CompiledPolicies())
+
+    # then
+    assert not evaluate("resource")
+    assert not evaluate("*")
+
+
+def test_regenerates_evaluator_on_change() -> None:
+    # given
+    role = CompiledPolicies()
+    role.attach(Policy.allow("article : *"))
+    compiled = CompiledPolicies([role])
+
+    # when
+    evaluate = compiled.evaluator()
+
+    # then
+    assert compiled.evaluator() is evaluate
+    assert evaluate("article:read")
+
+    # when
+    role.attach(Policy.deny("article : read"))
+
+    # then
+    assert compiled.evaluator() is not evaluate
+    assert not compiled.evaluator()("article:read")
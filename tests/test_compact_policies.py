@@ -0,0 +1,200 @@
+import pytest
+
+from targe import compact
+from targe.actor import CompiledPolicies
+from targe.compact import CompactPolicies
+from targe.policy import Policy
+
+
+def test_can_instantiate() -> None:
+    # given
+    instance = CompactPolicies()
+
+    # then
+    assert isinstance(instance, CompactPolicies)
+    assert len(instance) == 1
+
+
+def test_can_attach_policy() -> None:
+    # given
+    instance = CompactPolicies()
+
+    # when
+    instance.attach(Policy.allow("resource:create"))
+    instance.attach(Policy.deny("resource:delete"))
+    instance.attach(Policy.allow("resource:set*"))
+    instance.attach(Policy.deny("resource:set*:set*"))
+
+    # then
+    assert len(instance) == 6
+
+
+def test_shares_nodes_between_policies() -> None:
+    # given
+    instance = CompactPolicies()
+
+    # when
+    instance.attach(Policy.allow("resource:create"))
+    instance.attach(Policy.deny("resource:create"))
+
+    # then
+    assert len(instance) == 3
+    assert not instance.is_allowed("resource:create")
+
+
+@pytest.mark.parametrize(
+    "policies, scopes",
+    [
+        [
+            [Policy.allow("resource"), Policy.deny("resource:create"), Policy.allow("resource:level_1")],
+            ["resource", "resource:level_1", "resource:level_1:level_2", "resource:create", "other"],
+        ],
+        [
+            [Policy.allow("resource:set*"), Policy.deny("resource:setEmail")],
+            ["resource:set", "resource:setName", "resource:setEmail", "resource:set:set", "resource"],
+        ],
+        [
+            [Policy.allow("resource:*"), Policy.deny("resource:level_1:denied")],
+            ["resource", "resource:setName", "resource:level_1:level_2", "resource:level_1:denied"],
+        ],
+        [
+            [
+                Policy.allow("resource:*:allowed"),
+                Policy.deny("resource:id_n:allowed"),
+                Policy.allow("resource_2:*"),
+                Policy.deny("resource_2:*:denied"),
+            ],
+            [
+                "resource:id_1:allowed",
+                "resource:id_n:allowed",
+                "resource:id",
+                "resource:id:denied",
+                "resource_2:id_1:allowed",
+                "resource_2:id",
+                "resource_2:id:denied",
+            ],
+        ],
+        [
+            [Policy.allow("resource : group-a , group-b : allow")],
+            [
+                "resource : group-a : allow",
+                "resource:group-b:allow",
+                "resource:group-c:allow",
+                "resource:group-a,group-c:allow",
+            ],
+        ],
+    ],
+)
+def test_gives_same_results_as_compiled_policies(policies: list, scopes: list) -> None:
+    # given
+    compiled = CompiledPolicies()
+    compact = CompactPolicies()
+
+    # when
+    for policy in policies:
+        compiled.attach(policy)
+        compact.attach(policy)
+
+    # then
+    for scope in scopes:
+        assert compact.is_allowed(scope) == compiled.is_allowed(scope), scope
+
+
+def test_is_not_allowed_when_empty() -> None:
+    # given
+    instance = CompactPolicies()
+
+    # then
+    assert not instance.is_allowed("resource")
+    assert not instance.is_allowed("*")
+
+
+def test_can_merge_compiled_policies() -> None:
+    # given
+    role = CompiledPolicies()
+    role.attach(Policy.allow("resource : a, b, c : *"))
+    role.attach(Policy.allow("resource : set*, get*"))
+    compiled = CompiledPolicies([role])
+    compiled.attach(Policy.deny("resource : b : delete"))
+
+    # when
+    instance = CompactPolicies.from_compiled(compiled)
+
+    # then
+    assert len(instance) == 7
+    for scope in ["resource:a:delete", "resource:b:delete", "resource:b:read", "resource:setName", "resource:x"]:
+        assert instance.is_allowed(scope) == compiled.is_allowed(scope), scope
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_is_allowed_many(vectorized: bool, monkeypatch: pytest.MonkeyPatch) -> None:
+    # given
+    if not vectorized:
+        monkeypatch.setattr(compact, "numpy", None)
+    elif compact.numpy is None:
+        pytest.skip("numpy is not installed")
+
+    role = CompiledPolicies()
+    role.attach(Policy.allow("article : *"))
+    role.attach(Policy.allow("invoice : 1, 2 : read, update"))
+    role.attach(Policy.allow("user : set*"))
+    compiled = CompiledPolicies([role])
+    compiled.attach(Policy.deny("article : *Draft"))
+    scopes = [
+        "article",
+        "article:12:update",
+        "article:newDraft",
+        "invoice:1:read",
+        "invoice:3:read",
+        "invoice:2:update:other",
+        "invoice : 3, 2 : update",
+        "user:setName",
+        "user:getName",
+        "unknown",
+    ]
+
+    # when
+    result = compiled.is_allowed_many(scopes)
+
+    # then
+    assert list(result) == [compiled.is_allowed(scope) for scope in scopes]
+    assert list(result) == [True, True, False, True, False, False, True, True, False, False]
+
+    # when
+    compiled.attach(Policy.deny("user : setName"))
+
+    # then
+    assert not compiled.is_allowed_many(["user:setName"])[0]
+
+
+def test_is_allowed_many_follows_wildcards() -> None:
+    # given
+    if compact.numpy is None:
+        pytest.skip("numpy is not installed")
+
+    compiled = CompiledPolicies()
+    compiled.attach(Policy.allow("invoice:*:read"))
+    compiled.attach(Policy.deny("invoice:*:delete"))
+    compiled.attach(Policy.allow("invoice:1:*"))
+    compiled.attach(Policy.allow("article:*:meta:set*"))
+    compiled.attach(Policy.deny("article:7:meta:setName"))
+    compiled.attach(Policy.allow("user:*"))
+    scopes = [
+        "invoice:9:read",
+        "invoice:9:delete",
+        "invoice:1:delete",
+        "invoice:1:read:other",
+        "article:5:meta:setName",
+        "article:7:meta:setName",
+        "article:5:meta:getName",
+        "article:5:other",
+        "user:1:read",
+        "user",
+    ]
+
+    # when
+    result = compiled.is_allowed_many(scopes * 3)
+
+    # then
+    assert list(result) == [compiled.is_allowed(scope) for scope in scopes] * 3
+    assert list(result[: len(scopes)]) == [True, False, True, True, True, False, False, False, True, True]
@@ -1,5 +1,6 @@
 from targe.actor import CompiledPolicies
 from targe.policy import Policy, PolicyEffect
+from targe.role import Role
 
 
 def test_can_instantiate() -> None:
@@ -40,7 +41,7 @@ def test_can_attach_policy() -> None:
                             "set*": {
                                 "$effect": PolicyEffect.DENY,
                             },
-                        }
+                        },
                     },
                 },
             },
@@ -157,3 +158,354 @@ def test_is_allowed_for_grouped_policies() -> None:
     assert instance.is_allowed("resource : group-a : allow")
     assert instance.is_allowed("resource:group-b:allow")
 
+
+def test_can_detach_policy() -> None:
+    # given
+    instance = CompiledPolicies()
+    create = Policy.allow("resource:create")
+    set_all = Policy.allow("resource:set*")
+    deny_set_all = Policy.deny("resource:set*:set*")
+
+    # when
+    instance.attach(create)
+    instance.attach(set_all)
+    instance.attach(deny_set_all)
+    instance.detach(deny_set_all)
+    instance.detach(create)
+
+    # then
+    assert instance.permissions == {
+        "$wildcards": set(),
+        "$nodes": {
+            "resource": {
+                "$wildcards": {"set*"},
+                "$nodes": {
+                    "set*": {
+                        "$effect": PolicyEffect.ALLOW,
+                    },
+                },
+            },
+        },
+    }
+
+    # when
+    instance.detach(set_all)
+
+    # then
+    assert instance.permissions == {}
+    assert not instance.is_allowed("resource:setName")
+
+
+def test_detach_restores_previous_effect() -> None:
+    # given
+    instance = CompiledPolicies()
+    allow = Policy.allow("resource:*")
+    deny = Policy.deny("resource:*")
+
+    # when
+    instance.attach(allow)
+    instance.attach(deny)
+
+    # then
+    assert not instance.is_allowed("resource:create")
+
+    # when
+    instance.detach(deny)
+
+    # then
+    assert instance.is_allowed("resource:create")
+
+    # when
+    instance.detach(deny)
+    instance.detach(Policy.allow("resource:*"))
+
+    # then
+    assert instance.is_allowed("resource:create")
+
+
+def test_replaced_policy_keeps_its_precedence() -> None:
+    # given
+    role = Role("editor")
+    role.policies = [Policy.allow("doc:x"), Policy.deny("doc:x"), Policy.allow("doc:y")]
+    instance = role.compiled_policies
+    policies = role.policies
+
+    # when
+    policies.replace(policies[0], Policy.allow("doc:x,z"))
+    policies.replace(policies[2], Policy.deny("doc:*"))
+
+    # then
+    expected = CompiledPolicies()
+    for policy in policies:
+        expected.attach(policy)
+    for scope in ["doc:x", "doc:y", "doc:z"]:
+        assert instance.is_allowed(scope) == expected.is_allowed(scope)
+    assert not instance.is_allowed("doc:x")
+    assert instance.is_allowed("doc:z")
+
+
+def test_layers_give_same_results_as_merged_policies() -> None:
+    # given
+    layer_policies = [
+        [Policy.allow("resource:*"), Policy.deny("resource:set*:denied"), Policy.allow("other:a")],
+        [Policy.deny("resource:delete"), Policy.allow("resource:setName:*"), Policy.allow("other:*")],
+        [Policy.allow("resource:delete"), Policy.deny("other:b"), Policy.allow("resource:*:allowed")],
+    ]
+    merged = CompiledPolicies()
+    layers = []
+    for policies in layer_policies:
+        layer = CompiledPolicies()
+        for policy in policies:
+            layer.attach(policy)
+            merged.attach(policy)
+        layers.insert(0, layer)
+
+    # when
+    instance = CompiledPolicies(layers[1:])
+    for policy in layer_policies[-1]:
+        instance.attach(policy)
+
+    # then
+    for scope in [
+        "resource",
+        "resource:delete",
+        "resource:setName",
+        "resource:setName:denied",
+        "resource:setName:other",
+        "resource:id:allowed",
+        "resource:delete:allowed",
+        "other",
+        "other:a",
+        "other:b",
+        "other:c",
+        "unknown",
+        "resource : delete, setName : denied",
+        "resource : setName : denied, other",
+        "other : b, c",
+        "other, resource : b",
+    ]:
+        assert instance.is_allowed(scope) == merged.is_allowed(scope), scope
+    # lookups walk layers merged into a single trie, built once for every version
+    assert instance._root() == merged.permissions
+    assert instance._root() is instance._root()
+
+
+def test_follows_changes_within_nested_layers() -> None:
+    # given
+    inherited = CompiledPolicies()
+    layer = CompiledPolicies()
+    layer.attach(Policy.allow("resource:read"))
+    instance = CompiledPolicies([layer])
+    assert not instance.is_allowed("resource:delete")
+
+    # when
+    layer.layers = [inherited]
+    inherited.attach(Policy.allow("resource:*"))
+
+    # then
+    assert instance.is_allowed("resource:delete")
+    assert instance.is_allowed("resource:read")
+
+    # when
+    layer.layers = []
+
+    # then
+    assert not instance.is_allowed("resource:delete")
+    assert instance.is_allowed("resource:read")
+
+
+def test_caches_decisions() -> None:
+    # given
+    instance = CompiledPolicies(cache_size=2)
+    instance.attach(Policy.allow("resource:*"))
+
+    # when
+    assert instance.is_allowed("resource:create")
+    assert instance.is_allowed("resource : create")
+    assert instance.is_allowed("resource:update")
+    assert not instance.is_allowed("other")
+
+    # then
+    assert instance.cache_info() == (1, 3, 2, 2)
+
+    # when
+    assert instance.is_allowed("resource:create")
+
+    # then
+    assert instance.cache_info().misses == 4
+
+
+def test_drops_cached_decisions_on_change() -> None:
+    # given
+    layer = CompiledPolicies()
+    instance = CompiledPolicies([layer], cache_size=10)
+    deny = Policy.deny("resource:delete")
+
+    # then
+    assert not instance.is_allowed("resource:delete")
+
+    # when
+    layer.attach(Policy.allow("resource:*"))
+
+    # then
+    assert instance.is_allowed("resource:delete")
+
+    # when
+    instance.attach(deny)
+
+    # then
+    assert not instance.is_allowed("resource:delete")
+
+    # when
+    instance.detach(deny)
+
+    # then
+    assert instance.is_allowed("resource:delete")
+
+    # when
+    instance.layers = []
+
+    # then
+    assert not instance.is_allowed("resource:delete")
+    assert instance.cache_info().hits == 0
+
+
+def test_caches_decisions_made_after_change() -> None:
+    # given
+    class RacingCompiledPolicies(CompiledPolicies):
+        def __init__(self):
+            super().__init__(cache_size=10)
+            self.decisions = []
+
+        def _changed(self) -> None:
+            super()._changed()
+            # lookup made right after the version was changed is cached under the new version
+            self.decisions.append(self.is_allowed("resource:delete"))
+
+    instance = RacingCompiledPolicies()
+    allow = Policy.allow("resource:delete")
+    deny = Policy.deny("resource:delete")
+
+    # when
+    instance.attach(allow)
+    instance.replace(allow, deny)
+    instance.detach(deny)
+
+    # then
+    assert instance.decisions == [True, False, False]
+    assert not instance.is_allowed("resource:delete")
+    assert instance.cache_info().hits == 1
+
+
+def test_drops_cached_decisions_on_change_of_nested_layer() -> None:
+    # given
+    inherited = CompiledPolicies()
+    instance = CompiledPolicies([CompiledPolicies([inherited])], cache_size=10)
+    allow = Policy.allow("resource:*")
+    assert not instance.is_allowed("resource:delete")
+    version = instance.version
+
+    # when
+    inherited.attach(allow)
+
+    # then
+    assert instance.version > version
+    assert instance.is_allowed("resource:delete")
+
+    # when
+    inherited.detach(allow)
+
+    # then
+    assert not instance.is_allowed("resource:delete")
+    assert instance.cache_info().hits == 0
+
+
+def test_attaches_grouped_sections_as_single_edge() -> None:
+    # given
+    instance = CompiledPolicies()
+
+    # when
+    instance.attach(Policy.allow("resource : a, b, c : x, y"))
+
+    # then
+    assert instance.permissions == {
+        "$wildcards": set(),
+        "$nodes": {
+            "resource": {
+                "$wildcards": set(),
+                "$groups": {"a": "a,b,c", "b": "a,b,c", "c": "a,b,c"},
+                "$nodes": {
+                    "a,b,c": {
+                        "$wildcards": set(),
+                        "$groups": {"x": "x,y", "y": "x,y"},
+                        "$nodes": {
+                            "x,y": {
+                                "$effect": PolicyEffect.ALLOW,
+                            },
+                        },
+                    },
+                },
+            },
+        },
+    }
+
+
+def test_splits_overlapping_groups() -> None:
+    # given
+    instance = CompiledPolicies()
+    grouped = Policy.allow("resource : a, b, c : read")
+
+    # when
+    instance.attach(grouped)
+    instance.attach(Policy.deny("resource : c, d : read"))
+    instance.attach(Policy.allow("resource : b : write"))
+
+    # then
+    assert set(instance.permissions["$nodes"]["resource"]["$nodes"]) == {"a", "b", "c", "d"}
+    assert instance.is_allowed("resource:a:read")
+    assert instance.is_allowed("resource:b:read")
+    assert instance.is_allowed("resource:b:write")
+    assert not instance.is_allowed("resource:c:read")
+    assert not instance.is_allowed("resource:d:read")
+
+    # when
+    instance.detach(grouped)
+
+    # then
+    assert set(instance.permissions["$nodes"]["resource"]["$nodes"]) == {"b", "c", "d"}
+    assert not instance.is_allowed("resource:a:read")
+    assert not instance.is_allowed("resource:b:read")
+    assert instance.is_allowed("resource:b:write")
+
+
+def test_is_allowed_for_grouped_scopes() -> None:
+    # given
+    instance = CompiledPolicies()
+
+    # when
+    instance.attach(Policy.allow("resource : set*, get* : *"))
+    instance.attach(Policy.deny("resource : setEmail : *"))
+
+    # then
+    assert instance.is_allowed("resource : setName, setEmail : value")
+    assert instance.is_allowed("resource : delete, getName : value")
+    assert not instance.is_allowed("resource : setEmail, delete : value")
+    assert not instance.is_allowed("resource : setEmail : value, other")
+
+
+def test_expands_grouped_scopes_having_few_combinations() -> None:
+    # given
+    instance = CompiledPolicies()
+    instance.attach(Policy.allow("resource : set*, get* : *"))
+    instance.attach(Policy.deny("resource : setEmail : *"))
+    many = ", ".join(f"other_{i}" for i in range(8))
+
+    # then
+    for scope, expected in [
+        ("resource : setEmail, delete : value", False),
+        ("resource : setEmail, getName : value", True),
+        ("resource : setEmail, delete : value, other", False),
+    ]:
+        assert instance.is_allowed(scope) == expected
+        # groups having more combinations are walked at once
+        assert instance.is_allowed(f"{scope}, {many}") == expected
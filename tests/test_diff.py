@@ -0,0 +1,143 @@
+from typing import List
+
+from targe import Actor, Policy, Role
+from targe.diff import apply_diff, diff_policies
+from targe.policy import CompiledPolicies
+
+
+def test_can_diff_policies() -> None:
+    # given
+    kept = Policy.allow("article : read")
+    removed = Policy.allow("article : delete")
+    changed = Policy.allow("article : update")
+    old = [kept, removed, changed]
+
+    added = Policy.allow("article : create")
+    new_changed = Policy.deny("article:update")
+    new = [Policy.allow("article:read"), new_changed, added]
+
+    # when
+    diff = diff_policies(old, new)
+
+    # then
+    assert diff.added == [added]
+    assert diff.removed == [removed]
+    assert diff.changed == [(changed, new_changed)]
+    assert not diff_policies(old, old)
+
+
+def test_applies_diff_to_role_without_recompiling() -> None:
+    # given
+    old = [Policy.allow("article : *"), Policy.allow("article : update"), Policy.allow("invoice : read")]
+    new = [Policy.allow("article : *"), Policy.deny("article : update"), Policy.allow("invoice : create")]
+    role = Role("editor")
+    role.policies = old
+    compiled_policies = role.compiled_policies
+    actor = Actor("actor_id")
+    actor.roles.append(role)
+    assert actor.is_allowed("article:update")
+    version = compiled_policies.version
+
+    # when
+    apply_diff(role.policies, diff_policies(old, new))
+
+    # then
+    assert role.compiled_policies is compiled_policies
+    assert compiled_policies.version > version
+    assert list(role.policies) == [old[0], new[1], new[2]]
+    assert not actor.is_allowed("article:update")
+    assert actor.is_allowed("article:read")
+    assert not actor.is_allowed("invoice:read")
+    assert actor.is_allowed("invoice:create")
+
+    expected = CompiledPolicies()
+    for policy in new:
+        expected.attach(policy)
+    assert compiled_policies.permissions == expected.permissions
+
+
+def test_changed_policy_keeps_its_precedence() -> None:
+    # given
+    old = [Policy.allow("article : update"), Policy.deny("article : update, delete")]
+    new = [Policy.deny("article : update"), Policy.allow("article : update, delete")]
+    actor = Actor("actor_id")
+    actor.policies.extend(old)
+    assert not actor.is_allowed("article:update")
+
+    # when
+    apply_diff(actor.policies, diff_policies(old, new))
+
+    # then
+    assert actor.is_allowed("article:update")
+    assert actor.is_allowed("article:delete")
+
+
+def _compile(policies: List[Policy]) -> CompiledPolicies:
+    result = CompiledPolicies()
+    for policy in policies:
+        result.attach(policy)
+
+    return result
+
+
+def test_applied_diff_gives_same_results_as_compiled_policies() -> None:
+    # given
+    old = [Policy.deny("doc : x")]
+    new = [Policy.allow("doc : x, y"), Policy.deny("doc : x")]
+    actor = Actor("actor_id")
+    actor.policies.extend(old)
+    assert not actor.is_allowed("doc:x")
+
+    # when
+    apply_diff(actor.policies, diff_policies(old, new))
+
+    # then
+    assert list(actor.policies) == [new[0], old[0]]
+    for scope in ["doc:x", "doc:y", "doc:z"]:
+        assert actor.is_allowed(scope) == _compile(new).is_allowed(scope)
+
+
+def test_last_policy_wins_if_scope_is_repeated() -> None:
+    # given
+    old = [Policy.allow("article : read"), Policy.deny("article : read")]
+    new = [Policy.allow("article : read")]
+    role = Role("reader")
+    role.policies = old
+    assert not role.compiled_policies.is_allowed("article:read")
+
+    # when
+    diff = diff_policies(old, new)
+    apply_diff(role.policies, diff)
+
+    # then
+    assert diff.changed == [(old[1], new[0])]
+    assert list(role.policies) == new
+    assert role.compiled_policies.is_allowed("article:read")
+
+
+def test_identifies_policies_by_normalized_scopes() -> None:
+    # given
+    old = [Policy.allow("article : read, update"), Policy.deny("article : delete")]
+    new = [Policy.allow("article:update,read"), Policy.deny("article:delete,delete")]
+
+    # then
+    assert not diff_policies(old, new)
+
+
+def test_can_diff_moved_policies() -> None:
+    # given
+    old = [Policy.allow("doc : x, y"), Policy.deny("doc : x"), Policy.allow("doc : z")]
+    new = [Policy.deny("doc : x"), Policy.allow("doc : x, y"), Policy.allow("doc : z")]
+    actor = Actor("actor_id")
+    actor.policies.extend(old)
+    assert not actor.is_allowed("doc:x")
+
+    # when
+    diff = diff_policies(old, new)
+    apply_diff(actor.policies, diff)
+
+    # then
+    assert diff.moved == new
+    assert list(actor.policies) == [old[1], old[0], old[2]]
+    for scope in ["doc:x", "doc:y", "doc:z"]:
+        assert actor.is_allowed(scope) == _compile(new).is_allowed(scope)
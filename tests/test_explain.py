@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock
+
+from targe import Actor, Auth, Policy, Role
+from targe.policy import CompiledPolicies
+
+
+def test_explains_decision_of_actor() -> None:
+    # given
+    role = Role("editor")
+    granting_policy = Policy.allow("article : meta : set*")
+    role.policies.append(granting_policy)
+    actor = Actor("actor_id")
+    actor.roles.append(role)
+    denying_policy = Policy.deny("article : meta : setOwner")
+    actor.policies.append(denying_policy)
+
+    # when
+    allowed = actor.explain("article:meta:setName")
+    denied = actor.explain("article:meta:setOwner")
+
+    # then
+    assert allowed.allowed
+    assert allowed.policy is granting_policy
+    assert allowed.origin is role
+    assert [step.edge for step in allowed.steps] == ["article", "meta", "set*"]
+    assert allowed.steps[-1].wildcard == "set*"
+    assert allowed.segments == 3
+    assert allowed.nodes == 6
+    assert allowed.wildcard_comparisons > 0
+    assert allowed.elapsed_ns > 0
+
+    assert not denied.allowed
+    assert denied.policy is denying_policy
+    assert denied.origin is actor
+    assert denied.steps[-1].wildcard is None
+    assert str(denied) == "article:meta:setOwner - denied by deny `article : meta : setOwner` (Actor('actor_id'))"
+
+
+def test_explains_interrupted_traversal() -> None:
+    # given
+    instance = CompiledPolicies()
+    policy = Policy.allow("article : *")
+    instance.attach(policy)
+
+    # when
+    result = instance.explain("article : 1 : update")
+    unknown = instance.explain("invoice : 1")
+
+    # then
+    assert result.allowed
+    assert result.policy is policy
+    assert result.interrupted
+    assert [step.edge for step in result.steps] == ["article", "*"]
+
+    assert not unknown.allowed
+    assert unknown.policy is None
+    assert unknown.interrupted
+    assert [step.edge for step in unknown.steps] == [None]
+    assert str(unknown) == "invoice:1 - denied by default"
+
+
+def test_explains_grouped_scope() -> None:
+    # given
+    instance = CompiledPolicies()
+    instance.attach(Policy.allow("article : 1, 2 : read"))
+
+    # when
+    result = instance.explain("article : 3, 2 : read")
+
+    # then
+    assert result.allowed
+    assert result.scope == "article:2:read"
+    assert [step.edge for step in result.steps] == ["article", "1,2", "read"]
+    assert result.segments == 5
+
+
+def test_explains_decision_of_on_guard_fallback() -> None:
+    # given
+    def on_guard(_: Actor, scope: str) -> bool:
+        return scope == "article:read"
+
+    actor_provider = MagicMock()
+    actor_provider.get_actor = MagicMock(return_value=Actor("actor_id"))
+    auth = Auth(actor_provider, on_guard=on_guard)
+    auth.authorize()
+
+    # when
+    allowed = auth.explain("article:read")
+    denied = auth.explain("article:update")
+
+    # then
+    assert allowed.allowed
+    assert allowed.origin is on_guard
+    assert not denied.allowed
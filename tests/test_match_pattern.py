@@ -15,6 +15,9 @@ from targe.policy import match_pattern
         ["test-with-dashes", "test-*-dashes"],
         ["test-with-dashes", "test-*-*"],
         ["test-with-dashes", "*-*-*"],
+        ["resetName", "set*"],
+        ["setNameValue", "*Name"],
+        ["superadminX", "*admin"],
     ],
 )
 def test_successfully_match_pattern(value: str, rule: str) -> None:
@@ -30,6 +33,7 @@ def test_successfully_match_pattern(value: str, rule: str) -> None:
         ["test", "*k"],
         ["test", "tests"],
         ["test", "*-*"],
+        ["test-a", "test-*-a"],
     ],
 )
 def test_fail_match_pattern(value: str, rule: str) -> None:
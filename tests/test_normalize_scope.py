@@ -1,4 +1,4 @@
-from targe.policy import normalize_scope
+from targe.policy import group_scope, normalize_scope
 
 
 def test_normalize_simple_scope() -> None:
@@ -14,11 +14,7 @@ def test_normalize_scope_with_single_group() -> None:
     result = normalize_scope("test : test-1-1, test-1-2, test-1-3 : test-1-1-1")
 
     # then
-    assert result == [
-        "test:test-1-1:test-1-1-1",
-        "test:test-1-2:test-1-1-1",
-        "test:test-1-3:test-1-1-1"
-    ]
+    assert result == ["test:test-1-1:test-1-1-1", "test:test-1-2:test-1-1-1", "test:test-1-3:test-1-1-1"]
 
 
 def test_normalize_scope_with_multiple_groups() -> None:
@@ -43,3 +39,11 @@ def test_normalize_scope_with_multiple_groups() -> None:
         "test:test-b:test-1",
         "test:test-b:test-2",
     ]
+
+
+def test_group_scope() -> None:
+    # when
+    result = group_scope("test : test-a, test-b, test-a : test-1")
+
+    # then
+    assert result == [["test"], ["test-a", "test-b"], ["test-1"]]
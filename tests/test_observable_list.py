@@ -1,3 +1,6 @@
+import copy
+import pickle
+
 from targe.utils import ObservableList
 
 
@@ -7,6 +10,8 @@ def test_can_instantiate() -> None:
 
     # then
     assert isinstance(instance, ObservableList)
+    assert isinstance(instance, list)
+    assert instance == [1, 2, 3]
 
 
 def test_on_change_listener() -> None:
@@ -20,3 +25,94 @@ def test_on_change_listener() -> None:
 
     # then
     assert len(states) == 2
+
+
+def test_reports_added_and_removed_items() -> None:
+    # given
+    changes = []
+    instance = ObservableList([1, 2, 3], changes.append)
+
+    # when
+    instance.append(4)
+    instance.pop()
+    instance.remove(1)
+
+    # then
+    assert changes == [([4], []), ([], [4]), ([], [1])]
+
+
+def test_observes_bulk_operations() -> None:
+    # given
+    changes = []
+    instance = ObservableList([1, 2], changes.append)
+
+    # when
+    instance.extend([3, 4])
+    instance += [5]
+    del instance[0]
+    instance[0] = 6
+    instance.clear()
+
+    # then
+    assert changes == [
+        ([3, 4], []),
+        ([5], []),
+        ([], [1]),
+        ([6, 3, 4, 5], [2, 3, 4, 5]),
+        ([], [6, 3, 4, 5]),
+    ]
+
+
+def test_insert_reports_replaced_tail() -> None:
+    # given
+    changes = []
+    instance = ObservableList([1, 2, 3], changes.append)
+
+    # when
+    instance.insert(1, 4)
+
+    # then
+    assert instance == [1, 4, 2, 3]
+    assert changes == [([4, 2, 3], [2, 3])]
+
+
+def test_observes_reordering() -> None:
+    # given
+    changes = []
+    instance = ObservableList([2, 1, 3], changes.append)
+
+    # when
+    instance.sort()
+    instance.reverse()
+    instance *= 2
+
+    # then
+    assert instance == [3, 2, 1, 3, 2, 1]
+    assert changes == [([1, 2, 3], [2, 1, 3]), ([3, 2, 1], [1, 2, 3]), ([3, 2, 1], [])]
+
+
+def test_reports_replaced_items() -> None:
+    # given
+    changes = []
+    instance = ObservableList([1, 2, 3], changes.append)
+
+    # when
+    instance.replace(2, 4)
+
+    # then
+    assert instance == [1, 4, 3]
+    assert changes == [([(2, 4)],)]
+
+
+def test_copies_are_plain_lists() -> None:
+    # given
+    changes = []
+    instance = ObservableList([1, 2], changes.append)
+
+    # when
+    copies = [copy.copy(instance), copy.deepcopy(instance), pickle.loads(pickle.dumps(instance)), instance.copy()]
+
+    # then
+    assert copies == [[1, 2]] * 4
+    assert all(type(item) is list for item in copies)
+    assert changes == []
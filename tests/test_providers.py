@@ -0,0 +1,272 @@
+import asyncio
+import threading
+from typing import Any, List, Optional, Sequence
+
+import pytest
+
+from targe import Actor, Auth, BatchingActorLoader, CachingActorProvider, Policy
+from targe.errors import RepositoryError
+
+
+class ActorProvider:
+    def __init__(self):
+        self.calls: List[Any] = []
+
+    def get_actor(self, context: Any = None) -> Actor:
+        self.calls.append(context)
+        if context == "unknown":
+            raise RepositoryError.actor_not_found(actor_id=context)
+
+        actor = Actor(context)
+        actor.policies.append(Policy.allow(f"user : {context}"))
+        return actor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_caches_compiled_actors() -> None:
+    # given
+    provider = ActorProvider()
+    caching_provider = CachingActorProvider(provider)
+
+    # when
+    actor = caching_provider.get_actor("1")
+
+    # then
+    assert actor._compiled_policies is not None
+    assert caching_provider.get_actor("1") is actor
+    assert provider.calls == ["1"]
+
+    stats = caching_provider.stats()
+    assert (stats.hits, stats.misses, stats.loads, stats.currsize) == (1, 1, 1, 1)
+    assert stats.load_time_ns > 0
+
+
+def test_expires_actors() -> None:
+    # given
+    clock = Clock()
+    provider = ActorProvider()
+    caching_provider = CachingActorProvider(provider, ttl=10, clock=clock)
+    actor = caching_provider.get_actor("1")
+
+    # when
+    clock.now = 9
+
+    # then
+    assert caching_provider.get_actor("1") is actor
+
+    # when
+    clock.now = 10
+
+    # then
+    assert caching_provider.get_actor("1") is not actor
+    assert provider.calls == ["1", "1"]
+
+
+def test_evicts_least_recently_used_actors() -> None:
+    # given
+    provider = ActorProvider()
+    caching_provider = CachingActorProvider(provider, maxsize=2)
+    caching_provider.get_actor("1")
+    caching_provider.get_actor("2")
+    caching_provider.get_actor("1")
+
+    # when
+    caching_provider.get_actor("3")
+    caching_provider.get_actor("1")
+    caching_provider.get_actor("2")
+
+    # then
+    assert provider.calls == ["1", "2", "3", "2"]
+    assert caching_provider.stats().evictions == 2
+
+
+def test_caches_unknown_actors() -> None:
+    # given
+    clock = Clock()
+    provider = ActorProvider()
+    caching_provider = CachingActorProvider(provider, negative_ttl=5, clock=clock)
+
+    # then
+    for _ in range(2):
+        with pytest.raises(RepositoryError):
+            caching_provider.get_actor("unknown")
+    assert provider.calls == ["unknown"]
+
+    # when
+    clock.now = 5
+
+    # then
+    with pytest.raises(RepositoryError):
+        caching_provider.get_actor("unknown")
+    assert provider.calls == ["unknown", "unknown"]
+
+
+def test_raises_new_instance_of_cached_error() -> None:
+    # given
+    provider = ActorProvider()
+    caching_provider = CachingActorProvider(provider, negative_ttl=5)
+    errors = []
+
+    # when
+    for _ in range(3):
+        try:
+            caching_provider.get_actor("unknown")
+        except RepositoryError as error:
+            errors.append(error)
+
+    # then
+    assert provider.calls == ["unknown"]
+    assert len({id(error) for error in errors}) == 3
+    assert all(type(error) is type(errors[0]) and error.kwargs == {"actor_id": "unknown"} for error in errors)
+    assert all(error.__traceback__ is not None for error in errors)
+
+
+def test_can_invalidate_actors() -> None:
+    # given
+    provider = ActorProvider()
+    caching_provider = CachingActorProvider(provider, negative_ttl=5)
+    caching_provider.get_actor("1")
+    caching_provider.get_actor("2")
+    with pytest.raises(RepositoryError):
+        caching_provider.get_actor("unknown")
+
+    # when
+    caching_provider.invalidate("1")
+    caching_provider.invalidate(context="unknown")
+
+    # then
+    assert caching_provider.stats().currsize == 1
+    caching_provider.get_actor("1")
+    caching_provider.get_actor("2")
+    with pytest.raises(RepositoryError):
+        caching_provider.get_actor("unknown")
+    assert provider.calls == ["1", "2", "unknown", "1", "unknown"]
+
+    # when
+    caching_provider.invalidate()
+
+    # then
+    assert caching_provider.stats().currsize == 0
+
+
+def test_caches_actors_of_async_provider() -> None:
+    # given
+    class AsyncActorProvider(ActorProvider):
+        async def get_actor(self, context: Any = None) -> Actor:  # type: ignore
+            await asyncio.sleep(0)
+            return super().get_actor(context)
+
+    provider = AsyncActorProvider()
+    auth = Auth(CachingActorProvider(provider))
+
+    async def handle_request() -> None:
+        actor = await auth.authorize_async("1")
+
+        # then
+        assert await auth.authorize_async("1") is actor
+
+    # when
+    asyncio.run(handle_request())
+
+    # then
+    assert provider.calls == ["1"]
+
+
+class BatchActorProvider(ActorProvider):
+    def __init__(self):
+        super().__init__()
+        self.batches: List[List[Any]] = []
+
+    def get_actors(self, contexts: Sequence[Any]) -> Sequence[Optional[Actor]]:
+        self.batches.append(list(contexts))
+        return [Actor(context) if context != "unknown" else None for context in contexts]
+
+
+def test_batches_concurrent_loads_in_threads() -> None:
+    # given
+    provider = BatchActorProvider()
+    loader = BatchingActorLoader(provider, max_batch_size=10, batch_window=0.5)
+    barrier = threading.Barrier(20)
+    actors = {}
+
+    def authorize(index: int) -> None:
+        barrier.wait()
+        actors[index] = loader.get_actor(str(index % 5))
+
+    threads = [threading.Thread(target=authorize, args=(index,)) for index in range(20)]
+
+    # when
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # then
+    assert len(provider.batches) == 1
+    assert sorted(provider.batches[0]) == ["0", "1", "2", "3", "4"]
+    assert all(actors[index].actor_id == str(index % 5) for index in range(20))
+    assert actors[0] is actors[5]
+
+
+def test_loads_full_batches_without_waiting() -> None:
+    # given
+    provider = BatchActorProvider()
+    loader = BatchingActorLoader(provider, max_batch_size=2, batch_window=60)
+
+    async def authorize() -> List[Optional[Actor]]:
+        return await asyncio.gather(*(loader.get_actor(str(index)) for index in range(4)))  # type: ignore
+
+    # when
+    actors = asyncio.run(asyncio.wait_for(authorize(), 5))
+
+    # then
+    assert [actor.actor_id for actor in actors] == ["0", "1", "2", "3"]  # type: ignore
+    assert provider.batches == [["0", "1"], ["2", "3"]]
+
+
+def test_batches_concurrent_loads_in_tasks() -> None:
+    # given
+    provider = BatchActorProvider()
+    auth = Auth(BatchingActorLoader(provider))
+
+    async def handle_request(actor_id: str) -> Actor:
+        async with auth.authorized_async(actor_id) as actor:
+            return actor
+
+    async def handle_requests() -> List[Actor]:
+        return await asyncio.gather(*(handle_request(actor_id) for actor_id in ["1", "2", "1", "3"]))
+
+    # when
+    actors = asyncio.run(handle_requests())
+
+    # then
+    assert provider.batches == [["1", "2", "3"]]
+    assert [actor.actor_id for actor in actors] == ["1", "2", "1", "3"]
+    assert actors[0] is actors[2]
+
+
+def test_loads_actors_one_by_one_without_bulk_method() -> None:
+    # given
+    provider = ActorProvider()
+    loader = BatchingActorLoader(provider)
+
+    async def authorize() -> List[Any]:
+        return await asyncio.gather(
+            *(loader.get_actor(context) for context in ["1", "unknown", "1"]), return_exceptions=True  # type: ignore
+        )
+
+    # when
+    actors = asyncio.run(authorize())
+
+    # then
+    assert actors[0].actor_id == "1"
+    assert isinstance(actors[1], RepositoryError)
+    assert actors[2] is actors[0]
+    assert provider.calls == ["1", "unknown"]
@@ -0,0 +1,97 @@
+import pytest
+
+from targe import Auth, Policy, PolicyEffect
+from targe.errors import RepositoryError
+from targe.repository import InMemoryPolicyRepository, RepositoryActorProvider, SQLitePolicyRepository
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repository(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryPolicyRepository()
+        return
+
+    instance = SQLitePolicyRepository(str(tmp_path / "policies.db"))
+    yield instance
+    instance.close()
+
+
+def test_can_store_roles_and_actors(repository) -> None:
+    # given
+    first_version = repository.save_role("tenant", "editor", [Policy.allow("article : *")])
+    second_version = repository.save_role("tenant", "editor", [Policy.allow("article : read")])
+    repository.save_actor("tenant", "bob", ["editor"], [Policy.deny("article : read")])
+
+    # when
+    role = repository.get_role("tenant", "editor")
+    actor = repository.get_actor("tenant", "bob")
+
+    # then
+    assert second_version > first_version
+    assert role.version == second_version
+    assert [(policy.scope, policy.effect) for policy in role.policies] == [("article : read", PolicyEffect.ALLOW)]
+    assert actor.roles == {"editor": second_version}
+    assert [policy.scope for policy in actor.policies] == ["article : read"]
+    assert repository.get_role("other_tenant", "editor") is None
+    assert repository.get_actor("other_tenant", "bob") is None
+
+
+def test_reuses_compiled_roles_until_version_changes(repository) -> None:
+    # given
+    repository.save_role("tenant", "editor", [Policy.allow("article : *")])
+    repository.save_actor("tenant", "bob", ["editor"])
+    repository.save_actor("tenant", "alice", ["editor"], [Policy.deny("article : delete")])
+    provider = RepositoryActorProvider(repository)
+
+    # when
+    bob = provider.get_actor(("tenant", "bob"))
+    alice = provider.get_actor(("tenant", "alice"))
+
+    # then
+    assert bob.roles[0] is alice.roles[0]
+    assert bob.is_allowed("article:delete")
+    assert not alice.is_allowed("article:delete")
+    assert provider.cache_info().hits == 1
+    assert provider.cache_info().misses == 1
+
+    # when
+    repository.save_role("tenant", "editor", [Policy.allow("article : read")])
+    bob_again = provider.get_actor(("tenant", "bob"))
+
+    # then
+    assert bob_again.roles[0] is not bob.roles[0]
+    assert not bob_again.is_allowed("article:delete")
+    assert bob_again.is_allowed("article:read")
+
+
+def test_evicts_least_recently_used_roles() -> None:
+    # given
+    repository = InMemoryPolicyRepository()
+    for tenant in ["a", "b", "c"]:
+        repository.save_role(tenant, "editor", [Policy.allow("article : *")])
+        repository.save_actor(tenant, "bob", ["editor"])
+    provider = RepositoryActorProvider(repository, cache_size=2)
+
+    # when
+    for tenant in ["a", "b", "a", "c"]:
+        provider.get_actor((tenant, "bob"))
+
+    # then
+    assert provider.cache_info().currsize == 2
+    assert provider.cache_info().misses == 3
+
+    # when
+    provider.get_actor(("b", "bob"))
+
+    # then
+    assert provider.cache_info().misses == 4
+
+
+def test_fails_for_unknown_actor() -> None:
+    # given
+    provider = RepositoryActorProvider(InMemoryPolicyRepository())
+    auth = Auth(provider)
+
+    # then
+    with pytest.raises(RepositoryError):
+        auth.authorize(("tenant", "bob"))
@@ -0,0 +1,73 @@
+from targe import Actor, Policy, Role
+from targe.reverse_index import ReverseIndex
+
+
+def test_finds_subjects_allowed_to_access_scope() -> None:
+    # given
+    accountant = Role("accountant")
+    accountant.policies.append(Policy.allow("invoice : *"))
+    auditor = Role("auditor")
+    auditor.policies.append(Policy.allow("invoice : * : read"))
+
+    bob = Actor("bob")
+    bob.roles.append(accountant)
+    alice = Actor("alice")
+    alice.roles.append(accountant)
+    alice.policies.append(Policy.deny("invoice : * : delete"))
+    john = Actor("john")
+    john.roles.append(auditor)
+    mark = Actor("mark")
+    mark.policies.append(Policy.allow("invoice : 42 : delete"))
+
+    index = ReverseIndex()
+    for actor in [bob, alice, john, mark]:
+        index.add_actor(actor)
+
+    # when
+    can_delete = index.who_can("invoice : 42 : delete")
+    can_read = index.who_can("invoice : 42 : read")
+    cannot_delete = index.who_cannot("invoice : 42 : delete")
+
+    # then
+    assert can_delete.roles == ["accountant"]
+    assert can_delete.actors == ["bob", "mark"]
+    assert can_read.roles == ["accountant", "auditor"]
+    assert can_read.actors == ["alice", "bob", "john"]
+    assert cannot_delete.actors == ["alice"]
+    assert len(index) == 6
+
+
+def test_updates_index_incrementally() -> None:
+    # given
+    role = Role("accountant")
+    actor = Actor("bob")
+    index = ReverseIndex()
+    index.add_actor(actor)
+
+    # when
+    actor.roles.append(role)
+    role.policies.append(Policy.allow("invoice : *"))
+
+    # then
+    assert index.who_can("invoice:42:delete").actors == ["bob"]
+
+    # when
+    actor.policies.append(Policy.deny("invoice : 42 : delete"))
+
+    # then
+    assert index.who_can("invoice:42:delete").actors == []
+    assert index.who_can("invoice:43:delete").actors == ["bob"]
+
+    # when
+    actor.roles.clear()
+
+    # then
+    assert index.who_can("invoice:43:delete").actors == []
+    assert index.who_can("invoice:43:delete").roles == ["accountant"]
+
+    # when
+    index.remove_actor(actor)
+    index.remove_role(role)
+
+    # then
+    assert index.permissions == {}
@@ -1,6 +1,9 @@
+from datetime import datetime, timedelta
+
 import pytest
 
-from targe import Role
+from targe import Actor, Policy, Role
+from targe.errors import RoleHierarchyError
 
 
 def test_can_instantiate_role() -> None:
@@ -11,6 +14,175 @@ def test_can_instantiate_role() -> None:
     assert isinstance(role, Role)
 
 
+def test_keeps_creation_time() -> None:
+    # given
+    before = datetime.utcnow()
+
+    # when
+    role = Role("name")
+    policy = Policy.allow("resource:create")
+
+    # then
+    for created_at in [role.created_at, policy.created_at]:
+        assert isinstance(created_at, datetime)
+        assert before - timedelta(seconds=1) <= created_at <= datetime.utcnow()
+    assert not hasattr(role, "__dict__")
+    assert not hasattr(policy, "__dict__")
+
+
 def test_fails_for_invalid_role_name() -> None:
     with pytest.raises(ValueError):
         Role("12.31")
+
+
+def test_compiles_policies_once_for_all_actors() -> None:
+    # given
+    role = Role("editor")
+    role.policies.append(Policy.allow("article:*"))
+    actor_1 = Actor("1")
+    actor_2 = Actor("2")
+
+    # when
+    actor_1.roles.append(role)
+    actor_2.roles.append(role)
+
+    # then
+    assert actor_1.is_allowed("article:update")
+    assert actor_2.is_allowed("article:update")
+    assert actor_1._compiled_policies.layers[0] is role.compiled_policies
+    assert actor_2._compiled_policies.layers[0] is role.compiled_policies
+    assert actor_1._compiled_policies.permissions == {}
+
+    # when
+    role.policies.append(Policy.deny("article:delete"))
+
+    # then
+    assert not actor_1.is_allowed("article:delete")
+    assert not actor_2.is_allowed("article:delete")
+
+
+def test_compiles_policies_on_first_use() -> None:
+    # given
+    reader = Role("reader")
+    reader.policies.append(Policy.allow("article:read"))
+    editor = Role("editor")
+    editor.parents.append(reader)
+    editor.policies.append(Policy.allow("article:update"))
+    actor = Actor("actor_id")
+    actor.roles.append(editor)
+
+    # then
+    assert editor._compiled_policies is None
+    assert reader._compiled_policies is None
+
+    # when
+    reader.policies.append(Policy.deny("article:update"))
+
+    # then
+    assert actor.is_allowed("article:read")
+    assert actor.is_allowed("article:update")
+    assert editor.compiled_policies.layers == (reader.compiled_policies,)
+
+
+def test_can_replace_role_policies() -> None:
+    # given
+    role = Role("editor")
+    role.policies.append(Policy.allow("article:*"))
+
+    # when
+    role.policies = [Policy.allow("user:*")]
+
+    # then
+    assert not role.compiled_policies.is_allowed("article:update")
+    assert role.compiled_policies.is_allowed("user:update")
+
+
+def test_inherits_policies_of_parent_roles() -> None:
+    # given
+    reader = Role("reader")
+    reader.policies.append(Policy.allow("article:read"))
+    editor = Role("editor")
+    editor.policies.append(Policy.allow("article:update"))
+    editor.parents.append(reader)
+    chief = Role("chief")
+    chief.parents.append(editor)
+    actor = Actor("1")
+    actor.roles.append(chief)
+
+    # then
+    assert chief.ancestors == (editor, reader)
+    assert actor.is_allowed("article:read")
+    assert actor.is_allowed("article:update")
+    assert actor.has_role("chief", "editor", "reader")
+
+    # when
+    reader.policies.append(Policy.deny("article:read"))
+
+    # then
+    assert not actor.is_allowed("article:read")
+
+
+def test_own_policies_take_precedence_over_inherited_ones() -> None:
+    # given
+    reader = Role("reader")
+    reader.policies.append(Policy.allow("article:*"))
+    guest = Role("guest")
+    guest.policies.append(Policy.deny("article:*"))
+    role = Role("limited_reader")
+    role.policies.append(Policy.allow("article:read"))
+
+    # when
+    role.parents.append(reader)
+    role.parents.append(guest)
+
+    # then
+    assert role.ancestors == (guest, reader)
+    assert role.compiled_policies.is_allowed("article:read")
+    assert not role.compiled_policies.is_allowed("article:update")
+
+
+def test_updates_closure_when_hierarchy_changes() -> None:
+    # given
+    reader = Role("reader")
+    editor = Role("editor")
+    chief = Role("chief")
+    chief.parents.append(editor)
+    actor = Actor("1")
+    actor.roles.append(chief)
+    reader.policies.append(Policy.allow("article:read"))
+
+    # when
+    editor.parents.append(reader)
+
+    # then
+    assert chief.ancestors == (editor, reader)
+    assert chief.names == {"chief", "editor", "reader"}
+    assert actor.has_role("reader")
+    assert actor.is_allowed("article:read")
+
+    # when
+    editor.parents.remove(reader)
+
+    # then
+    assert chief.ancestors == (editor,)
+    assert not actor.has_role("reader")
+    assert not actor.is_allowed("article:read")
+
+
+def test_fails_for_cyclic_inheritance() -> None:
+    # given
+    reader = Role("reader")
+    editor = Role("editor")
+    editor.parents.append(reader)
+
+    # then
+    with pytest.raises(RoleHierarchyError):
+        reader.parents.append(editor)
+    with pytest.raises(RoleHierarchyError):
+        reader.parents = [editor]
+    with pytest.raises(RoleHierarchyError):
+        reader.parents.append(reader)
+
+    assert list(reader.parents) == []
+    assert reader.ancestors == ()
+    assert editor.ancestors == (reader,)
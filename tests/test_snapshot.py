@@ -0,0 +1,99 @@
+import pytest
+
+from targe.errors import InvalidSnapshotError
+from targe.policy import CompiledPolicies, Policy
+from targe.snapshot import PolicySnapshot, dump_snapshot, write_snapshot
+
+SCOPES = [
+    "resource",
+    "resource:create",
+    "resource:level_1",
+    "resource:setName",
+    "resource:setEmail",
+    "resource:id:allowed",
+    "resource:group-a:allow",
+    "resource:group-b:allow",
+    "resource : group-c, group-b : allow",
+    "other",
+]
+
+
+def _compiled_policies() -> CompiledPolicies:
+    role = CompiledPolicies()
+    role.attach(Policy.allow("resource : *"))
+    role.attach(Policy.deny("resource : group-a, group-b : *"))
+
+    instance = CompiledPolicies([role])
+    instance.attach(Policy.deny("resource:create"))
+    instance.attach(Policy.allow("resource:set*"))
+    instance.attach(Policy.deny("resource:setEmail"))
+    instance.attach(Policy.allow("resource : group-b : allow"))
+
+    return instance
+
+
+def test_can_query_snapshot_in_place(tmp_path) -> None:
+    # given
+    compiled = _compiled_policies()
+    path = str(tmp_path / "policies.bin")
+
+    # when
+    write_snapshot(compiled, path)
+
+    # then
+    with PolicySnapshot.open(path) as snapshot:
+        for scope in SCOPES:
+            assert snapshot.is_allowed(scope) == compiled.is_allowed(scope), scope
+
+
+def test_can_load_snapshot_from_bytes() -> None:
+    # given
+    compiled = _compiled_policies()
+
+    # when
+    snapshot = PolicySnapshot(dump_snapshot(compiled))
+
+    # then
+    assert snapshot.is_allowed("resource:setName")
+    assert not snapshot.is_allowed("resource:group-a:allow")
+
+
+def test_empty_snapshot_denies_access() -> None:
+    # when
+    snapshot = PolicySnapshot(dump_snapshot(CompiledPolicies()))
+
+    # then
+    assert len(snapshot) == 1
+    assert not snapshot.is_allowed("resource")
+
+
+def test_fails_for_invalid_snapshot() -> None:
+    # given
+    data = bytearray(dump_snapshot(_compiled_policies()))
+
+    # then
+    with pytest.raises(InvalidSnapshotError):
+        PolicySnapshot(b"invalid")
+
+    with pytest.raises(InvalidSnapshotError):
+        PolicySnapshot(bytes(data[:-1]))
+
+    # when
+    data[4] = 99
+
+    # then
+    with pytest.raises(InvalidSnapshotError):
+        PolicySnapshot(bytes(data))
+
+
+def test_fails_for_truncated_snapshot() -> None:
+    # given
+    data = dump_snapshot(_compiled_policies())
+
+    # then
+    for length in range(len(data)):
+        with pytest.raises(InvalidSnapshotError):
+            PolicySnapshot(data[:length])
+
+    with pytest.raises(InvalidSnapshotError):
+        PolicySnapshot(data + b"\0")
@@ -0,0 +1,126 @@
+import pytest
+
+from targe.policy import CompiledPolicies, Policy, WildcardIndex
+from targe.snapshot import PolicySnapshot, dump_snapshot
+
+
+def test_can_instantiate() -> None:
+    # given
+    instance = WildcardIndex(["set*", "*Name"])
+
+    # then
+    assert isinstance(instance, WildcardIndex)
+    assert instance == {"set*", "*Name"}
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ["setName", "setN*"],
+        ["setEmail", "set*"],
+        ["getName", "get*Name"],
+        ["getLastName", "get*Name"],
+        ["firstName", "*Name"],
+        ["getter", "get*"],
+        ["other", "*"],
+        ["s", "*"],
+    ],
+)
+def test_matches_most_specific_pattern(value: str, expected: str) -> None:
+    # given
+    instance = WildcardIndex(["*", "set*", "setN*", "get*", "*Name", "get*Name", "s*e"])
+
+    # then
+    assert instance.match(value) == expected
+
+
+def test_does_not_match_overlapping_infix() -> None:
+    # given
+    instance = WildcardIndex(["ab*ba"])
+
+    # then
+    assert instance.match("aba") is None
+    assert instance.match("abba") == "ab*ba"
+
+
+def test_can_discard_pattern() -> None:
+    # given
+    instance = WildcardIndex(["set*", "*Name", "get*Name"])
+
+    # when
+    instance.discard("set*")
+    instance.discard("get*Name")
+    instance.discard("unknown*")
+
+    # then
+    assert instance == {"*Name"}
+    assert instance.match("setName") == "*Name"
+    assert instance.match("setEmail") is None
+
+
+def test_follows_changes_after_lookups() -> None:
+    # given
+    small = WildcardIndex(["set*"])
+    large = WildcardIndex([f"user_{i}*" for i in range(10)])
+    assert small.match("setName") == "set*"
+    assert large.match("user_1_setName") == "user_1*"
+
+    # when
+    small.add("setN*")
+    large.add("user_1_set*")
+    large.discard("user_1*")
+
+    # then
+    assert small.match("setName") == "setN*"
+    assert large.match("user_1_setName") == "user_1_set*"
+    assert large.match("user_1_get") is None
+
+
+def test_compiled_policies_prefer_most_specific_wildcard() -> None:
+    # given
+    instance = CompiledPolicies()
+
+    # when
+    instance.attach(Policy.allow("article:meta:set*"))
+    instance.attach(Policy.deny("article:meta:setKey*"))
+    instance.attach(Policy.deny("article:meta:*Name"))
+    instance.attach(Policy.allow("article:meta:set*Name"))
+
+    # then
+    assert instance.is_allowed("article:meta:setTitle")
+    assert not instance.is_allowed("article:meta:setKeywords")
+    assert not instance.is_allowed("article:meta:firstName")
+    assert instance.is_allowed("article:meta:setFirstName")
+    assert not instance.is_allowed("article:meta:getTitle")
+
+
+def test_matches_literals_anywhere_within_segment() -> None:
+    # given
+    patterns = ["*admin", "set*", "get*Name"] + [f"user_{i}*" for i in range(10)]
+    small = WildcardIndex(patterns[:3])
+    large = WildcardIndex(patterns)
+
+    # then
+    for instance in (small, large):
+        assert instance.match("superadminX") == "*admin"
+        assert instance.match("resetTitle") == "set*"
+        assert instance.match("forgetNameValue") == "get*Name"
+        assert instance.match("other") is None
+    assert large.match("the_user_3_id") == "user_3*"
+    assert sorted(large.match_all("user_1_setadmin")) == ["*admin", "set*", "user_1*"]
+
+
+def test_keeps_wildcard_deny_for_values_containing_literal() -> None:
+    # given
+    instance = CompiledPolicies()
+    instance.attach(Policy.allow("user:*"))
+    instance.attach(Policy.deny("user:*admin"))
+
+    # then
+    assert not instance.is_allowed("user:admin")
+    assert not instance.is_allowed("user:superadminX")
+    assert not instance.evaluator()("user:superadminX")
+    assert list(instance.is_allowed_many(["user:superadminX", "user:editor"])) == [False, True]
+    assert not PolicySnapshot(dump_snapshot(instance)).is_allowed("user:superadminX")
+    assert instance.explain("user:superadminX").policy.scope == "user:*admin"
+    assert instance.is_allowed("user:editor")